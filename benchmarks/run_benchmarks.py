@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+Reprodukovatelné benchmarky klienta API, plánovače a tvorby payloadů.
+
+Měří se:
+    api.*       ThinQAPI.get_device_status / send_device_command proti lokálnímu
+                simulátoru (thinq_simulator.py) při různé souběžnosti -
+                latence p50/p95/p99 a propustnost
+    schedule.*  SchedulerWidget.get_active_schedule_for_time a
+                ClimateApp._find_next_schedule pro 10 až 100k plánů
+                (+ kompilace CompiledSchedule a lineární referenční vyhledání)
+    payload.*   create_control_payload se zapnutým a vypnutým logováním
+
+Výsledky se uloží do JSON. Režim --compare porovná výsledky s uloženou
+baseline a při zhoršení nad práh (--threshold) skončí kódem 1.
+
+    python benchmarks/run_benchmarks.py --output benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --only schedule --quick
+"""
+import io
+import gc
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from schedule_logic import ScheduleEntry, CompiledSchedule, get_active_schedule, find_next_schedule
+from klima_logic import create_control_payload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = Path(__file__).parent / "results.json"
+DEFAULT_THRESHOLD = 0.25          # Zhoršení o více než 25 % = regrese (šum sdílených strojů)
+SCHEDULE_SIZES = (10, 100, 1000, 10000, 100000)
+LINEAR_MAX_SIZE = 10000           # Lineární reference jen do této velikosti (100k trvá sekundy)
+CONCURRENCY_LEVELS = (1, 10, 50, 100)
+API_REQUESTS = 1000               # Počet požadavků na jednu úroveň souběžnosti
+SEED = 42
+
+
+# ----------------------------------------------------------------------
+# Měření
+# ----------------------------------------------------------------------
+def time_call(func, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """
+    Doba jednoho volání (ns) - počet opakování se kalibruje na min_time.
+
+    Returns:
+        dict: median_ns, min_ns, loops
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or loops >= 1 << 24:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / repeat / elapsed) + 1))
+
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter() - start) / loops * 1e9)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {"median_ns": statistics.median(samples), "min_ns": min(samples), "loops": loops}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Percentil z již seřazených hodnot (nejbližší pořadí)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def result(primary: str, higher_is_better: bool = False, **metrics) -> dict:
+    """Záznam výsledku - primary je metrika porovnávaná s baseline"""
+    return {"primary": primary, "higher_is_better": higher_is_better, **metrics}
+
+
+# ----------------------------------------------------------------------
+# Plánovač
+# ----------------------------------------------------------------------
+def generate_schedule(count: int, rng: random.Random):
+    """Náhodné plány - začátky po celý den, trvání 15 min až 4 h, část přes půlnoc"""
+    entries = []
+    for index in range(count):
+        start = rng.randrange(24 * 60)
+        end = (start + rng.randrange(15, 240)) % (24 * 60)
+        entries.append(ScheduleEntry(
+            name=f"Plán {index}",
+            start_time=f"{start // 60:02d}:{start % 60:02d}",
+            end_time=f"{end // 60:02d}:{end % 60:02d}",
+            priority=rng.randrange(4),
+            entry_id=f"bench-{index}"
+        ))
+    return entries
+
+
+def gui_lookups():
+    """
+    Metody GUI volané nad holderem bez Tk okna (obě jen delegují na CompiledSchedule).
+
+    Returns:
+        tuple: (get_active(holder, t), find_next(holder, t)) nebo None bez tkinter
+    """
+    try:
+        from gui.scheduler import SchedulerWidget
+        from gui.app import ClimateApp
+    except Exception as e:
+        logger.warning(f"GUI moduly nelze importovat ({e}) - měří se přímo CompiledSchedule")
+        return None
+    return SchedulerWidget.get_active_schedule_for_time, ClimateApp._find_next_schedule
+
+
+def bench_schedule(sizes=SCHEDULE_SIZES, min_time: float = 0.2) -> dict:
+    """Cena vyhledání aktivního a dalšího plánu podle počtu plánů"""
+    results = {}
+    rng = random.Random(SEED)
+    lookups = gui_lookups()
+    times = [datetime(2024, 1, 1, rng.randrange(24), rng.randrange(60)) for _ in range(64)]
+
+    for size in sizes:
+        entries = generate_schedule(size, rng)
+
+        start = time.perf_counter()
+        compiled = CompiledSchedule(entries)
+        results[f"schedule.compile.{size}"] = result(
+            "seconds", seconds=time.perf_counter() - start, entries=size)
+
+        cycle = iter(())
+
+        def next_time():
+            nonlocal cycle
+            try:
+                return next(cycle)
+            except StopIteration:
+                cycle = iter(times)
+                return next(cycle)
+
+        if lookups:
+            get_active, find_next = lookups
+            widget = SimpleNamespace(compiled_schedule=compiled)
+            app = SimpleNamespace(scheduler_widget=widget)
+            active = lambda: get_active(widget, next_time())
+            following = lambda: find_next(app, next_time())
+        else:
+            active = lambda: compiled.active_at(next_time())
+            following = lambda: compiled.next_start(next_time())
+
+        results[f"schedule.active.{size}"] = result("min_ns", entries=size, **time_call(active, min_time))
+        results[f"schedule.next.{size}"] = result("min_ns", entries=size, **time_call(following, min_time))
+
+        if size <= LINEAR_MAX_SIZE:
+            results[f"schedule.linear_active.{size}"] = result(
+                "median_ns", entries=size, **time_call(lambda: get_active_schedule(entries, next_time()), min_time))
+            results[f"schedule.linear_next.{size}"] = result(
+                "median_ns", entries=size, **time_call(lambda: find_next_schedule(entries, next_time()), min_time))
+
+        print(f"  plány {size:>6}: aktivní {results[f'schedule.active.{size}']['median_ns']:>9.0f} ns, "
+              f"další {results[f'schedule.next.{size}']['median_ns']:>9.0f} ns, "
+              f"kompilace {results[f'schedule.compile.{size}']['seconds'] * 1000:.1f} ms")
+    return results
+
+
+# ----------------------------------------------------------------------
+# Payloady
+# ----------------------------------------------------------------------
+PAYLOAD_CASES = {
+    "power": ("power", "POWER_ON"),
+    "mode": ("mode", "COOL"),
+    "temperature": ("temperature", 22.5, "COOL"),
+    "cancel_timers": ("cancel_timers",),
+}
+
+
+def bench_payload(min_time: float = 0.2) -> dict:
+    """create_control_payload s logováním na úrovni INFO (do paměti) a vypnutým"""
+    results = {}
+    payload_logger = logging.getLogger("klima_logic")
+    sink = logging.StreamHandler(io.StringIO())
+    sink.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    saved_level, saved_propagate = payload_logger.level, payload_logger.propagate
+
+    try:
+        for logging_state in ("on", "off"):
+            if logging_state == "on":
+                payload_logger.addHandler(sink)
+                payload_logger.setLevel(logging.INFO)
+            else:
+                payload_logger.removeHandler(sink)
+                payload_logger.setLevel(logging.WARNING)
+            payload_logger.propagate = False
+
+            for name, args in PAYLOAD_CASES.items():
+                timing = time_call(lambda: create_control_payload(*args), min_time)
+                results[f"payload.{name}.logging_{logging_state}"] = result("min_ns", **timing)
+                sink.stream.seek(0)
+                sink.stream.truncate()
+    finally:
+        payload_logger.removeHandler(sink)
+        payload_logger.setLevel(saved_level)
+        payload_logger.propagate = saved_propagate
+
+    for name in PAYLOAD_CASES:
+        on = results[f"payload.{name}.logging_on"]["median_ns"]
+        off = results[f"payload.{name}.logging_off"]["median_ns"]
+        print(f"  payload {name:<14} logování zap. {on:>8.0f} ns, vyp. {off:>8.0f} ns")
+    return results
+
+
+# ----------------------------------------------------------------------
+# API klient proti simulátoru
+# ----------------------------------------------------------------------
+async def _run_api(concurrency_levels, requests_per_level: int, latency: float) -> dict:
+    from server_api import ThinQAPI
+    from thinq_simulator import ThinQSimulator, PROFILE_FILE
+
+    class BenchmarkThinQAPI(ThinQAPI):
+        """ThinQAPI s konfigurací pro simulátor (bez config.json, bez rate limitu a historie)"""
+
+        def __init__(self, base_url: str):
+            self._benchmark_config = {
+                "access_token": "benchmark",
+                "country_code": "CZ",
+                "client_id": "benchmark",
+                "api_base_url": base_url,
+                "status_history": False,
+                "rate_limit": {
+                    "read": {"rate_per_minute": 1e9, "burst": 1e6},
+                    "write": {"rate_per_minute": 1e9, "burst": 1e6}
+                }
+            }
+            super().__init__()
+
+        def load_config(self):
+            return self._benchmark_config
+
+    with open(PROFILE_FILE, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    max_concurrency = max(concurrency_levels)
+    simulator = ThinQSimulator(profile, device_count=max_concurrency, latency=latency, seed=SEED)
+    await simulator.start(port=0)
+    api = BenchmarkThinQAPI(simulator.base_url)
+    device_ids = list(simulator.devices)
+    payloads = [create_control_payload("temperature", t) for t in (20, 22, 24, 26)]
+
+    async def run_level(operation: str, concurrency: int):
+        latencies = []
+        per_worker = max(1, requests_per_level // concurrency)
+
+        async def worker(index: int):
+            # Každý worker má vlastní zařízení - jinak by se souběžná čtení sloučila (single-flight)
+            device_id = device_ids[index]
+            for n in range(per_worker):
+                start = time.perf_counter()
+                if operation == "status":
+                    await api.get_device_status(device_id)
+                else:
+                    await api.send_device_command(device_id, payloads[n % len(payloads)])
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return result(
+            "throughput", higher_is_better=True,
+            throughput=len(latencies) / elapsed,
+            p50_ms=percentile(latencies, 0.50) * 1000,
+            p95_ms=percentile(latencies, 0.95) * 1000,
+            p99_ms=percentile(latencies, 0.99) * 1000,
+            requests=len(latencies), concurrency=concurrency
+        )
+
+    results = {}
+    try:
+        await api.get_device_status(device_ids[0])  # Zahřátí - TLS/TCP spojení, import thinqconnect
+        for operation in ("status", "command"):
+            for concurrency in concurrency_levels:
+                key = f"api.{operation}.c{concurrency}"
+                results[key] = await run_level(operation, concurrency)
+                print(f"  {operation:<8} c={concurrency:<4} {results[key]['throughput']:>8.0f} req/s, "
+                      f"p50 {results[key]['p50_ms']:.2f} ms, p99 {results[key]['p99_ms']:.2f} ms")
+    finally:
+        await api.close()
+        await simulator.close()
+    return results
+
+
+def bench_api(concurrency_levels=CONCURRENCY_LEVELS, requests_per_level: int = API_REQUESTS,
+              latency: float = 0.0) -> dict:
+    """Latence a propustnost ThinQAPI proti lokálnímu simulátoru"""
+    # Logování INFO by měřilo hlavně výpis na konzoli
+    logging.getLogger("server_api").setLevel(logging.WARNING)
+    logging.getLogger("thinq_simulator").setLevel(logging.WARNING)
+    return asyncio.run(_run_api(concurrency_levels, requests_per_level, latency))
+
+
+# ----------------------------------------------------------------------
+# Porovnání s baseline
+# ----------------------------------------------------------------------
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Porovnání primárních metrik s baseline.
+
+    Returns:
+        list: [(název, baseline, aktuální, relativní zhoršení, regrese?)]
+    """
+    rows = []
+    for name, entry in current.items():
+        base = baseline.get(name)
+        if not base or base.get("primary") != entry["primary"]:
+            continue
+        metric = entry["primary"]
+        old, new = base[metric], entry[metric]
+        if not old:
+            continue
+        # Kladná hodnota = zhoršení (pomalejší, resp. nižší propustnost)
+        change = (old - new) / old if entry["higher_is_better"] else (new - old) / old
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold: float):
+    """Tabulka porovnání s vyznačenými regresemi"""
+    print(f"\n📊 Porovnání s baseline (práh {threshold:.0%}):")
+    for name, old, new, change, regression in rows:
+        mark = "❌ REGRESE" if regression else ("✅" if change < -threshold else "  ")
+        print(f"  {name:<36} {old:>14.2f} -> {new:>14.2f}  {change:+7.1%}  {mark}")
+    regressions = sum(1 for row in rows if row[4])
+    print(f"\n{'❌' if regressions else '✅'} Regresí: {regressions} z {len(rows)} porovnaných")
+    return regressions
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarky LG ThinQ klienta")
+    parser.add_argument("--only", choices=["api", "schedule", "payload"], action="append",
+                        help="Spustit jen vybranou skupinu (lze opakovat)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="Soubor s výsledky (JSON)")
+    parser.add_argument("--compare", help="Baseline (JSON) pro porovnání - regrese = návratový kód 1")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relativní zhoršení považované za regresi (0.25 = 25 %%)")
+    parser.add_argument("--quick", action="store_true", help="Kratší měření (méně přesné)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulátoru (s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    groups = args.only or ["api", "schedule", "payload"]
+    min_time = 0.05 if args.quick else 0.2
+
+    results = {}
+    if "schedule" in groups:
+        print("🗓️ Plánovač")
+        results.update(bench_schedule(SCHEDULE_SIZES[:4] if args.quick else SCHEDULE_SIZES, min_time))
+    if "payload" in groups:
+        print("🔧 Payloady")
+        results.update(bench_payload(min_time))
+    if "api" in groups:
+        print("🌐 API klient (simulátor)")
+        results.update(bench_api(requests_per_level=API_REQUESTS // 5 if args.quick else API_REQUESTS,
+                                 latency=args.latency))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "latency": args.latency
+        },
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Výsledky uloženy: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline.get("results", {}), results, args.threshold)
+        if print_comparison(rows, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptivní interval kontroly stavu zařízení (GUI i daemon).
+
+Místo pevných 5 minut se interval řídí kontextem:
+    - po příkazu se stav kontroluje rychle (min_interval) a interval
+      pak exponenciálně roste - rychlé potvrzení, že příkaz zabral
+    - změna stavu zvenku (dálkový ovladač, jiná aplikace) interval zkrátí
+      na activity_interval
+    - stabilní stav interval násobí koeficientem decay až ke stropu:
+      on_interval při zapnutém zařízení, off_interval při vypnutém
+      (v noci s vypnutou klimatizací skoro žádné dotazy)
+    - před známým přechodem plánu se stav načte transition_lead sekund
+      předem a po přechodu znovu (transition_settle s po něm)
+    - při aktivních push zprávách stačí záložní push_interval
+
+Vše v rámci rozpočtu budget_per_hour dotazů za posuvnou hodinu. Do
+rozpočtu se počítá každý dotaz na stav (i kontroly potvrzení příkazů
+a dorovnání plánu - ThinQAPI.on_status_fetch), kontroly potvrzení při
+vyčerpaném rozpočtu čtou jen cache (has_budget).
+
+config.json:
+    "polling": {"min_interval": 15, "on_interval": 600, "off_interval": 3600,
+                "budget_per_hour": 60}
+"""
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHECK_INTERVAL = 300      # Výchozí interval kontroly stavu (s) - 5 minut
+PUSH_FALLBACK_INTERVAL = 1800    # Záložní kontrola při aktivních push zprávách (s) - 30 minut
+
+DEFAULT_POLLING = {
+    "min_interval": 15,          # Nejkratší interval - hned po příkazu (s)
+    "activity_interval": 60,     # Interval po změně stavu zvenku (s)
+    "on_interval": 600,          # Strop při zapnutém a stabilním zařízení (s)
+    "off_interval": 3600,        # Strop při vypnutém a stabilním zařízení (s)
+    "push_interval": PUSH_FALLBACK_INTERVAL,
+    "decay": 2.0,                # Násobek intervalu po každém nezměněném stavu
+    "transition_lead": 60,       # Kontrola před přechodem plánu (s)
+    "transition_settle": 20,     # Kontrola po přechodu plánu (s)
+    "budget_per_hour": 60,       # Max. počet dotazů za posuvnou hodinu
+}
+
+
+class AdaptivePollScheduler:
+    """Výpočet zpoždění další kontroly stavu podle aktivity, plánu a rozpočtu"""
+
+    def __init__(self, config: dict = None, initial_interval: float = STATUS_CHECK_INTERVAL):
+        """
+        Args:
+            config: Sekce "polling" z config.json (chybějící klíče = DEFAULT_POLLING)
+            initial_interval: Interval před prvním porovnáním stavu (s)
+        """
+        self.configure(config)
+        self.interval = float(initial_interval)
+        self.push_connected = False
+        self.last_status = None
+        self.polls = deque()            # Časy dotazů za poslední hodinu (monotonic)
+        self.last_reason = "start"
+
+    def configure(self, config: dict = None):
+        """Nastavení z config.json - stav (interval, rozpočet) zůstává"""
+        settings = {**DEFAULT_POLLING, **(config or {})}
+        self.min_interval = float(settings["min_interval"])
+        self.activity_interval = float(settings["activity_interval"])
+        self.on_interval = float(settings["on_interval"])
+        self.off_interval = float(settings["off_interval"])
+        self.push_interval = float(settings["push_interval"])
+        self.decay = max(1.0, float(settings["decay"]))
+        self.transition_lead = float(settings["transition_lead"])
+        self.transition_settle = float(settings["transition_settle"])
+        self.budget_per_hour = max(1, int(settings["budget_per_hour"]))
+
+    # ------------------------------------------------------------------
+    # Události
+    # ------------------------------------------------------------------
+    def notify_command(self):
+        """Odeslán příkaz - rychlé potvrzení nového stavu"""
+        self.interval = self.min_interval
+        self.last_status = None  # Další stav se nebere jako "stabilní"
+
+    def set_push_connected(self, connected: bool):
+        """Push zprávy aktivní/neaktivní"""
+        self.push_connected = connected
+
+    def record_poll(self, now: float = None):
+        """Započtení dotazu na API do rozpočtu"""
+        self.polls.append(time.monotonic() if now is None else now)
+
+    def has_budget(self, now: float = None) -> bool:
+        """Zbývá v rozpočtu aspoň jeden dotaz (za posuvnou hodinu)"""
+        now = time.monotonic() if now is None else now
+        self._prune(now)
+        return len(self.polls) < self.budget_per_hour
+
+    def _prune(self, now: float):
+        """Odebrání dotazů starších než hodina"""
+        while self.polls and now - self.polls[0] >= 3600:
+            self.polls.popleft()
+
+    def record_status(self, status: Optional[dict]):
+        """
+        Výsledek kontroly - stabilní stav interval prodlouží, změna zkrátí.
+
+        Args:
+            status: Stav zařízení (None = chyba, interval se nemění)
+        """
+        if status is None:
+            return
+        ceiling = self.on_interval if is_powered_on(status) else self.off_interval
+        if self.last_status is None:
+            # První stav nebo potvrzení po příkazu - pokračuje se v rozjezdu z min_interval
+            self.interval = min(self.interval * self.decay, ceiling)
+        elif status != self.last_status:
+            self.interval = min(self.activity_interval, ceiling)
+        else:
+            self.interval = min(self.interval * self.decay, ceiling)
+        self.last_status = status
+
+    # ------------------------------------------------------------------
+    # Výpočet
+    # ------------------------------------------------------------------
+    def next_delay(self, seconds_to_transition: float = None, now: float = None) -> float:
+        """
+        Zpoždění další kontroly stavu (s).
+
+        Args:
+            seconds_to_transition: Sekundy do dalšího začátku/konce plánu (None = žádný)
+            now: Aktuální čas (time.monotonic) - pro testy
+        """
+        now = time.monotonic() if now is None else now
+        if self.push_connected:
+            delay, reason = self.push_interval, "push"
+        else:
+            delay, reason = self.interval, "interval"
+            if seconds_to_transition is not None:
+                before = seconds_to_transition - self.transition_lead
+                after = seconds_to_transition + self.transition_settle
+                if 0 < before < delay:
+                    delay, reason = before, "před plánem"
+                elif before <= 0 and after < delay:
+                    delay, reason = after, "po přechodu plánu"
+        delay = max(delay, self.min_interval)
+
+        # Rozpočet - při vyčerpání počkat, až nejstarší dotaz vypadne z okna
+        self._prune(now)
+        if len(self.polls) >= self.budget_per_hour:
+            budget_delay = self.polls[len(self.polls) - self.budget_per_hour] + 3600 - now
+            if budget_delay > delay:
+                delay, reason = budget_delay, "rozpočet"
+
+        self.last_reason = reason
+        return delay
+
+    def stats(self):
+        """Stav pro diagnostiku"""
+        return {
+            "interval": self.interval,
+            "polls_last_hour": len(self.polls),
+            "budget_per_hour": self.budget_per_hour,
+            "push_connected": self.push_connected,
+            "last_reason": self.last_reason
+        }
+
+
+def is_powered_on(status: dict) -> bool:
+    """Zařízení zapnuté podle operation.airConOperationMode"""
+    return status.get("operation", {}).get("airConOperationMode") == "POWER_ON"
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Potvrzování příkazů podle skutečného stavu zařízení.
+
+Z payloadu příkazu se odvodí očekávaná pole stavu (např.
+{"temperature": {"targetTemperature": 22}} -> "temperature.targetTemperature"
+= 22). Po odeslání se stav kontroluje s krátkým rostoucím odstupem, dokud
+zařízení pole nenahlásí (potvrzeno), nebo nevyprší lhůta (selhalo).
+Mezitím může GUI zobrazit očekávaný stav optimisticky.
+
+Pole, která zařízení nehlásí (jen "w" v profilu, např. časovače), se
+neověřují. Novější příkaz na stejné pole převezme jeho očekávání - starší
+příkaz se pak pro toto pole za selhání nepovažuje.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+from status_diff import flatten_status
+from server_api import merge_status
+
+logger = logging.getLogger(__name__)
+
+CONFIRM_TIMEOUT = 20.0      # Lhůta pro potvrzení příkazu (s)
+FIRST_CHECK_DELAY = 1.0     # První kontrola stavu po odeslání (s)
+MAX_CHECK_DELAY = 5.0       # Max. odstup kontrol (s)
+CHECK_BACKOFF = 1.6         # Násobek odstupu po každé kontrole
+LATENCY_HISTORY = 200       # Počet uchovaných latencí potvrzení
+
+# Zapisovatelná pole, jejichž hodnotu zařízení hlásí pod jiným názvem
+REPORTED_AS = {
+    "temperature.coolTargetTemperature": "temperature.targetTemperature",
+    "temperature.heatTargetTemperature": "temperature.targetTemperature",
+    "temperature.autoTargetTemperature": "temperature.targetTemperature",
+}
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+UNVERIFIED = "unverified"
+
+
+def expected_fields(payload: dict, profile: dict = None) -> Dict[str, object]:
+    """
+    Očekávaná pole stavu po provedení příkazu.
+
+    Args:
+        payload: Payload příkazu (stejný formát jako stav zařízení)
+        profile: Profil zařízení - pole bez "r" v mode se vynechají
+
+    Returns:
+        dict: cesta -> hodnota, např. {"airFlow.windStrength": "LOW"}
+    """
+    properties = (profile or {}).get("property", {})
+    expected = {}
+    for path, value in flatten_status(payload).items():
+        reported = REPORTED_AS.get(path, path)
+        if properties:
+            resource, _, name = reported.partition(".")
+            prop = properties.get(resource, {}).get(name)
+            if not isinstance(prop, dict) or "r" not in prop.get("mode", []):
+                continue
+        expected[reported] = value
+    return expected
+
+
+def values_match(expected, reported) -> bool:
+    """Shoda hodnoty - čísla číselně (22 == 22.0), ostatní přesně"""
+    if isinstance(expected, (int, float)) and isinstance(reported, (int, float)) \
+            and not isinstance(expected, bool) and not isinstance(reported, bool):
+        return abs(expected - reported) < 0.01
+    return expected == reported
+
+
+def is_reported(payload: dict, status: Optional[dict], profile: dict = None) -> bool:
+    """
+    Zařízení už hlásí stav, který by payload nastavil (odeslání by nic nezměnilo).
+
+    Returns:
+        bool: False i pro neznámý stav nebo payload bez ověřitelných polí
+    """
+    if status is None:
+        return False
+    expected = expected_fields(payload or {}, profile)
+    flat = flatten_status(status)
+    return bool(expected) and all(values_match(value, flat.get(path))
+                                  for path, value in expected.items())
+
+
+class CommandCompletion:
+    """Jeden sledovaný příkaz"""
+
+    def __init__(self, name: str, payload: dict, expected: Dict[str, object]):
+        self.name = name
+        self.payload = payload
+        self.expected = dict(expected)
+        self.state = PENDING
+        self.sent_at = time.monotonic()
+        self.latency: Optional[float] = None
+        self.mismatched: Dict[str, object] = {}  # cesta -> poslední hlášená hodnota
+        self.checks = 0
+        self._finished: Optional[asyncio.Event] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state != PENDING
+
+    async def finished(self) -> "CommandCompletion":
+        """Čekání na výsledek (potvrzení běží jinde - zrušení čekání ho nepřeruší)"""
+        if not self.done:
+            if self._finished is None:
+                self._finished = asyncio.Event()
+            await self._finished.wait()
+        return self
+
+    def check(self, status: dict) -> bool:
+        """Porovnání se stavem - True pokud zařízení hlásí všechna očekávaná pole"""
+        flat = flatten_status(status)
+        self.mismatched = {path: flat.get(path) for path, value in self.expected.items()
+                           if not values_match(value, flat.get(path))}
+        return not self.mismatched
+
+
+class CommandTracker:
+    """Potvrzování příkazů jednoho zařízení podle hlášeného stavu"""
+
+    def __init__(self, api, device_id: str, profile: dict = None,
+                 timeout: float = CONFIRM_TIMEOUT, budget=None):
+        """
+        Args:
+            api: ThinQAPI (get_device_status s max_age)
+            device_id: ID zařízení
+            profile: Profil zařízení (která pole zařízení hlásí)
+            timeout: Lhůta pro potvrzení (s)
+            budget: Rozpočet dotazů (AdaptivePollScheduler.has_budget) - při vyčerpání jen cache
+        """
+        self.api = api
+        self.device_id = device_id
+        self.profile = profile or {}
+        self.timeout = timeout
+        self.budget = budget
+        self._owners: Dict[str, CommandCompletion] = {}  # cesta -> poslední příkaz na toto pole
+
+        # Statistiky
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self.counts = {CONFIRMED: 0, FAILED: 0, SUPERSEDED: 0, UNVERIFIED: 0}
+
+    def begin(self, name: str, payload: dict) -> CommandCompletion:
+        """Registrace příkazu před odesláním - převezme očekávání starších příkazů na stejná pole"""
+        completion = CommandCompletion(name, payload, expected_fields(payload, self.profile))
+        for path in completion.expected:
+            previous = self._owners.get(path)
+            if previous and not previous.done:
+                previous.expected.pop(path, None)
+                if not previous.expected:
+                    self._finish(previous, SUPERSEDED)
+            self._owners[path] = completion
+        if not completion.expected:
+            self._finish(completion, UNVERIFIED)
+        return completion
+
+    def overlay(self, status: dict) -> dict:
+        """Stav zařízení s očekávanými hodnotami nepotvrzených příkazů (optimistické zobrazení)"""
+        if not self._owners:
+            return status
+        overlay = {}
+        for path, completion in list(self._owners.items()):  # Volá se i z vlákna GUI
+            if path in completion.expected:
+                resource, _, name = path.partition(".")
+                overlay.setdefault(resource, {})[name] = completion.expected[path]
+        return merge_status(status, overlay)
+
+    def abandon(self, completion: CommandCompletion):
+        """Příkaz se nepodařilo odeslat - nic se nečeká"""
+        self._finish(completion, FAILED)
+
+    async def wait(self, completion: CommandCompletion) -> CommandCompletion:
+        """
+        Čekání na potvrzení - kontroly stavu s rostoucím odstupem až do lhůty.
+
+        Stav z cache (push zpráva) se použije, pokud je mladší než odstup kontrol,
+        jinak se načte z API (souběžné kontroly sdílí jeden dotaz). Při
+        vyčerpaném rozpočtu dotazů se čte jen cache (potvrdí push zpráva
+        nebo pravidelná kontrola stavu).
+        """
+        delay = FIRST_CHECK_DELAY
+        deadline = completion.sent_at + self.timeout
+        while not completion.done:
+            now = time.monotonic()
+            if now >= deadline:
+                self._finish(completion, FAILED)
+                break
+            await asyncio.sleep(min(delay, deadline - now))
+            if completion.done:
+                break  # Převzato novějším příkazem
+
+            max_age = delay
+            if self.budget is not None and not self.budget.has_budget():
+                max_age = float("inf")  # Rozpočet vyčerpán - bez nového dotazu na API
+            try:
+                status = await self.api.get_device_status(self.device_id, max_age=max_age)
+            except Exception as e:
+                logger.warning(f"Kontrola příkazu {completion.name} selhala: {e}")
+                status = None
+            completion.checks += 1
+            if status is not None and completion.check(status):
+                self._finish(completion, CONFIRMED)
+            delay = min(delay * CHECK_BACKOFF, MAX_CHECK_DELAY)
+        return completion
+
+    def _finish(self, completion: CommandCompletion, state: str):
+        if completion.done:
+            return
+        completion.state = state
+        completion.latency = time.monotonic() - completion.sent_at
+        if completion._finished is not None:
+            completion._finished.set()
+        for path, owner in list(self._owners.items()):
+            if owner is completion:
+                del self._owners[path]
+        self.counts[state] = self.counts.get(state, 0) + 1
+
+        if state == CONFIRMED:
+            self.latencies.append(completion.latency)
+            logger.info(f"✅ Příkaz {completion.name} potvrzen za {completion.latency:.1f}s "
+                        f"({completion.checks} kontrol)")
+        elif state == FAILED and completion.mismatched:
+            logger.warning(f"⚠️ Příkaz {completion.name} nepotvrzen: zařízení hlásí {completion.mismatched}")
+
+    def stats(self):
+        """Počty podle výsledku a latence potvrzení (s)"""
+        latencies = sorted(self.latencies)
+        return {
+            **self.counts,
+            "latency_median": latencies[len(latencies) // 2] if latencies else None,
+            "latency_max": latencies[-1] if latencies else None
+        }
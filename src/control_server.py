@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Lokální řídicí socket dlouho běžícího procesu (daemon).
+CLI volání se připojí k již zahřátému ThinQAPI spojení místo toho,
+aby pokaždé načítalo konfiguraci a navazovalo nové TLS spojení.
+
+Protokol: jeden JSON požadavek na řádek, jedna JSON odpověď na řádek.
+    {"op": "status", "device_id": "...", "max_age": 10}
+    {"op": "command", "device_id": "...", "command": "power_on", "lane": "interactive"}
+    {"op": "devices"}
+    {"op": "health"}
+    {"op": "ping"}
+
+Na POSIX systémech se používá Unix domain socket (data/control.sock),
+na Windows loopback TCP (127.0.0.1:8765). Adresu lze změnit proměnnou
+prostředí THINQ_CONTROL_SOCKET.
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = Path(__file__).parent.parent / "data" / "control.sock"
+DEFAULT_TCP_ADDRESS = ("127.0.0.1", 8765)
+REQUEST_TIMEOUT = 30  # s
+
+
+def use_unix_socket():
+    """Unix domain socket je k dispozici mimo Windows"""
+    return sys.platform != "win32" and hasattr(asyncio, "open_unix_connection")
+
+
+def control_address():
+    """
+    Adresa řídicího socketu - lze přepsat proměnnou prostředí THINQ_CONTROL_SOCKET
+    (cesta k Unix socketu, nebo host:port pro TCP).
+
+    Returns:
+        str | tuple: Cesta k Unix socketu, nebo (host, port)
+    """
+    override = os.environ.get("THINQ_CONTROL_SOCKET")
+    if override:
+        host, sep, port = override.rpartition(":")
+        if sep and port.isdigit():
+            return host or DEFAULT_TCP_ADDRESS[0], int(port)
+        return override
+    if use_unix_socket():
+        return str(DEFAULT_SOCKET_PATH)
+    return DEFAULT_TCP_ADDRESS
+
+
+class ControlServer:
+    """Řídicí server - požadavky předává handleru běžícího procesu"""
+
+    def __init__(self, handler: Callable[[dict], Awaitable[dict]], address=None):
+        """
+        Args:
+            handler: Async funkce request(dict) -> response(dict)
+            address: Cesta k Unix socketu nebo (host, port); None = výchozí
+        """
+        self.handler = handler
+        self.address = address or control_address()
+        self.server = None
+        self.clients = set()
+
+    async def start(self):
+        """Spuštění serveru"""
+        if isinstance(self.address, str):
+            # Pozůstatek po předchozím běhu
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self.server = await asyncio.start_unix_server(self._handle_client, path=self.address)
+            os.chmod(self.address, 0o600)  # Pouze vlastník
+        else:
+            host, port = self.address
+            self.server = await asyncio.start_server(self._handle_client, host, port)
+        logger.info(f"🔌 Řídicí socket naslouchá na {self.address}")
+        return self
+
+    async def _handle_client(self, reader, writer):
+        """Obsluha jednoho klienta - může poslat více požadavků za sebou"""
+        self.clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    response = await self.handler(request)
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def close(self):
+        """Zastavení serveru a úklid Unix socketu"""
+        for writer in list(self.clients):
+            writer.close()
+        await asyncio.sleep(0)  # Handlery klientů dočtou EOF a skončí
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+async def control_request(request: dict, address=None, timeout: float = REQUEST_TIMEOUT):
+    """
+    Odeslání požadavku běžícímu daemonu.
+
+    Returns:
+        dict: Odpověď daemonu
+
+    Raises:
+        ConnectionError: Daemon neběží (socket neexistuje / odmítá spojení)
+    """
+    address = address or control_address()
+    try:
+        if isinstance(address, str):
+            reader, writer = await asyncio.open_unix_connection(address)
+        else:
+            reader, writer = await asyncio.open_connection(*address)
+    except (OSError, ValueError) as e:
+        raise ConnectionError(f"Řídicí socket {address} není dostupný: {e}") from e
+
+    try:
+        writer.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line:
+            raise ConnectionError("Daemon ukončil spojení bez odpovědi")
+        return json.loads(line)
+    finally:
+        writer.close()
+        await writer.wait_closed()
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Headless daemon režim - plánovač, kontrola stavu a odesílání příkazů
+na čisté asyncio smyčce s jedním dlouho žijícím ThinQAPI spojením.
+Neimportuje tkinter, lze spustit na serveru bez grafického prostředí:
+
+    python src/main.py --mode daemon
+"""
+import signal
+import asyncio
+import logging
+from datetime import datetime
+
+from server_api import ThinQAPI
+from klima_logic import create_command_payload, parse_cli_command
+from control_server import ControlServer
+from schedule_logic import CompiledSchedule, SCHEDULE_FILE, merge_entries
+from schedule_store import load_entries, journal_path
+from file_watcher import FileWatcher
+from fleet import DEVICES_FILE, load_devices
+from adaptive_poll import AdaptivePollScheduler, STATUS_CHECK_INTERVAL
+from command_tracker import CommandTracker
+from schedule_pipeline import SchedulePipeline
+from reconciler import Reconciler, desired_from_entry
+from device_actor import INTERACTIVE, LANES
+from profile_validator import DEFAULT_MODEL, PROFILE_FILE, invalidate, load_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEVICE_ID = "ef279add7b418795378e9d20631cd85d86aa5e356a7e4599584434c4ead89c4e"
+MAX_SCHEDULE_SLEEP = 3600    # Max. spánek plánovače (s) - pojistka proti posunu hodin
+
+
+class ClimateDaemon:
+    """Plánovač a kontrola stavu bez GUI"""
+
+    def __init__(self, device_id: str = None, status_interval: float = STATUS_CHECK_INTERVAL):
+        self.device_id = device_id or DEFAULT_DEVICE_ID
+        self.poll_scheduler = AdaptivePollScheduler(initial_interval=status_interval)
+        self._poll_wakeup = None
+        self.api = None
+        self.command_tracker = None
+        self._confirmations = set()  # Běžící čekání na potvrzení příkazů (reference drží úlohy naživu)
+        self.schedule_pipeline = None
+        self.reconciler = None
+        self.last_device_status = None
+        self.schedule = CompiledSchedule([])
+        self.devices = []
+        self.file_watcher = None
+        self._schedule_wakeup = None
+        self.last_executed_schedule = None
+        self.schedule_was_active_last_check = False
+        self._stop_event = None
+        self.control_server = None
+
+    async def run(self):
+        """Hlavní smyčka daemonu - běží do stop() nebo SIGINT/SIGTERM"""
+        self._stop_event = asyncio.Event()
+        self._install_signal_handlers()
+
+        self.api = ThinQAPI()
+        await self.api.initialize()
+        self.poll_scheduler.configure(self.api.config.get("polling"))
+        self.api.on_status_fetch = self.poll_scheduler.record_poll  # Všechny dotazy do rozpočtu
+        # Profil - které pole zařízení hlásí (časovače jen zapisuje) a kontrola payloadů
+        profile = load_profile()
+        self.command_tracker = CommandTracker(self.api, self.device_id, profile, budget=self.poll_scheduler)
+        self.schedule_pipeline = SchedulePipeline(self.execute_command, self.command_tracker)
+        self.reconciler = Reconciler(self.api)
+        self.reconciler.register(self.device_id, self.schedule_pipeline)
+        self._poll_wakeup = asyncio.Event()
+        self.schedule = CompiledSchedule(load_entries())
+        self.devices = load_devices()
+        self.api.register_devices(self.devices)
+        if profile is not None:  # Lokální data/device_profile.json patří hlavnímu zařízení
+            self.api.register_device_profile(self.device_id, profile, DEFAULT_MODEL)
+        self._schedule_wakeup = asyncio.Event()
+        self.file_watcher = self._create_file_watcher().start()
+        
+        # Řídicí socket pro CLI (--mode cli využije zahřáté spojení)
+        try:
+            self.control_server = await ControlServer(self.handle_control_request).start()
+        except OSError as e:
+            logger.warning(f"Řídicí socket nelze spustit: {e}")
+        logger.info(f"🚀 Daemon spuštěn (zařízení {self.device_id[:8]}..., plánů: {len(self.schedule.entries)})")
+
+        tasks = [
+            asyncio.create_task(self._status_loop()),
+            asyncio.create_task(self._schedule_loop())
+        ]
+        try:
+            await self._stop_event.wait()
+        finally:
+            tasks.extend(self._confirmations)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.file_watcher.stop()
+            if self.control_server:
+                await self.control_server.close()
+            await self.api.close()
+            logger.info("🛑 Daemon ukončen")
+
+    def stop(self):
+        """Požadavek na ukončení daemonu"""
+        if self._stop_event:
+            self._stop_event.set()
+
+    def _install_signal_handlers(self):
+        """Ukončení na SIGINT/SIGTERM (na Windows není podporováno - zůstává KeyboardInterrupt)"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    def _create_file_watcher(self):
+        """Hot reload plánů (snapshot i žurnál z GUI), seznamu zařízení a profilu zařízení"""
+        watcher = FileWatcher()
+        for path in (SCHEDULE_FILE, journal_path(SCHEDULE_FILE)):
+            watcher.watch(path, self.on_schedule_reloaded, loader=lambda _: load_entries())
+        watcher.watch(DEVICES_FILE, self.on_devices_reloaded, loader=load_devices)
+        watcher.watch(PROFILE_FILE, self.on_device_profile_changed, loader=load_profile)
+        return watcher
+
+    def on_schedule_reloaded(self, entries):
+        """Výměna zkompilovaného plánu - nezměněné plány zůstávají stejné objekty"""
+        merged, changed = merge_entries(self.schedule.entries, entries)
+        if not changed and [e.id for e in merged] == [e.id for e in self.schedule.entries]:
+            return
+        self.schedule = CompiledSchedule(merged)
+        logger.info(f"📅 Plány načteny znovu ({len(merged)} položek, změněno {changed})")
+        # Probudit plánovač i kontrolu stavu - spí do přechodu podle starého plánu
+        self._schedule_wakeup.set()
+        self._poll_wakeup.set()
+
+    def on_devices_reloaded(self, devices):
+        """Nový seznam zařízení z devices.json"""
+        self.devices = devices
+        self.api.register_devices(devices)
+        logger.info(f"📱 Seznam zařízení načten znovu ({len(devices)} zařízení)")
+
+    def on_device_profile_changed(self, profile):
+        """Nový data/device_profile.json - kontrola payloadů a hlášená pole podle nového profilu"""
+        if profile is None:
+            return  # Rozepsaný / neplatný soubor - zůstává předchozí profil
+        invalidate(DEFAULT_MODEL)
+        self.api.register_device_profile(self.device_id, profile, DEFAULT_MODEL)
+        self.command_tracker.profile = profile
+        logger.info("📋 Profil zařízení načten znovu")
+
+    async def _status_loop(self):
+        """Kontrola stavu s adaptivním intervalem (zkrácení po příkazu a kolem přechodů plánu)"""
+        while True:
+            self._poll_wakeup.clear()
+            status = await self.update_device_status()
+            self.poll_scheduler.record_status(status)
+            await self._sleep_until_next_poll()
+
+    async def _sleep_until_next_poll(self):
+        """Spánek do další kontroly - probuzení při příkazu nebo změně plánu přepočítá zpoždění"""
+        while True:
+            seconds_to_transition = None
+            if self.schedule.entries:
+                seconds_to_transition = self.schedule.seconds_until_next_transition(datetime.now())
+            delay = self.poll_scheduler.next_delay(seconds_to_transition)
+            logger.debug(f"Další kontrola stavu za {delay:.0f}s ({self.poll_scheduler.last_reason})")
+
+            wakeup = asyncio.ensure_future(self._poll_wakeup.wait())
+            try:
+                done, _ = await asyncio.wait({wakeup}, timeout=delay)
+            finally:
+                wakeup.cancel()
+            if not done:
+                return
+            self._poll_wakeup.clear()
+
+    def notify_command_sent(self):
+        """Příkaz odeslán - zrychlit kontrolu stavu"""
+        self.poll_scheduler.notify_command()
+        if self._poll_wakeup:
+            self._poll_wakeup.set()
+
+    async def _schedule_loop(self):
+        """Plánovač - spí přesně do dalšího začátku/konce plánu"""
+        while True:
+            try:
+                await self.check_schedule(datetime.now())
+            except Exception as e:
+                logger.error(f"Chyba při kontrole plánů: {e}")
+            delay = self.schedule.seconds_until_next_transition(datetime.now())
+            self._schedule_wakeup.clear()
+            wakeup = asyncio.ensure_future(self._schedule_wakeup.wait())
+            try:
+                await asyncio.wait({wakeup}, timeout=min(delay + 0.05, MAX_SCHEDULE_SLEEP))
+            finally:
+                wakeup.cancel()
+
+    async def update_device_status(self):
+        """Aktualizace stavu zařízení"""
+        try:
+            status = await self.api.get_device_status(self.device_id)
+            if status != self.last_device_status:
+                self.last_device_status = status
+                power = status.get("operation", {}).get("airConOperationMode", "?")
+                mode = status.get("airConJobMode", {}).get("currentJobMode", "?")
+                temp = status.get("temperature", {}).get("currentTemperature", "?")
+                logger.info(f"📋 Stav: {power}, Režim: {mode}, Teplota: {temp}°C")
+            return status
+        except Exception as e:
+            logger.error(f"Chyba při aktualizaci stavu: {e}")
+            return None
+
+    async def execute_command(self, command: str, *args, lane: int = INTERACTIVE):
+        """
+        Odeslání pojmenovaného příkazu (stejné názvy jako v GUI).
+
+        Args:
+            lane: Prioritní pruh fronty zápisů (device_actor) - plán posílá SCHEDULE
+
+        Returns:
+            CommandCompletion: Sledování potvrzení (běží dál na pozadí), None pro neznámý příkaz
+        """
+        status = self.api.device_cache.get(self.device_id)  # Režim pro rozsah teploty
+        if command == "toggle_power":
+            status = await self.api.get_device_status(self.device_id, max_age=5)
+
+        # Kontrola podle profilu zařízení ještě před sledováním - tracker čeká na odeslané hodnoty
+        validator = await self.api.payload_validator(self.device_id)
+        payload = create_command_payload(command, *args, current_status=status, validator=validator)
+        if payload is None:
+            return None
+
+        completion = self.command_tracker.begin(command, payload)
+        try:
+            result = await self.api.send_device_command(self.device_id, payload, lane, validated=True)
+        except Exception:
+            self.command_tracker.abandon(completion)
+            raise
+        logger.info(f"Příkaz {command} úspěšně odeslán: {result}")
+        self.notify_command_sent()
+        confirmation = asyncio.ensure_future(self.command_tracker.wait(completion))
+        self._confirmations.add(confirmation)
+        confirmation.add_done_callback(self._on_confirmation_done)
+        return completion
+
+    async def handle_control_request(self, request: dict):
+        """Vyřízení požadavku z řídicího socketu (viz control_server)"""
+        op = request.get("op")
+        device_id = request.get("device_id") or self.device_id
+
+        if op == "ping":
+            return {"ok": True}
+
+        if op == "devices":
+            return {"ok": True, "devices": self.devices}
+
+        if op == "health":
+            return {"ok": True, "resilience": self.api.resilience_stats(),
+                    "polling": self.poll_scheduler.stats(), "schedule": self.schedule_pipeline.stats(),
+                    "reconciler": self.reconciler.stats(),
+                    "command_queues": self.api.command_queue_stats(),
+                    "rate_limit": self.api.rate_limit_stats(), "cache": self.api.cache_stats()}
+
+        if op == "status":
+            status = await self.api.get_device_status(device_id, max_age=request.get("max_age"))
+            return {"ok": True, "status": status}
+
+        if op == "command":
+            command = request.get("command", "")
+            if command.lower().startswith("temp_"):
+                # Rozsah teploty podle aktuálního režimu (send_device_command čte režim z cache)
+                await self.api.get_device_status(device_id, max_age=5)
+            payload = parse_cli_command(command)
+            if payload is None:
+                # Pojmenované příkazy jako v GUI (set_wind_strength, ...)
+                payload = create_command_payload(command, *request.get("args", []))
+            if payload is None:
+                return {"ok": False, "error": f"Neznámý příkaz: {command}"}
+            lane = LANES.get(request.get("lane"), INTERACTIVE)  # Skripty mohou posílat "bulk"
+            result = await self.api.send_device_command(device_id, payload, lane)
+            if device_id == self.device_id:
+                self.notify_command_sent()
+            return {"ok": True, "result": result}
+
+        return {"ok": False, "error": f"Neznámá operace: {op}"}
+
+    async def check_schedule(self, current_time: datetime):
+        """Spuštění plánu na jeho začátku a vypnutí zařízení na konci"""
+        active_schedule = self.schedule.active_at(current_time)
+
+        if active_schedule:
+            self.schedule_was_active_last_check = True
+
+            if active_schedule is not self.last_executed_schedule:
+                # Začátek plánu, start daemonu během plánu, nebo změna vítěze při překryvu
+                # (např. konec plánu s vyšší prioritou uvnitř delšího plánu) - odešle se jen rozdíl
+                logger.info(f"🕒 Spouštím naplánovaný příkaz: {active_schedule.name} (od {active_schedule.start_time})")
+                self.last_executed_schedule = active_schedule
+                self.execute_scheduled_command(active_schedule)
+            return
+
+        # Detekce konce plánu - pokud předtím byl aktivní a teď není
+        if self.schedule_was_active_last_check and self.last_executed_schedule:
+            if getattr(self.last_executed_schedule, 'power_off_at_end', True):
+                logger.info(f"🔚 Plán '{self.last_executed_schedule.name}' skončil - vypínám zařízení")
+                # Přes pipeline - zruší případné ještě neodeslané kroky plánu
+                self.apply_desired_state(f"{self.last_executed_schedule.name} - konec", {"power": "POWER_OFF"})
+            else:
+                logger.info(f"🔚 Plán '{self.last_executed_schedule.name}' skončil - zařízení zůstává zapnuté")
+
+        self.schedule_was_active_last_check = False
+        self.last_executed_schedule = None
+
+    def execute_scheduled_command(self, schedule_entry):
+        """
+        Provedení plánu na pozadí - odešle se jen to, co zařízení ještě nehlásí.
+        Plánovač neblokuje, takže novější plán (nebo konec plánu) běžící provádění zruší.
+        """
+        return self.apply_desired_state(schedule_entry.name, desired_from_entry(schedule_entry))
+
+    def apply_desired_state(self, name: str, desired: dict):
+        """Dorovnání zařízení do požadovaného stavu na pozadí (běžící dorovnání se zruší)"""
+        self.reconciler.set_desired(self.device_id, **desired)
+        task = self.reconciler.start(self.device_id, name, properties=desired)
+        task.add_done_callback(self._on_reconcile_done)
+        return task
+
+    @staticmethod
+    def _on_reconcile_done(task):
+        """Výsledek dorovnání na pozadí - chyba se zaloguje (nikdo na úlohu nečeká)"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"❌ Chyba při dorovnání plánu: {error}")
+
+    def _on_confirmation_done(self, task):
+        """Konec čekání na potvrzení příkazu - uvolnění reference, chyba se zaloguje"""
+        self._confirmations.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"❌ Chyba při potvrzování příkazu: {error}")
+
+def main(device_id: str = None):
+    """Spuštění daemonu"""
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(ClimateDaemon(device_id).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Fronta zápisů pro každé zařízení (actor) s prioritními pruhy.
+
+Každé zařízení má vlastní asyncio úlohu, která odesílá jeho příkazy
+jeden po druhém v pořadí přijetí - dva zápisy do jedné jednotky se
+nepromíchají. Různá zařízení běží souběžně (společný je jen rate
+limiter zápisů).
+
+Pruhy (nižší číslo = přednost):
+    INTERACTIVE - tlačítka v GUI, CLI
+    SCHEDULE    - kroky plánu
+    BULK        - hromadné změny
+
+Příkaz uživatele předběhne čekající příkazy plánu. Čekající příkaz
+ze stejného nebo nižšího pruhu, jehož všechna pole nastavuje novější
+příkaz, se zahodí (poslední zápis vyhrává) - jinak by po odeslání
+novější změnu přepsal.
+Příkaz, na který už nikdo nečeká (zrušený plán), se neodešle.
+"""
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from status_diff import flatten_status
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+SCHEDULE = 1
+BULK = 2
+
+LANES = {"interactive": INTERACTIVE, "schedule": SCHEDULE, "bulk": BULK}
+
+IDLE_TIMEOUT = 60.0     # Úloha zařízení bez příkazů skončí (s) - další příkaz ji spustí znovu
+
+
+class DeviceActor:
+    """Sériové odesílání příkazů jednoho zařízení"""
+
+    def __init__(self, device_id: str, handler: Callable[[str, dict], Awaitable],
+                 idle_timeout: float = IDLE_TIMEOUT):
+        """
+        Args:
+            device_id: ID zařízení
+            handler: async handler(device_id, payload) - skutečné odeslání
+            idle_timeout: Doba nečinnosti, po které úloha skončí (s)
+        """
+        self.device_id = device_id
+        self.handler = handler
+        self.idle_timeout = idle_timeout
+        self._queue = asyncio.PriorityQueue()
+        self._pending = []      # Čekající položky (pro zahození přepsaných)
+        self._sequence = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistiky
+        self.sent = 0
+        self.superseded = 0
+        self.dropped = 0
+        self.max_queue = 0
+
+    def submit(self, payload: dict, lane: int = INTERACTIVE) -> asyncio.Future:
+        """
+        Zařazení příkazu do fronty.
+
+        Returns:
+            asyncio.Future: Výsledek odeslání (None = přepsán novějším příkazem)
+        """
+        future = asyncio.get_running_loop().create_future()
+        item = [lane, next(self._sequence), payload, future]
+        self._supersede(payload, lane)
+        self._pending.append(item)
+        self._queue.put_nowait(item)
+        self.max_queue = max(self.max_queue, self._queue.qsize())
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return future
+
+    def _supersede(self, payload: dict, lane: int):
+        """Zahození čekajících příkazů stejného a nižších pruhů, které nový příkaz celé přepíše"""
+        fields = set(flatten_status(payload))
+        for queued_lane, _, queued, future in self._pending:
+            if queued_lane >= lane and not future.done() and set(flatten_status(queued)) <= fields:
+                future.set_result(None)
+                self.superseded += 1
+                logger.info(f"⏭️ Čekající příkaz {queued} přepsán novějším příkazem")
+
+    async def _run(self):
+        while True:
+            get = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait({get}, timeout=self.idle_timeout)
+            if not done:
+                get.cancel()
+                if self._queue.empty():
+                    self._task = None
+                    return
+                continue
+
+            item = get.result()
+            self._pending.remove(item)
+            _, _, payload, future = item
+            if future.done():
+                self.dropped += future.cancelled()  # Zrušeno čekajícím (plán), nebo přepsáno
+                continue
+            try:
+                result = await self.handler(self.device_id, payload)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.sent += 1
+                if not future.done():
+                    future.set_result(result)
+
+    def fail_pending(self, error: Exception):
+        """Ukončení - čekající příkazy se neodešlou"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for _, _, _, future in self._pending:
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        self._queue = asyncio.PriorityQueue()
+
+    def stats(self):
+        """Počty odeslaných, přepsaných a zahozených příkazů, délka fronty"""
+        queued = sum(1 for _, _, _, future in self._pending if not future.done())
+        return {"queued": queued, "max_queue": self.max_queue, "sent": self.sent,
+                "superseded": self.superseded, "dropped": self.dropped}
+
+
+class DeviceActors:
+    """Actor pro každé zařízení - zápisy do jednoho zařízení sériově, různá zařízení souběžně"""
+
+    def __init__(self, handler: Callable[[str, dict], Awaitable]):
+        """
+        Args:
+            handler: async handler(device_id, payload) - skutečné odeslání
+        """
+        self.handler = handler
+        self.actors: Dict[str, DeviceActor] = {}
+
+    async def send(self, device_id: str, payload: dict, lane: int = INTERACTIVE):
+        """Odeslání příkazu přes frontu zařízení (čeká na výsledek)"""
+        actor = self.actors.get(device_id)
+        if actor is None:
+            actor = self.actors[device_id] = DeviceActor(device_id, self.handler)
+        return await actor.submit(payload, lane)
+
+    def close(self):
+        """Zastavení všech front (při uzavření API)"""
+        for actor in self.actors.values():
+            actor.fail_pending(ConnectionError("API připojení uzavřeno"))
+
+    def stats(self):
+        """Statistiky front podle zařízení"""
+        return {device_id: actor.stats() for device_id, actor in self.actors.items()}
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Sledování změn datových souborů (schedule.json, devices.json,
+device_profile.json) za běhu aplikace nebo daemonu.
+
+Každých pár sekund se porovná mtime a velikost souboru (os.stat - levné,
+bez čtení obsahu). Teprve při změně se soubor přečte a porovná se CRC32
+obsahu, takže pouhé "touch" nebo přepsání stejným obsahem nic nespustí.
+Čtení a parsování běží mimo asyncio smyčku (asyncio.to_thread).
+"""
+import os
+import json
+import zlib
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+WATCH_INTERVAL = 2.0  # Interval kontroly souborů (s)
+
+
+def read_json_file(path):
+    """Výchozí loader - obsah souboru jako JSON"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class WatchedFile:
+    """Stav jednoho sledovaného souboru"""
+
+    def __init__(self, path, on_change: Callable, loader: Callable = None,
+                 ignore: Callable[[int], bool] = None):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.loader = loader or read_json_file
+        self.ignore = ignore
+        self.signature = self._stat()
+        self.crc = self._crc()
+
+    def _stat(self):
+        """Podpis souboru (mtime_ns, velikost), None pokud neexistuje"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _crc(self) -> Optional[int]:
+        """CRC32 obsahu, None pokud soubor nejde přečíst"""
+        try:
+            return zlib.crc32(self.path.read_bytes())
+        except OSError:
+            return None
+
+
+class FileWatcher:
+    """Sledování souborů podle mtime/velikosti s callbackem při změně obsahu"""
+
+    def __init__(self, interval: float = WATCH_INTERVAL):
+        """
+        Args:
+            interval: Interval kontroly (s)
+        """
+        self.interval = interval
+        self.files = []
+        self.reloads = 0
+        self._task = None
+
+    def watch(self, path, on_change: Callable, loader: Callable = None,
+              ignore: Callable[[int], bool] = None):
+        """
+        Přidání souboru ke sledování.
+
+        Args:
+            path: Cesta k souboru
+            on_change: Callback(data) volaný v asyncio smyčce s výsledkem loaderu
+            loader: Funkce(path) -> data, běží ve vlákně; výchozí čte JSON
+            ignore: Funkce(crc) -> bool; True = vlastní zápis aplikace, nenačítat
+        """
+        self.files.append(WatchedFile(path, on_change, loader, ignore))
+        return self
+
+    def start(self):
+        """Spuštění sledování v běžící asyncio smyčce"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def stop(self):
+        """Zastavení sledování"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """Smyčka kontroly souborů"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Chyba při kontrole souborů: {e}")
+
+    async def check(self):
+        """
+        Jedna kontrola všech souborů.
+
+        Returns:
+            list: Cesty souborů, které byly znovu načteny
+        """
+        reloaded = []
+        for watched in self.files:
+            signature = watched._stat()
+            if signature == watched.signature:
+                continue
+            watched.signature = signature
+            if signature is None:
+                logger.warning(f"Sledovaný soubor {watched.path.name} zmizel")
+                continue
+
+            crc = await asyncio.to_thread(watched._crc)
+            if crc is None or crc == watched.crc:
+                continue  # Stejný obsah (touch, zápis beze změny)
+            watched.crc = crc
+            if watched.ignore and watched.ignore(crc):
+                continue
+
+            try:
+                data = await asyncio.to_thread(watched.loader, watched.path)
+            except Exception as e:
+                # Rozpracovaný zápis zvenku - zkusí se znovu při další změně
+                logger.error(f"❌ Soubor {watched.path.name} nelze načíst: {e}")
+                watched.crc = None
+                continue
+
+            logger.info(f"🔄 Soubor {watched.path.name} se změnil - načten znovu")
+            self.reloads += 1
+            reloaded.append(watched.path)
+            try:
+                watched.on_change(data)
+            except Exception as e:
+                logger.error(f"Chyba při zpracování změny {watched.path.name}: {e}")
+        return reloaded
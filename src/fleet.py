@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Hromadné dotazování stavu všech zařízení (fleet polling).
+Stavy se stahují souběžně přes asyncio.gather s omezením počtu současných dotazů.
+"""
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEVICES_FILE = Path(__file__).parent.parent / "data" / "devices.json"
+DEFAULT_CONCURRENCY = 4
+
+
+def load_devices(devices_file=DEVICES_FILE):
+    """
+    Načtení seznamu zařízení z devices.json.
+
+    Podporuje oba formáty - výstup z API (deviceId + deviceInfo)
+    i zjednodušený formát ze šablony (device_id, alias, type).
+
+    Returns:
+        list: Seznam dict s klíči device_id, alias, type, model_name
+    """
+    try:
+        with open(devices_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Chyba při načítání seznamu zařízení: {e}")
+        return []
+
+    return normalize_devices(data)
+
+
+def normalize_devices(data):
+    """Převod seznamu zařízení (API i šablona) na jednotný formát"""
+    devices = []
+    for item in data or []:
+        if not isinstance(item, dict):
+            continue
+        info = item.get("deviceInfo", {})
+        device_id = item.get("deviceId") or item.get("device_id")
+        if not device_id:
+            continue
+        devices.append({
+            "device_id": device_id,
+            "alias": info.get("alias") or item.get("alias", ""),
+            "type": (info.get("deviceType") or item.get("type", "")).replace("DEVICE_", ""),
+            "model_name": info.get("modelName") or item.get("model_name", "")
+        })
+    return devices
+
+
+class FleetPoller:
+    """Souběžné dotazování stavu více zařízení nad jednou instancí ThinQAPI"""
+
+    def __init__(self, api, devices=None, concurrency=None, device_type=None):
+        """
+        Args:
+            api: Instance ThinQAPI (sdílená session)
+            devices: Seznam zařízení; None = načíst z devices.json
+            concurrency: Max. počet současných dotazů (výchozí z config.json)
+            device_type: Volitelný filtr typu (např. "AIR_CONDITIONER")
+        """
+        self.api = api
+        self.devices = devices
+        self.device_type = device_type
+        if concurrency is None:
+            concurrency = getattr(api, "config", {}).get("fleet_concurrency", DEFAULT_CONCURRENCY)
+        self.concurrency = max(1, int(concurrency))
+
+    async def get_device_list(self):
+        """Seznam zařízení - z devices.json, případně z API přes get_devices()"""
+        if self.devices is None:
+            devices = load_devices()
+            if not devices:
+                logger.info("📋 devices.json je prázdný - načítám seznam zařízení z API")
+                devices = normalize_devices(await self.api.get_devices())
+            self.devices = devices
+
+        if self.device_type:
+            return [d for d in self.devices if d["type"] == self.device_type]
+        return list(self.devices)
+
+    async def poll_all(self):
+        """
+        Souběžné stažení stavu všech zařízení.
+
+        Chyba jednoho zařízení neovlivní ostatní - je vrácena v jeho záznamu.
+
+        Returns:
+            dict: device_id -> {"device", "status", "error", "elapsed"}
+        """
+        devices = await self.get_device_list()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def poll_one(device):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    status = await self.api.get_device_status(device["device_id"])
+                    error = None
+                except Exception as e:
+                    status = None
+                    error = e
+                return device, status, error, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(poll_one(d) for d in devices))
+
+        fleet_status = {}
+        for device, status, error, elapsed in results:
+            fleet_status[device["device_id"]] = {
+                "device": device,
+                "status": status,
+                "error": error,
+                "elapsed": elapsed
+            }
+
+        failed = sum(1 for r in fleet_status.values() if r["error"])
+        logger.info(f"📋 Fleet: {len(devices)} zařízení za {time.perf_counter() - started:.2f}s"
+                    f" (chyb: {failed}, souběžnost: {self.concurrency})")
+        return fleet_status
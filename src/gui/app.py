@@ -8,6 +8,7 @@ from tkinter import ttk, messagebox
 import asyncio
 import threading
 import json
+import time
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -18,24 +19,48 @@ import sys
 # ============================================================================
 # Poznámka: LG ThinQ API má rate limit - příliš časté dotazy mohou být odmítnuty
 # Pro okamžitou aktualizaci použijte tlačítko "🔄 Aktualizovat"
-STATUS_CHECK_INTERVAL = 300000   # Kontrola stavu zařízení (ms) - 300s = 5 minut
-SCHEDULE_CHECK_INTERVAL = 30000  # Kontrola spuštění plánovaných úkolů (ms) - 30s
+# Interval kontroly stavu je adaptivní (adaptive_poll.py, config.json: "polling")
+SCHEDULE_CHECK_INTERVAL = 60000  # Max. pauza mezi kontrolami plánů (ms) - plánovač se jinak
+                                 # probouzí přesně na začátku/konci plánu, minuta stačí pro odpočet
+TOGGLE_STATUS_MAX_AGE = 5        # Max. stáří stavu z cache pro toggle_power a přeskočení splněných příkazů (s)
+ANALYTICS_INTERVAL = 300         # Přepočet dnešních statistik provozu z historie (s)
 # ============================================================================
 
 # Import modulů aplikace
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from server_api import ThinQAPI, send_device_command
-from klima_logic import create_control_payload
+from push_updates import StatusPushListener
+from file_watcher import FileWatcher
+from resilience import OPEN, format_health
+from adaptive_poll import AdaptivePollScheduler
+from command_tracker import CommandTracker, CONFIRMED, FAILED
+from schedule_pipeline import SchedulePipeline
+from device_actor import INTERACTIVE
+from reconciler import Reconciler, command_property, desired_from_entry
+from status_diff import StatusDispatcher
+from klima_logic import create_command_payload
+from profile_validator import DEFAULT_MODEL, invalidate, validator_for
 from gui.theme import setup_dark_theme
 from gui.widgets import LEDIndicator
 from gui.controls import ClimateControls, TimerControls, InfoPanel
 from gui.scheduler import SchedulerWidget
+from gui.bridge import AsyncTkBridge
+from schedule_logic import format_minutes
 
 # Nastavení logování
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DEVICE_ID = "ef279add7b418795378e9d20631cd85d86aa5e356a7e4599584434c4ead89c4e"
+DEVICE_PROFILE_FILE = "data/device_profile.json"
+
+# Pole stavu zobrazovaná ve status baru
+STATUS_BAR_FIELDS = (
+    "runState.currentState",
+    "operation.airConOperationMode",
+    "airConJobMode.currentJobMode",
+    "temperature.currentTemperature",
+)
 
 class ClimateApp(tk.Tk):
     """Hlavní aplikace pro ovládání klimatizace"""
@@ -54,22 +79,40 @@ class ClimateApp(tk.Tk):
         self.api = None
         self.device_profile = self.load_device_profile()
         self.last_device_status = None
-        self.status_check_interval = STATUS_CHECK_INTERVAL
-        self.pending_update = False
+        self.poll_scheduler = AdaptivePollScheduler()
+        self.command_tracker = None  # Potvrzování příkazů podle stavu (vytvoří initialize_api)
+        self._confirmations = set()  # Běžící čekání na potvrzení příkazů (reference drží úlohy naživu)
+        self.schedule_pipeline = None  # Provádění plánů s potvrzováním kroků (vytvoří initialize_api)
+        self.reconciler = None  # Požadovaný stav zařízení (vytvoří initialize_api)
+        self._status_check_job = None
+        self.push_listener = None
+        self.file_watcher = None
+        self._analytics_time = None  # Čas posledního výpočtu statistik (None = nikdy, False = bez numpy)
         
         # Status variable pro globální stav
         self.status_var = tk.StringVar(value="Načítám stav zařízení...")
+        self.api_health_var = tk.StringVar(value="")  # Circuit breaker / opakování API
+        self._api_health_job = None
         
         # Inicializace event loop pro asynchronní operace
         self.loop = asyncio.new_event_loop()
         threading.Thread(target=self.loop.run_forever, daemon=True).start()
         
+        # Jediná cesta výsledků z asyncio vlákna do GUI (fronta + jedna after pumpa)
+        self.bridge = AsyncTkBridge(self, self.loop).start()
+        
         # Vytvoření GUI
         self.create_widgets()
         
         # Spuštění počáteční kontroly stavu
         self.after(100, self.initial_status_check)
         
+        # Push aktualizace stavu (MQTT) - pokud jsou povoleny v config.json
+        self.bridge.submit(self.start_push_updates())
+        
+        # Hot reload plánů a profilu zařízení při změně souborů
+        self.bridge.submit(self.start_file_watcher())
+        
         # Pravidelná kontrola stavu
         self.periodic_status_check()
         
@@ -78,12 +121,13 @@ class ClimateApp(tk.Tk):
         self.last_executed_schedule = None
         self.manual_schedule_override = False  # Příznak pro manuální přerušení plánu
         self.schedule_was_active_last_check = False  # Pro detekci konce plánu
+        self._schedule_check_job = None
         self.periodic_schedule_check()
         
     def load_device_profile(self):
         """Načtení profilu zařízení"""
         try:
-            with open("data/device_profile.json", "r", encoding="utf-8") as f:
+            with open(DEVICE_PROFILE_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
         except Exception as e:
             logger.error(f"Chyba při načítání profilu zařízení: {e}")
@@ -148,6 +192,13 @@ class ClimateApp(tk.Tk):
             )
             self.scheduler_widget.pack(pady=10, padx=10, fill='x')
         
+        # Rozesílání změn stavu - každá část GUI jen pro pole, která zobrazuje
+        self.status_dispatcher = StatusDispatcher()
+        self.status_dispatcher.subscribe(STATUS_BAR_FIELDS, self._update_status_bar)
+        for widget in ("climate_controls", "timer_controls", "info_panel"):
+            if hasattr(self, widget):
+                self.status_dispatcher.subscribe_all(getattr(self, widget).status_subscriptions())
+        
         # Aktualizace scrollovatelné oblasti
         self.scrollable_frame.update_idletasks()
     
@@ -164,6 +215,11 @@ class ClimateApp(tk.Tk):
         status_label = ttk.Label(status_frame, textvariable=self.status_var, font=("Segoe UI", 10))
         status_label.pack(side=tk.LEFT, expand=True, anchor='w')
         
+        # Stav API (circuit breaker, opakování) - prázdné, pokud je vše v pořádku
+        health_label = ttk.Label(status_frame, textvariable=self.api_health_var,
+                                 font=("Segoe UI", 9), foreground="#ffaa00")
+        health_label.pack(side=tk.LEFT, padx=(5, 5))
+        
         # Tlačítko manuální aktualizace
         refresh_btn = ttk.Button(status_frame, text="🔄 Aktualizovat", command=self.manual_refresh)
         refresh_btn.pack(side=tk.RIGHT, padx=(0, 2))
@@ -191,112 +247,135 @@ class ClimateApp(tk.Tk):
         """Inicializace API připojení"""
         if not self.api:
             self.api = ThinQAPI()
+            self.api.resilience.add_listener(
+                lambda stats: self.bridge.call_soon(self._update_api_health, key="api_health"))
+            self.poll_scheduler.configure(self.api.config.get("polling"))
+            self.api.on_status_fetch = self.poll_scheduler.record_poll  # Všechny dotazy do rozpočtu
+            self.command_tracker = CommandTracker(self.api, DEVICE_ID, self.device_profile,
+                                                  budget=self.poll_scheduler)
+            self.schedule_pipeline = SchedulePipeline(self._execute_device_command, self.command_tracker)
+            self.reconciler = Reconciler(self.api)
+            self.reconciler.register(DEVICE_ID, self.schedule_pipeline)
+            if self.device_profile:
+                self.api.register_device_profile(DEVICE_ID, self.device_profile, DEFAULT_MODEL)
             await self.api.initialize()
         return self.api
     
+    def _update_api_health(self):
+        """Zobrazení stavu circuit breakeru a opakování v status baru (odpočet při výpadku)"""
+        if self._api_health_job:
+            self.after_cancel(self._api_health_job)
+            self._api_health_job = None
+        if not self.api:
+            return
+        stats = self.api.resilience_stats()
+        self.api_health_var.set(format_health(stats))
+        if stats["breaker"]["state"] == OPEN:
+            self._api_health_job = self.after(1000, self._update_api_health)
+    
     def handle_device_command(self, command, *args):
         """Zpracování příkazů z GUI komponent"""
         logger.info(f"Příkaz zařízení: {command}, parametry: {args}")
         
-        # Spuštění asynchronního příkazu
-        future = asyncio.run_coroutine_threadsafe(
-            self._execute_device_command(command, *args),
-            self.loop
-        )
-        
-        def handle_result():
-            try:
-                future.result(timeout=10)  # Čekání max 10 sekund
-            except Exception as e:
-                logger.error(f"Chyba při provádění příkazu {command}: {e}")
-                error_msg = str(e)
-                self.after(0, lambda msg=error_msg: messagebox.showerror("Chyba", f"Příkaz {command} selhal: {msg}"))
+        def on_error(error):
+            logger.error(f"Chyba při provádění příkazu {command}: {error}")
+            messagebox.showerror("Chyba", f"Příkaz {command} selhal: {error}")
         
-        threading.Thread(target=handle_result, daemon=True).start()
+        # Spuštění asynchronního příkazu - chyba se doručí do hlavního vlákna přes bridge
+        self.bridge.submit(self._execute_user_command(command, *args), on_error=on_error)
     
-    async def _execute_device_command(self, command, *args):
-        """Asynchronní provádění příkazů zařízení"""
+    async def _execute_user_command(self, command, *args):
+        """Příkaz z GUI - změní požadovaný stav a odešle se jen, pokud ho zařízení ještě nehlásí"""
+        api = await self.initialize_api()
+        desired = command_property(command, *args)
+        if desired:
+            self.reconciler.set_desired(DEVICE_ID, **dict([desired]))
+            status = await api.get_device_status(DEVICE_ID, max_age=TOGGLE_STATUS_MAX_AGE)
+            if self.reconciler.is_satisfied(DEVICE_ID, command, *args, status=status):
+                logger.info(f"Příkaz {command}: zařízení už hlásí požadovaný stav - nic se neodesílá")
+                return None
+        return await self._execute_device_command(command, *args)
+    
+    async def _execute_device_command(self, command, *args, lane=INTERACTIVE):
+        """
+        Asynchronní provádění příkazů zařízení.
+        
+        Args:
+            lane: Prioritní pruh fronty zápisů (device_actor) - plán posílá SCHEDULE
+        
+        Returns:
+            CommandCompletion: Sledování potvrzení (běží dál na pozadí), None pro neznámý příkaz
+        """
         try:
             api = await self.initialize_api()
             
+            status = api.device_cache.get(DEVICE_ID)  # Režim pro rozsah teploty
             if command == "toggle_power":
-                # Nejprve získáme aktuální stav
-                status = await api.get_device_status(DEVICE_ID)
-                
-                # Podle device_profile.json: operation.airConOperationMode pro power stav
-                current_power = status.get("operation", {}).get("airConOperationMode", "POWER_OFF")
-                
-                # Pokud je vypnuté, zapneme. Pokud je zapnuté, vypneme
-                if current_power == "POWER_OFF":
-                    new_state = "POWER_ON"
-                else:  # POWER_ON
-                    new_state = "POWER_OFF"
-                    
-                payload = create_control_payload("power", new_state)
-                logger.info(f"Toggle power: {current_power} -> {new_state}")
-            
-            elif command == "power_on":
-                # NOVÝ: Vždy zajistit zapnutí (nemusíme kontrolovat stav)
-                payload = create_control_payload("power", "POWER_ON")
-                logger.info(f"Power ON příkaz")
+                # Nejprve získáme aktuální stav (stačí několik sekund starý z cache)
+                status = await api.get_device_status(DEVICE_ID, max_age=TOGGLE_STATUS_MAX_AGE)
             
-            elif command == "power_off":
-                # NOVÝ: Vždy zajistit vypnutí
-                payload = create_control_payload("power", "POWER_OFF")
-                logger.info(f"Power OFF příkaz")
-                
-            elif command == "change_mode":
-                mode = args[0]
-                payload = create_control_payload("mode", mode)
-                
-            elif command == "set_temperature":
-                temperature = args[0]
-                # OPRAVA: Pouze teplota bez režimu (fungující řešení)
-                payload = create_control_payload("temperature", temperature)
-                
-            elif command == "set_wind_strength":
-                wind_strength = args[0]
-                payload = create_control_payload("wind_strength", wind_strength)
-                
-            elif command == "set_wind_direction":
-                updown, leftright = args[0], args[1]
-                payload = create_control_payload("wind_direction", updown, leftright)
-                
-            elif command == "set_power_save":
-                enabled = args[0]
-                payload = create_control_payload("power_save", enabled)
-                
-            elif command == "set_sleep_timer":
-                hours, minutes = args[0], args[1]
-                payload = create_control_payload("sleep_timer", hours, minutes)
-                
-            elif command == "cancel_all_timers":
-                payload = create_control_payload("cancel_timers")
-                
-            else:
-                logger.warning(f"Neznámý příkaz: {command}")
+            # Kontrola podle profilu zařízení ještě před sledováním - tracker čeká na odeslané hodnoty
+            validator = await api.payload_validator(DEVICE_ID)
+            payload = create_command_payload(command, *args, current_status=status, validator=validator)
+            if payload is None:
                 return
             
+            # Optimistické zobrazení očekávaného stavu do potvrzení zařízením
+            completion = self.command_tracker.begin(command, payload)
+            self._refresh_gui_status()
+            
             # Odeslání příkazu
-            result = await api.send_device_command(DEVICE_ID, payload)
+            try:
+                result = await api.send_device_command(DEVICE_ID, payload, lane, validated=True)
+            except Exception:
+                self.command_tracker.abandon(completion)
+                self._refresh_gui_status()
+                raise
             logger.info(f"Příkaz {command} úspěšně odeslán: {result}")
             
-            # Pro nastavení teploty čekáme delší dobu na aktualizaci
-            if command == "set_temperature":
-                self.after(3000, lambda: asyncio.run_coroutine_threadsafe(
-                    self.update_device_status(), self.loop
-                ))
-                logger.info("Naplánována aktualizace stavu za 3 sekundy pro temperature")
-            else:
-                # Rychlá aktualizace stavu (po 1 sekundě)
-                self.after(1000, lambda: asyncio.run_coroutine_threadsafe(
-                    self.update_device_status(), self.loop
-                ))
+            # Zrychlená kontrola stavu - potvrzení, že příkaz zabral
+            self.poll_scheduler.notify_command()
+            self.bridge.call_soon(self._schedule_status_check, key="status_check")
+            confirmation = asyncio.ensure_future(self._confirm_command(completion))
+            self._confirmations.add(confirmation)
+            confirmation.add_done_callback(self._on_confirmation_done)
+            return completion
             
         except Exception as e:
             logger.error(f"Chyba při provádění příkazu {command}: {e}")
             raise
 
+    def _on_confirmation_done(self, task):
+        """Konec čekání na potvrzení příkazu - uvolnění reference, chyba se zaloguje"""
+        self._confirmations.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"❌ Chyba při potvrzování příkazu: {error}")
+    
+    async def _confirm_command(self, completion):
+        """Čekání, až zařízení nahlásí očekávaný stav - pak zobrazení skutečného stavu"""
+        await self.command_tracker.wait(completion)
+        
+        status = self.api.device_cache.get(DEVICE_ID)
+        if status is not None:
+            self.last_device_status = status
+        self._refresh_gui_status()
+        
+        if completion.state == FAILED:
+            fields = ", ".join(completion.mismatched) or "stav nedostupný"
+            self.bridge.call_soon(self.status_var.set,
+                                  f"⚠️ Příkaz {completion.name} zařízení nepotvrdilo ({fields})")
+        elif completion.state == CONFIRMED:
+            logger.info(f"Latence potvrzení příkazů: {self.command_tracker.stats()}")
+    
+    def _refresh_gui_status(self):
+        """Překreslení podle posledního stavu + nepotvrzených příkazů (volatelné z asyncio vlákna)"""
+        status = self.last_device_status
+        if status is not None:
+            self.bridge.call_soon(self._update_gui_status, status, key="gui_status")
+    
     def stop_active_schedule(self):
         """Zastavení aktivního plánu"""
         try:
@@ -305,6 +384,7 @@ class ClimateApp(tk.Tk):
                 self.manual_schedule_override = True
                 self.schedule_was_active_last_check = False  # Reset tracking
                 self.last_executed_schedule = None
+                self._cancel_schedule_steps()
                 self.status_var.set("Aktivní plán byl přerušen")
                 self.stop_schedule_btn.config(state='disabled')
                 
@@ -318,126 +398,84 @@ class ClimateApp(tk.Tk):
             self.status_var.set(f"Chyba: {e}")
 
     def execute_scheduled_command(self, schedule_entry):
-        """Provádění naplánovaného příkazu"""
+        """Provádění naplánovaného příkazu - kroky čekají na potvrzení zařízením, nový plán starý zruší"""
         logger.info(f"🎯 Provádím naplánovaný příkaz: {schedule_entry.name}")
+        self._apply_desired_state(schedule_entry.name, desired_from_entry(schedule_entry))
+    
+    def _apply_desired_state(self, name, desired, report_success=True):
+        """Dorovnání zařízení do požadovaného stavu v asyncio smyčce - výsledek do status baru"""
+        def on_done(result):
+            if result.cancelled:
+                return
+            if not result.converged or report_success:
+                self.status_var.set(result.summary())
         
-        try:
-            # Nejdříve zapnout zařízení (pokud je potřeba)
-            if schedule_entry.power_on:
-                logger.info("  ↳ Kontroluji stav a zapínám zařízení pokud je vypnuto")
-                # OPRAVA: Místo toggle_power použijeme power_on pro zajištění zapnutí
-                self.handle_device_command("power_on")
-                
-                # Počkat 3 sekundy, aby se zařízení zapnulo
-                def continue_after_power_on():
-                    try:
-                        # Pak nastavit ostatní parametry
-                        if schedule_entry.mode:
-                            logger.info(f"  ↳ Nastavuji režim: {schedule_entry.mode}")
-                            self.handle_device_command("change_mode", schedule_entry.mode)
-                        
-                        # Další pauza před dalšími příkazy
-                        def set_remaining_params():
-                            try:
-                                if schedule_entry.temperature and schedule_entry.mode != "FAN":
-                                    logger.info(f"  ↳ Nastavuji teplotu: {schedule_entry.temperature}°C")
-                                    # OPRAVA: Odesíláme pouze teplotu bez režimu (fungující řešení)
-                                    self.handle_device_command("set_temperature", schedule_entry.temperature)
-                                
-                                # Další pauza před větrákem
-                                def set_wind_after_temp():
-                                    if schedule_entry.wind:
-                                        logger.info(f"  ↳ Nastavuji sílu větráku: {schedule_entry.wind}")
-                                        self.handle_device_command("set_wind_strength", schedule_entry.wind)
-                                    
-                                    logger.info(f"✅ Plán '{schedule_entry.name}' byl úspěšně proveden")
-                                    self.status_var.set(f"Plán '{schedule_entry.name}' dokončen")
-                                
-                                # Počkat 2 sekundy mezi teplotou a větrem
-                                if schedule_entry.wind:
-                                    self.after(2000, set_wind_after_temp)
-                                else:
-                                    logger.info(f"✅ Plán '{schedule_entry.name}' byl úspěšně proveden")
-                                    self.status_var.set(f"Plán '{schedule_entry.name}' dokončen")
-                                
-                            except Exception as e:
-                                logger.error(f"❌ Chyba při nastavování parametrů plánu '{schedule_entry.name}': {e}")
-                                self.status_var.set(f"Chyba při nastavování: {e}")
-                        
-                        # Počkat dalších 3 sekund před nastavením teploty (místo 2)
-                        self.after(3000, set_remaining_params)
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Chyba při nastavování režimu plánu '{schedule_entry.name}': {e}")
-                        self.status_var.set(f"Chyba při nastavování režimu: {e}")
-                
-                # Počkat 3 sekundy po zapnutí
-                self.after(3000, continue_after_power_on)
-                
-            else:
-                # Pokud se nezapíná, nastavit parametry postupně s pauzami
-                if schedule_entry.mode:
-                    logger.info(f"  ↳ Nastavuji režim: {schedule_entry.mode}")
-                    self.handle_device_command("change_mode", schedule_entry.mode)
-                
-                def set_temp_after_mode():
-                    if schedule_entry.temperature and schedule_entry.mode != "FAN":
-                        logger.info(f"  ↳ Nastavuji teplotu: {schedule_entry.temperature}°C")
-                        # OPRAVA: Odesíláme pouze teplotu bez režimu (fungující řešení)
-                        self.handle_device_command("set_temperature", schedule_entry.temperature)
-                    
-                    def set_wind_after_temp():
-                        if schedule_entry.wind:
-                            logger.info(f"  ↳ Nastavuji sílu větráku: {schedule_entry.wind}")
-                            self.handle_device_command("set_wind_strength", schedule_entry.wind)
-                        
-                        logger.info(f"✅ Plán '{schedule_entry.name}' byl úspěšně proveden")
-                    
-                    # Pauza před větrákem
-                    if schedule_entry.wind:
-                        self.after(2000, set_wind_after_temp)
-                    else:
-                        logger.info(f"✅ Plán '{schedule_entry.name}' byl úspěšně proveden")
-                
-                # Pauza po změně režimu před teplotou
-                if schedule_entry.mode and (schedule_entry.temperature or schedule_entry.wind):
-                    self.after(3000, set_temp_after_mode)
-                elif not schedule_entry.mode:
-                    # Pokud se nemění režim, spustíme hned
-                    set_temp_after_mode()
-                else:
-                    logger.info(f"✅ Plán '{schedule_entry.name}' byl úspěšně proveden")
-            
-        except Exception as e:
-            logger.error(f"❌ Chyba při provádění plánu '{schedule_entry.name}': {e}")
-            self.status_var.set(f"Chyba při provádění plánu: {e}")
+        def on_error(error):
+            logger.error(f"❌ Chyba při provádění plánu '{name}': {error}")
+            self.status_var.set(f"Chyba při provádění plánu: {error}")
+        
+        self.bridge.submit(self._reconcile(name, desired), on_done=on_done, on_error=on_error)
+    
+    async def _reconcile(self, name, desired):
+        await self.initialize_api()
+        self.reconciler.set_desired(DEVICE_ID, **desired)
+        return await self.reconciler.start(DEVICE_ID, name, properties=desired)
+    
+    def _cancel_schedule_steps(self):
+        """Zrušení běžícího dorovnání plánu a jeho neodeslaných kroků (volatelné z hlavního vlákna)"""
+        if self.reconciler:
+            self.loop.call_soon_threadsafe(self.reconciler.cancel, DEVICE_ID)
     
     def on_schedule_change(self, schedule_entries):
-        """Callback volaný při změně plánu"""
+        """Callback volaný při změně plánu - přeplánuje probuzení plánovače"""
         logger.info(f"Plán aktualizován: {len(schedule_entries)} položek")
-        # Zde můžeme implementovat logiku pro spuštění/zastavení plánovače
-        # např. aktualizaci background task pro monitoring času
+        if self.schedule_check_active:
+            self.periodic_schedule_check()
+        if self._status_check_job:
+            self._schedule_status_check()  # Jiné přechody plánu = jiná kontrola stavu
     
     async def update_device_status(self):
         """Aktualizace stavu zařízení"""
         try:
             api = await self.initialize_api()
             status = await api.get_device_status(DEVICE_ID)
+            self.poll_scheduler.record_status(status)
             
             # Kontrola změn ve stavu
             if status != self.last_device_status:
                 self.last_device_status = status
                 
                 # Aktualizace GUI v hlavním vlákně
-                self.after(0, lambda: self._update_gui_status(status))
+                self.bridge.call_soon(self._update_gui_status, status, key="gui_status")
                 
                 logger.info("Stav zařízení aktualizován")
             
+            await self.update_analytics()
+            
         except Exception as e:
             logger.error(f"Chyba při aktualizaci stavu: {e}")
-            error_msg = str(e)
-            self.after(0, lambda: self.status_var.set(f"Chyba: {error_msg}"))
-            self.after(0, lambda: self.led_indicator.set_state("error"))
+            self.bridge.call_soon(self._show_status_error, f"Chyba: {e}")
+
+    async def update_analytics(self, force=False):
+        """Dnešní statistiky provozu z historie stavů pro InfoPanel (numpy se načte až zde)"""
+        if self._analytics_time is False or not self.api or not self.api.history:
+            return
+        if not force and self._analytics_time and time.monotonic() - self._analytics_time < ANALYTICS_INTERVAL:
+            return
+        
+        try:
+            from history_analytics import today_summary, load_rated_power
+        except ImportError as e:
+            logger.info(f"Statistiky provozu nejsou k dispozici (chybí numpy: {e})")
+            self._analytics_time = False
+            return
+        
+        self._analytics_time = time.monotonic()
+        try:
+            summary = await asyncio.to_thread(today_summary, self.api.history, DEVICE_ID, load_rated_power())
+            self.bridge.call_soon(self.info_panel.update_analytics, summary)
+        except Exception as e:
+            logger.error(f"Chyba při výpočtu statistik provozu: {e}")
 
     async def manual_update_device_status(self):
         """Speciální verze update_device_status pro manual refresh - vždycky aktualizuje GUI"""
@@ -448,82 +486,170 @@ class ClimateApp(tk.Tk):
             # Při manual refresh VŽDYCKY aktualizujeme GUI, i když se stav nezměnil
             self.last_device_status = status
             
-            # Aktualizace GUI v hlavním vlákně
-            self.after(0, lambda: self._update_gui_status(status))
+            # Aktualizace GUI v hlavním vlákně (všechna pole, ne jen změněná)
+            self.bridge.call_soon(self._update_gui_status, status, True)
             
             logger.info("Manual refresh: Stav zařízení aktualizován")
+            await self.update_analytics(force=True)
             
         except Exception as e:
             logger.error(f"Chyba při manual refresh: {e}")
-            error_msg = str(e)
-            self.after(0, lambda: self.status_var.set(f"Chyba: {error_msg}"))
-            self.after(0, lambda: self.led_indicator.set_state("error"))
+            self.bridge.call_soon(self._show_status_error, f"Chyba: {e}")
     
-    def _update_gui_status(self, device_status):
-        """Aktualizace GUI podle stavu zařízení (hlavní vlákno)"""
+    async def start_push_updates(self):
+        """Spuštění push aktualizací stavu, polling pak běží jen jako záložní heartbeat"""
         try:
-            # Aktualizace status baru - kombinace runState a operation
-            run_state = device_status.get("runState", {}).get("currentState", "UNKNOWN")
-            power_operation = device_status.get("operation", {}).get("airConOperationMode", "POWER_OFF")
-            mode = device_status.get("airConJobMode", {}).get("currentJobMode", "N/A")
-            temp = device_status.get("temperature", {}).get("currentTemperature", "?")
-            
-            # Kombinace stavů pro display
-            if power_operation == "POWER_ON" and run_state == "NORMAL":
-                display_state = "Zapnuto"
-                led_state = "on"
-            elif power_operation == "POWER_OFF":
-                display_state = "Vypnuto"
-                led_state = "off"
-            elif run_state == "ERROR":
-                display_state = "Chyba"
-                led_state = "error"
-            else:
-                display_state = f"{power_operation}/{run_state}"
-                led_state = "error"
-            
-            status_text = f"Stav: {display_state}, Režim: {mode}, Teplota: {temp}°C"
-            self.status_var.set(status_text)
-            
-            # LED indikátor
-            logger.info(f"Aktualizuji LED: power={power_operation}, run={run_state} -> {led_state}")
-            self.led_indicator.set_state(led_state)
-            
-            # Aktualizace všech komponent
-            if hasattr(self, 'climate_controls'):
-                self.climate_controls.update_status(device_status)
+            api = await self.initialize_api()
+            if not api.config.get("push_updates", False):
+                return
             
-            if hasattr(self, 'timer_controls'):
-                self.timer_controls.update_status(device_status)
+            self.push_listener = StatusPushListener(
+                api,
+                on_status=self._on_push_status,
+                on_connection_change=self._on_push_connection_change
+            )
             
-            if hasattr(self, 'info_panel'):
-                self.info_panel.update_status(device_status)
+            # Lokální zástupný broker pro testování (např. "127.0.0.1:1884")
+            local_broker = api.config.get("push_local_broker")
+            if local_broker:
+                host, _, port = local_broker.rpartition(":")
+                await self.push_listener.start_local(host or "127.0.0.1", int(port))
+            else:
+                await self.push_listener.start_mqtt([DEVICE_ID])
                 
+        except Exception as e:
+            logger.error(f"Chyba při spouštění push aktualizací: {e}")
+    
+    async def start_file_watcher(self):
+        """Sledování schedule.json a device_profile.json (asyncio vlákno)"""
+        self.file_watcher = FileWatcher()
+        if hasattr(self, 'scheduler_widget'):
+            store = self.scheduler_widget.store
+            # Vlastní kompakce store se ignorují, načítá se jen zápis zvenku
+            self.file_watcher.watch(
+                store.schedule_file,
+                lambda entries: self.bridge.call_soon(self.scheduler_widget.apply_reloaded, entries),
+                loader=lambda path: store.reload(),
+                ignore=store.is_own_snapshot
+            )
+        self.file_watcher.watch(DEVICE_PROFILE_FILE,
+                                lambda profile: self.bridge.call_soon(self._on_device_profile_changed, profile))
+        self.file_watcher.start()
+    
+    def _on_device_profile_changed(self, profile):
+        """Nový profil zařízení - seznamy režimů a síly větru pro plánovač, kontrola payloadů"""
+        self.device_profile = profile
+        invalidate(DEFAULT_MODEL)
+        if hasattr(self, 'climate_controls'):
+            self.climate_controls.validator = validator_for(DEFAULT_MODEL, profile)
+        if self.api:
+            self.api.register_device_profile(DEVICE_ID, profile, DEFAULT_MODEL)
+        if self.command_tracker:
+            self.command_tracker.profile = profile
+        if hasattr(self, 'scheduler_widget'):
+            properties = profile.get("property", {})
+            modes = properties.get("airConJobMode", {}).get("currentJobMode", {}).get("value", {}).get("w")
+            wind_options = properties.get("airFlow", {}).get("windStrength", {}).get("value", {}).get("w")
+            if modes:
+                self.scheduler_widget.modes = modes
+            if wind_options:
+                self.scheduler_widget.wind_options = wind_options
+    
+    def _on_push_status(self, device_id, status):
+        """Nový stav z push zprávy (asyncio vlákno) - stejná cesta jako při pollingu"""
+        if device_id != DEVICE_ID:
+            return
+        
+        if status != self.last_device_status:
+            self.last_device_status = status
+            self.bridge.call_soon(self._update_gui_status, status, key="gui_status")
+    
+    def _on_push_connection_change(self, connected):
+        """Při aktivních push zprávách stačí pomalý záložní polling"""
+        self.poll_scheduler.set_push_connected(connected)
+        self.bridge.call_soon(self._schedule_status_check, key="status_check")
+    
+    def _update_gui_status(self, device_status, force=False):
+        """
+        Aktualizace GUI podle stavu zařízení (hlavní vlákno).
+        
+        Volají se jen handlery widgetů, jejichž pole se změnila;
+        force=True překreslí vše (manuální refresh).
+        """
+        try:
+            if self.command_tracker:
+                device_status = self.command_tracker.overlay(device_status)
+            self.status_dispatcher.dispatch(device_status, force=force)
         except Exception as e:
             logger.error(f"Chyba při aktualizaci GUI: {e}")
             self.status_var.set(f"Chyba GUI: {e}")
     
+    def _update_status_bar(self, device_status):
+        """Aktualizace status baru a LED - kombinace runState a operation"""
+        run_state = device_status.get("runState", {}).get("currentState", "UNKNOWN")
+        power_operation = device_status.get("operation", {}).get("airConOperationMode", "POWER_OFF")
+        mode = device_status.get("airConJobMode", {}).get("currentJobMode", "N/A")
+        temp = device_status.get("temperature", {}).get("currentTemperature", "?")
+        
+        # Kombinace stavů pro display
+        if power_operation == "POWER_ON" and run_state == "NORMAL":
+            display_state = "Zapnuto"
+            led_state = "on"
+        elif power_operation == "POWER_OFF":
+            display_state = "Vypnuto"
+            led_state = "off"
+        elif run_state == "ERROR":
+            display_state = "Chyba"
+            led_state = "error"
+        else:
+            display_state = f"{power_operation}/{run_state}"
+            led_state = "error"
+        
+        status_text = f"Stav: {display_state}, Režim: {mode}, Teplota: {temp}°C"
+        self.status_var.set(status_text)
+        
+        # LED indikátor
+        logger.info(f"Aktualizuji LED: power={power_operation}, run={run_state} -> {led_state}")
+        self.led_indicator.set_state(led_state)
+    
+    def _show_status_error(self, message):
+        """Chyba ve status baru a oranžová LED (hlavní vlákno)"""
+        self.status_var.set(message)
+        self.led_indicator.set_state("error")
+    
     def initial_status_check(self):
         """Počáteční kontrola stavu"""
-        asyncio.run_coroutine_threadsafe(self.update_device_status(), self.loop)
+        self.bridge.submit(self.update_device_status())
     
     def periodic_status_check(self):
-        """Pravidelná kontrola stavu"""
-        if not self.pending_update:
-            self.pending_update = True
-            asyncio.run_coroutine_threadsafe(self.update_device_status(), self.loop)
-            self.after(500, lambda: setattr(self, 'pending_update', False))
-        
-        # Plánování další kontroly
-        self.after(self.status_check_interval, self.periodic_status_check)
+        """Kontrola stavu - další se naplánuje až po výsledku (adaptivní interval)"""
+        self._status_check_job = None
+        self.bridge.submit(self.update_device_status(),
+                           on_done=lambda _: self._schedule_status_check(),
+                           on_error=lambda _: self._schedule_status_check())
+    
+    def _schedule_status_check(self):
+        """Naplánování další kontroly stavu podle aktivity, plánu a rozpočtu dotazů"""
+        if self._status_check_job:
+            self.after_cancel(self._status_check_job)
+        
+        seconds_to_transition = None
+        if hasattr(self, 'scheduler_widget') and self.scheduler_widget.compiled_schedule.entries:
+            seconds_to_transition = self.scheduler_widget.compiled_schedule.seconds_until_next_transition(datetime.now())
+        
+        delay = self.poll_scheduler.next_delay(seconds_to_transition)
+        self._status_check_job = self.after(int(delay * 1000), self.periodic_status_check)
+        logger.info(f"Další kontrola stavu za {delay:.0f}s ({self.poll_scheduler.last_reason})")
 
     def periodic_schedule_check(self):
-        """Pravidelná kontrola plánů pro automatické spouštění"""
+        """Kontrola plánů - probouzí se na začátku/konci plánu podle předkompilované časové osy"""
+        if self._schedule_check_job:
+            self.after_cancel(self._schedule_check_job)
+            self._schedule_check_job = None
         if not self.schedule_check_active:
             return
             
         try:
-            from datetime import datetime
             current_time = datetime.now()
             
             # Zkontroluj, jestli existuje aktivní plán pro aktuální čas
@@ -535,39 +661,32 @@ class ClimateApp(tk.Tk):
                     self.schedule_was_active_last_check = True
                     
                     # Aktualizace tlačítka Stop plán - povolit
-                    self.after(0, lambda: self.stop_schedule_btn.config(state='normal'))
+                    self.stop_schedule_btn.config(state='normal')
                     
-                    if active_schedule != self.last_executed_schedule:
-                        # Nový plán k provedení
-                        current_minute = current_time.strftime("%H:%M")
-                        schedule_start = active_schedule.start_time
-                        
-                        # Spustit jen pokud jsme přesně na začátku plánovaného času (±1 minuta)
-                        # NEBO pokud je plán aktivní a ještě nebyl spuštěn (restart aplikace během plánu)
-                        if (current_minute == schedule_start or 
-                            (self.last_executed_schedule is None and active_schedule.enabled)):
-                            
-                            logger.info(f"🕒 Spouštím naplánovaný příkaz: {active_schedule.name} v {schedule_start}")
-                            self.execute_scheduled_command(active_schedule)
-                            self.last_executed_schedule = active_schedule
+                    if active_schedule is not self.last_executed_schedule:
+                        # Začátek plánu, restart aplikace během plánu, nebo změna vítěze při překryvu
+                        # (např. konec plánu s vyšší prioritou uvnitř delšího plánu) - odešle se jen rozdíl
+                        logger.info(f"🕒 Spouštím naplánovaný příkaz: {active_schedule.name} (od {active_schedule.start_time})")
+                        self.execute_scheduled_command(active_schedule)
+                        self.last_executed_schedule = active_schedule
                             
                     # Aktualizace status baru s aktivním plánem
                     remaining_time = self._calculate_remaining_time(active_schedule, current_time)
                     if remaining_time:
-                        self.after(0, lambda: self.status_var.set(
-                            f"🏃 Aktivní: {active_schedule.name} (zbývá {remaining_time})"
-                        ))
+                        self.status_var.set(f"🏃 Aktivní: {active_schedule.name} (zbývá {remaining_time})")
                         
                 else:
                     # ŽÁDNÝ AKTIVNÍ PLÁN
-                    self.after(0, lambda: self.stop_schedule_btn.config(state='disabled'))
+                    self.stop_schedule_btn.config(state='disabled')
                     
                     # Detekce konce plánu - pokud předtím byl aktivní a teď není
                     if self.schedule_was_active_last_check and self.last_executed_schedule and not self.manual_schedule_override:
                         # Zkontroluj, jestli má plán vypnout zařízení na konci
                         if getattr(self.last_executed_schedule, 'power_off_at_end', True):
                             logger.info(f"🔚 Plán '{self.last_executed_schedule.name}' skončil - vypínám zařízení")
-                            self.handle_device_command("power_off")  # OPRAVA: Použít power_off místo toggle
+                            # Přes pipeline - zruší případné ještě neodeslané kroky plánu
+                            self._apply_desired_state(f"{self.last_executed_schedule.name} - konec",
+                                                      {"power": "POWER_OFF"}, report_success=False)
                             self.status_var.set(f"Plán '{self.last_executed_schedule.name}' dokončen - zařízení vypnuto")
                         else:
                             logger.info(f"🔚 Plán '{self.last_executed_schedule.name}' skončil - zařízení zůstává zapnuté")
@@ -586,89 +705,33 @@ class ClimateApp(tk.Tk):
                         if (not current_status.startswith("🏃") and not current_status.startswith("Chyba") 
                             and not current_status.startswith("Aktivní plán byl přerušen")
                             and not current_status.startswith("Plán ") and "dokončen" not in current_status):
-                            self.after(0, lambda: self.status_var.set(
-                                f"⏰ Další: {next_schedule.name} za {time_to_next}"
-                            ))
+                            self.status_var.set(f"⏰ Další: {next_schedule.name} za {time_to_next}")
                     
         except Exception as e:
             logger.error(f"Chyba při kontrole plánů: {e}")
         
-        # Naplánuj další kontrolu
+        # Naplánuj další kontrolu - přesně na další hranici plánu (max. po minutě kvůli odpočtu)
         if self.schedule_check_active:
-            self.after(SCHEDULE_CHECK_INTERVAL, self.periodic_schedule_check)
+            delay = SCHEDULE_CHECK_INTERVAL
+            if hasattr(self, 'scheduler_widget') and self.scheduler_widget:
+                seconds = self.scheduler_widget.compiled_schedule.seconds_until_next_transition(datetime.now())
+                delay = min(delay, int(seconds * 1000) + 50)
+            self._schedule_check_job = self.after(delay, self.periodic_schedule_check)
     
     def _calculate_remaining_time(self, schedule_entry, current_time):
         """Výpočet zbývajícího času aktivního plánu"""
-        try:
-            from datetime import datetime, time
-            end_time = datetime.strptime(schedule_entry.end_time, "%H:%M").time()
-            current_time_only = current_time.time()
-            
-            # Převod na minuty
-            end_minutes = end_time.hour * 60 + end_time.minute
-            current_minutes = current_time_only.hour * 60 + current_time_only.minute
-            
-            if end_minutes < current_minutes:  # Přes půlnoc
-                end_minutes += 24 * 60
-            
-            remaining_minutes = end_minutes - current_minutes
-            if remaining_minutes > 0:
-                hours = remaining_minutes // 60
-                minutes = remaining_minutes % 60
-                if hours > 0:
-                    return f"{hours}h {minutes}min"
-                else:
-                    return f"{minutes}min"
-        except:
-            pass
-        return None
+        remaining = self.scheduler_widget.compiled_schedule.remaining_minutes(schedule_entry, current_time)
+        return format_minutes(remaining) if remaining else None
     
     def _find_next_schedule(self, current_time):
         """Najde nejbližší nadcházející plán"""
         try:
             if not hasattr(self, 'scheduler_widget') or not self.scheduler_widget:
                 return None, None
-                
-            from datetime import datetime, timedelta
-            current_time_only = current_time.time()
-            current_minutes = current_time_only.hour * 60 + current_time_only.minute
-            
-            closest_schedule = None
-            closest_minutes = float('inf')
-            
-            for entry in self.scheduler_widget.schedule_entries:
-                if not entry.enabled:
-                    continue
-                    
-                try:
-                    start_time = datetime.strptime(entry.start_time, "%H:%M").time()
-                    start_minutes = start_time.hour * 60 + start_time.minute
-                    
-                    # Pokud je start_time dnes později
-                    if start_minutes > current_minutes:
-                        minutes_diff = start_minutes - current_minutes
-                        if minutes_diff < closest_minutes:
-                            closest_minutes = minutes_diff
-                            closest_schedule = entry
-                    else:
-                        # Zítra
-                        minutes_diff = (24 * 60) - current_minutes + start_minutes
-                        if minutes_diff < closest_minutes:
-                            closest_minutes = minutes_diff
-                            closest_schedule = entry
-                            
-                except:
-                    continue
             
-            if closest_schedule and closest_minutes < float('inf'):
-                hours = closest_minutes // 60
-                minutes = closest_minutes % 60
-                if hours > 24:
-                    return closest_schedule, f"{hours//24}d {hours%24}h"
-                elif hours > 0:
-                    return closest_schedule, f"{hours}h {minutes}min"
-                else:
-                    return closest_schedule, f"{minutes}min"
+            next_schedule, minutes = self.scheduler_widget.compiled_schedule.next_start(current_time)
+            if next_schedule:
+                return next_schedule, format_minutes(minutes)
                     
         except Exception as e:
             logger.error(f"Chyba při hledání nejbližšího plánu: {e}")
@@ -682,32 +745,14 @@ class ClimateApp(tk.Tk):
             self.status_var.set("Aktualizuji...")
             self.led_indicator.set_state("error")  # Oranžová při načítání
             
-            # Spustíme async update a čekáme na výsledek
-            future = asyncio.run_coroutine_threadsafe(self.manual_update_device_status(), self.loop)
+            def on_error(error):
+                logger.error(f"❌ Manual refresh failed: {error}")
+                self._show_status_error(f"Chyba refresh: {error}")
             
-            # Počkáme chvilku a zkontrolujeme stav
-            def check_result():
-                try:
-                    if future.done():
-                        if future.exception():
-                            error = future.exception()
-                            logger.error(f"❌ Manual refresh failed: {error}")
-                            self.status_var.set(f"Chyba refresh: {error}")
-                            self.led_indicator.set_state("error")
-                        else:
-                            logger.info("✅ Manual refresh - SUCCESS")
-                            # Nebudeme nastavovat success, necháme LED odrážet skutečný stav zařízení
-                            # LED se aktualizuje automaticky v _update_gui_status
-                    else:
-                        # Pokud ještě nedoběhl, zkusíme znovu za 500ms
-                        self.after(500, check_result)
-                except Exception as e:
-                    logger.error(f"❌ Check result error: {e}")
-                    self.status_var.set(f"Chyba: {e}")
-                    self.led_indicator.set_state("error")
-            
-            # Zkontrolujeme výsledek za 1s
-            self.after(1000, check_result)
+            # Výsledek doručí bridge - LED odráží skutečný stav zařízení (_update_gui_status)
+            self.bridge.submit(self.manual_update_device_status(),
+                               on_done=lambda _: logger.info("✅ Manual refresh - SUCCESS"),
+                               on_error=on_error)
             
             logger.info("Manuální refresh spuštěn")
         except Exception as e:
@@ -721,8 +766,21 @@ class ClimateApp(tk.Tk):
             # Zastavíme kontrolu plánů
             self.schedule_check_active = False
             
+            # Dopsání rozpracovaných změn plánů
+            if hasattr(self, 'scheduler_widget'):
+                self.scheduler_widget.store.close()
+            
+            if self.file_watcher:
+                self.loop.call_soon_threadsafe(self.file_watcher.stop)
+            self.bridge.stop()
+            if self.push_listener:
+                self.bridge.submit(self.push_listener.stop())
             if self.api:
-                asyncio.run_coroutine_threadsafe(self.api.close(), self.loop)
+                # Počkat na uzavření API (dopsání historie stavů), než se smyčka zastaví
+                try:
+                    self.bridge.submit(self.api.close()).result(timeout=5)
+                except Exception as e:
+                    logger.warning(f"API se nepodařilo uzavřít: {e}")
             self.loop.call_soon_threadsafe(self.loop.stop)
         except:
             pass
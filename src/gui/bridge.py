@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Most mezi asyncio smyčkou (vlákno na pozadí) a tkinter (hlavní vlákno).
+
+Všechny aktualizace GUI z asyncio vlákna jdou přes jednu thread-safe
+frontu, kterou vybírá jediná after() pumpa v hlavním vlákně - místo
+samostatného after(0) pro každou změnu a vlákna pro každý příkaz.
+Aktualizace se stejným klíčem se v rámci jednoho průchodu sloučí
+(provede se jen poslední), takže rychlá série stavů překreslí GUI jednou.
+
+Bez práce pumpa neběží (žádné probouzení Tk v klidu). První volání do
+prázdné fronty ji spustí virtuální událostí <<AsyncTkBridgeWake>>
+(event_generate je z jiného vlákna bezpečné) - pumpa pak poběží,
+dokud fronta nezůstane prázdná.
+
+Výsledky coroutine se předávají přes add_done_callback - žádné blokující
+future.result() ani opakované dotazování future.done().
+"""
+import queue
+import asyncio
+import logging
+import threading
+from typing import Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+PUMP_INTERVAL = 16        # Interval pumpy při provozu (ms) - jeden snímek
+WAKE_EVENT = "<<AsyncTkBridgeWake>>"
+
+
+class AsyncTkBridge:
+    """Fronta volání z asyncio vlákna do tkinter + spouštění coroutine s callbacky"""
+
+    def __init__(self, root, loop: asyncio.AbstractEventLoop):
+        """
+        Args:
+            root: Tk okno (after/after_cancel)
+            loop: asyncio smyčka běžící v jiném vlákně
+        """
+        self.root = root
+        self.loop = loop
+        self._queue = queue.SimpleQueue()
+        self._job = None
+        self._wake_pending = threading.Event()  # Probuzení pumpy už je na cestě
+        self._running = False
+
+        # Statistiky
+        self.pumped = 0
+        self.coalesced = 0
+        self.wakeups = 0
+
+    def start(self):
+        """Spuštění pumpy (volat z hlavního vlákna)"""
+        if not self._running:
+            self._running = True
+            self.root.bind(WAKE_EVENT, self._on_wake)
+            self._arm()  # Volání zařazená před spuštěním mainloop
+        return self
+
+    def stop(self):
+        """Zastavení pumpy - další volání se už do hlavního vlákna nedoručí"""
+        self._running = False
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _wake(self):
+        """Probuzení pumpy z libovolného vlákna (jen jednou, dokud ji pumpa nevybere)"""
+        if not self._running or self._wake_pending.is_set():
+            return
+        self._wake_pending.set()
+        try:
+            self.root.event_generate(WAKE_EVENT, when="tail")
+        except Exception as e:
+            # Okno zavřeno, nebo mainloop ještě neběží (frontu pak vybere start)
+            self._wake_pending.clear()
+            logger.debug(f"Pumpu GUI nelze probudit: {e}")
+
+    def _on_wake(self, event=None):
+        self.wakeups += 1
+        self._arm()
+
+    def _arm(self):
+        """Naplánování průchodu pumpy za jeden snímek (hlavní vlákno)"""
+        if self._running and self._job is None:
+            self._job = self.root.after(PUMP_INTERVAL, self._pump)
+
+    def call_soon(self, func: Callable, *args, key: Hashable = None):
+        """
+        Naplánování volání v hlavním vlákně (thread-safe, z libovolného vlákna).
+
+        Args:
+            func: Funkce pro hlavní vlákno
+            key: Volání se stejným klíčem v jednom průchodu pumpy se sloučí - provede se poslední
+        """
+        self._queue.put((key, func, args))
+        self._wake()
+
+    def submit(self, coro, on_done: Callable = None, on_error: Callable = None,
+               timeout: Optional[float] = None):
+        """
+        Spuštění coroutine v asyncio smyčce; výsledek se doručí do hlavního vlákna.
+
+        Args:
+            coro: Coroutine
+            on_done: Callback(result) v hlavním vlákně
+            on_error: Callback(exception) v hlavním vlákně (bez něj se chyba jen zaloguje)
+            timeout: Max. doba běhu (s) - pak se coroutine zruší a on_error dostane TimeoutError
+
+        Returns:
+            concurrent.futures.Future
+        """
+        if timeout is not None:
+            coro = asyncio.wait_for(coro, timeout)
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if on_done or on_error:
+            future.add_done_callback(lambda f: self.call_soon(self._deliver, f, on_done, on_error))
+        else:
+            future.add_done_callback(self._log_error)
+        return future
+
+    @staticmethod
+    def _deliver(future, on_done, on_error):
+        """Předání výsledku coroutine callbackům (hlavní vlákno)"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                logger.error(f"Chyba na pozadí: {error}")
+        elif on_done:
+            on_done(future.result())
+
+    @staticmethod
+    def _log_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Chyba na pozadí: {future.exception()}")
+
+    def _pump(self):
+        """Vybrání fronty - jeden průchod za snímek, prázdná fronta pumpu zastaví"""
+        self._job = None
+        self._wake_pending.clear()  # Volání zařazené od teď pumpu znovu probudí
+        items = []
+        try:
+            while True:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if items:
+            # Poslední výskyt každého klíče - dřívější volání se stejným klíčem se přeskočí
+            last = {key: index for index, (key, _, _) in enumerate(items) if key is not None}
+            for index, (key, func, args) in enumerate(items):
+                if key is not None and last[key] != index:
+                    self.coalesced += 1
+                    continue
+                try:
+                    func(*args)
+                except Exception as e:
+                    logger.error(f"Chyba při aktualizaci GUI: {e}")
+            self.pumped += len(items)
+            self._arm()  # Ještě jeden průchod - série volání obvykle pokračuje
+
+    def stats(self):
+        """Počet předaných a sloučených volání, počet probuzení pumpy"""
+        return {"pumped": self.pumped, "coalesced": self.coalesced, "wakeups": self.wakeups}
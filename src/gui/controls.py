@@ -9,6 +9,12 @@ import asyncio
 import threading
 from typing import Callable, Optional, List
 
+from profile_validator import validator_for, DEFAULT_MODEL
+
+COMMAND_DEBOUNCE_MS = 600  # Tiché okno - z rychlé série změn jedné vlastnosti se odešle jen poslední
+
+MODE_TITLES = {"COOL": "Chlazení", "HEAT": "Vytápění", "AUTO": "Automatický režim", "AIR_DRY": "Odvlhčování"}
+
 class ClimateControls(ttk.Frame):
     """Widget s osnovními ovládacími prvky klimatizace"""
     
@@ -19,6 +25,9 @@ class ClimateControls(ttk.Frame):
         self.status_var = status_var
         self.on_command = on_command
         
+        # Odložené příkazy: vlastnost -> (after job, příkaz, argumenty)
+        self._pending_commands = {}
+        
         # Proměnné pro GUI
         self.mode_var = tk.StringVar()
         self.temp_var = tk.DoubleVar(value=22)
@@ -30,6 +39,7 @@ class ClimateControls(ttk.Frame):
         # Data z profilu
         self.modes = self.profile["property"]["airConJobMode"]["currentJobMode"]["value"]["w"]
         self.wind_strengths = self.profile["property"]["airFlow"]["windStrength"]["value"]["w"]
+        self.validator = validator_for(DEFAULT_MODEL, self.profile)  # Rozsahy teplot podle režimu
         
         self.create_widgets()
         
@@ -134,23 +144,13 @@ class ClimateControls(ttk.Frame):
             self.target_temp_frame.pack(fill='x', pady=5, after=self.current_temp_label)
             self.temp_frame.configure(text="🌡️ Teplota")
             
-            # Upravíme rozsah teplot podle módu (pouze celá čísla)
-            if current_mode == "COOL":
-                # Chlazení: 18-30°C
-                self.temp_scale.configure(from_=18, to=30)
-                self.temp_frame.configure(text="🌡️ Chlazení (18-30°C)")
-            elif current_mode == "HEAT":
-                # Vytápění: 16-30°C (širší rozsah dolů)
-                self.temp_scale.configure(from_=16, to=30)
-                self.temp_frame.configure(text="🌡️ Vytápění (16-30°C)")
-            elif current_mode == "AUTO":
-                # Automatický: 18-30°C
-                self.temp_scale.configure(from_=18, to=30)
-                self.temp_frame.configure(text="🌡️ Automatický režim (18-30°C)")
-            elif current_mode == "AIR_DRY":
-                # Odvlhčování: 18-30°C
-                self.temp_scale.configure(from_=18, to=30)
-                self.temp_frame.configure(text="🌡️ Odvlhčování (18-30°C)")
+            # Rozsah teplot podle módu z profilu zařízení (pouze celá čísla)
+            temp_range = self.validator.range_for("temperature.targetTemperature", current_mode)
+            if temp_range:
+                low, high = temp_range
+                self.temp_scale.configure(from_=low, to=high)
+                title = MODE_TITLES.get(current_mode, "Teplota")
+                self.temp_frame.configure(text=f"🌡️ {title} ({low:g}-{high:g}°C)")
         
         # Aktualizace velikosti okna
         self.update_idletasks()
@@ -163,68 +163,115 @@ class ClimateControls(ttk.Frame):
         self.temp_var.set(temp)
         self.temp_label.config(text=f"Cíl: {temp}°C")
         
+    def status_subscriptions(self):
+        """Pole stavu zobrazovaná tímto widgetem a jejich handlery (pro StatusDispatcher)"""
+        return [
+            ("temperature.currentTemperature", self._update_current_temp),
+            ("airConJobMode.currentJobMode", self._update_mode),
+            (("temperature.targetTemperature", "airConJobMode.currentJobMode"), self._update_target_temp),
+            ("airFlow.windStrength", self._update_wind),
+            ("airFlow.windStrengthDetail", self._update_wind_detail),
+            (("windDirection.rotateUpDown", "windDirection.rotateLeftRight"), self._update_wind_direction),
+            ("powerSave.powerSaveEnabled", self._update_power_save),
+        ]
+        
     def update_status(self, device_status: dict):
-        """Aktualizace GUI podle stavu zařízení"""
-        # Extrakce dat ze statusu
+        """Aktualizace GUI podle stavu zařízení (všechna pole)"""
+        for _, handler in self.status_subscriptions():
+            handler(device_status)
+    
+    def _update_current_temp(self, device_status: dict):
+        """Aktualizace aktuální teploty"""
         current_temp = device_status.get("temperature", {}).get("currentTemperature", "?")
-        target_temp = device_status.get("temperature", {}).get("targetTemperature", "?")
-        mode = device_status.get("airConJobMode", {}).get("currentJobMode", "?")
-        wind = device_status.get("airFlow", {}).get("windStrength", "?")
-        wind_detail = device_status.get("airFlow", {}).get("windStrengthDetail", "Nedostupný")
-        wind_updown = device_status.get("windDirection", {}).get("rotateUpDown", False)
-        wind_leftright = device_status.get("windDirection", {}).get("rotateLeftRight", False)
-        power_save = device_status.get("powerSave", {}).get("powerSaveEnabled", False)
-        
-        # Aktualizace aktuální teploty
         self.current_temp_label.config(text=f"Aktuální: {current_temp}°C")
         
-        # Aktualizace hodnot v GUI (bez triggeru událostí)
+    def _update_mode(self, device_status: dict):
+        """Aktualizace módu (bez triggeru událostí)"""
+        if "mode" in self._pending_commands:
+            return  # Zobrazuje se hodnota čekající na odeslání
+        mode = device_status.get("airConJobMode", {}).get("currentJobMode", "?")
         if mode in self.modes:
             self.mode_var.set(mode)
             self.on_mode_change()  # Aplikuje logiku skrytí/zobrazení
             
+    def _update_target_temp(self, device_status: dict):
+        """Aktualizace cílové teploty (v módu FAN se nezobrazuje)"""
+        if "temperature" in self._pending_commands:
+            return
+        target_temp = device_status.get("temperature", {}).get("targetTemperature", "?")
+        mode = device_status.get("airConJobMode", {}).get("currentJobMode", "?")
         if isinstance(target_temp, (int, float)) and mode != "FAN":
             self.temp_var.set(target_temp)
             self.temp_label.config(text=f"Cíl: {target_temp}°C")
             
+    def _update_wind(self, device_status: dict):
+        """Aktualizace síly větru"""
+        if "wind_strength" in self._pending_commands:
+            return
+        wind = device_status.get("airFlow", {}).get("windStrength", "?")
         if wind in self.wind_strengths:
             self.wind_var.set(wind)
             
-        # Aktualizace směru větru
-        self.rotate_updown_var.set(wind_updown)
-        self.rotate_leftright_var.set(wind_leftright)
-        
-        # Aktualizace power save
-        self.powersave_var.set(power_save)
-        
-        # Aktualizace detail labelu
+    def _update_wind_detail(self, device_status: dict):
+        """Aktualizace detail labelu větru"""
+        wind_detail = device_status.get("airFlow", {}).get("windStrengthDetail", "Nedostupný")
         self.wind_detail_label.config(text=f"Detail: {wind_detail}")
+        
+    def _update_wind_direction(self, device_status: dict):
+        """Aktualizace směru větru"""
+        if "wind_direction" in self._pending_commands:
+            return
+        self.rotate_updown_var.set(device_status.get("windDirection", {}).get("rotateUpDown", False))
+        self.rotate_leftright_var.set(device_status.get("windDirection", {}).get("rotateLeftRight", False))
+        
+    def _update_power_save(self, device_status: dict):
+        """Aktualizace power save"""
+        if "power_save" in self._pending_commands:
+            return
+        self.powersave_var.set(device_status.get("powerSave", {}).get("powerSaveEnabled", False))
+    
+    def _send_debounced(self, key: str, command: str, *args):
+        """
+        Odeslání po tichém okně - novější hodnota téže vlastnosti předchozí nahradí.
+        Widget hodnotu ukazuje hned, stav zařízení ji do odeslání nepřepíše.
+        """
+        if not self.on_command:
+            return
+        pending = self._pending_commands.pop(key, None)
+        if pending:
+            self.after_cancel(pending[0])
+        job = self.after(COMMAND_DEBOUNCE_MS, lambda: self._flush_command(key))
+        self._pending_commands[key] = (job, command, args)
+    
+    def _flush_command(self, key: str):
+        """Odeslání poslední hodnoty vlastnosti"""
+        pending = self._pending_commands.pop(key, None)
+        if pending:
+            _, command, args = pending
+            self.on_command(command, *args)
     
     # Metody pro ovládání - delegují na callback
     def toggle_power(self):
+        # Bez odkladu - dvě rychlá přepnutí nejsou totéž co jedno
         if self.on_command:
             self.on_command("toggle_power")
             
     def change_mode(self):
-        if self.on_command:
-            self.on_command("change_mode", self.mode_var.get())
+        self._send_debounced("mode", "change_mode", self.mode_var.get())
             
     def set_temperature(self):
-        if self.on_command:
-            # Pošleme pouze teplotu bez režimu (nechá aktuální režim)
-            self.on_command("set_temperature", self.temp_var.get())
+        # Pošleme pouze teplotu bez režimu (nechá aktuální režim) - režim jen pro rozsah podle profilu
+        self._send_debounced("temperature", "set_temperature", self.temp_var.get(), self.mode_var.get() or None)
             
     def set_wind_strength(self):
-        if self.on_command:
-            self.on_command("set_wind_strength", self.wind_var.get())
+        self._send_debounced("wind_strength", "set_wind_strength", self.wind_var.get())
             
     def set_wind_direction(self):
-        if self.on_command:
-            self.on_command("set_wind_direction", self.rotate_updown_var.get(), self.rotate_leftright_var.get())
+        self._send_debounced("wind_direction", "set_wind_direction",
+                             self.rotate_updown_var.get(), self.rotate_leftright_var.get())
             
     def set_power_save(self):
-        if self.on_command:
-            self.on_command("set_power_save", self.powersave_var.get())
+        self._send_debounced("power_save", "set_power_save", self.powersave_var.get())
 
 class TimerControls(ttk.Frame):
     """Widget pro ovládání časovačů"""
@@ -271,14 +318,29 @@ class TimerControls(ttk.Frame):
         self.cancel_timers_btn = ttk.Button(sleep_buttons_frame, text="❌ Zrušit timery", command=self.cancel_all_timers)
         self.cancel_timers_btn.pack(side=tk.LEFT, padx=5)
         
+    def status_subscriptions(self):
+        """Pole stavu zobrazovaná tímto widgetem a jejich handlery (pro StatusDispatcher)"""
+        return [
+            ("timer.relativeStartTimer", self._update_start_timer),
+            ("timer.relativeStopTimer", self._update_stop_timer),
+            ("sleepTimer.relativeStopTimer", self._update_sleep_timer),
+        ]
+        
     def update_status(self, device_status: dict):
-        """Aktualizace zobrazení časovačů"""
+        """Aktualizace zobrazení časovačů (všechna pole)"""
+        for _, handler in self.status_subscriptions():
+            handler(device_status)
+    
+    def _update_start_timer(self, device_status: dict):
         start_timer = device_status.get("timer", {}).get("relativeStartTimer", "UNSET")
-        stop_timer = device_status.get("timer", {}).get("relativeStopTimer", "UNSET")  
-        sleep_timer = device_status.get("sleepTimer", {}).get("relativeStopTimer", "UNSET")
-        
         self.start_timer_label.config(text=f"Časovač zapnutí: {'Nastaven' if start_timer == 'SET' else 'Nevystaven'}")
+        
+    def _update_stop_timer(self, device_status: dict):
+        stop_timer = device_status.get("timer", {}).get("relativeStopTimer", "UNSET")
         self.stop_timer_label.config(text=f"Časovač vypnutí: {'Nastaven' if stop_timer == 'SET' else 'Nevystaven'}")
+        
+    def _update_sleep_timer(self, device_status: dict):
+        sleep_timer = device_status.get("sleepTimer", {}).get("relativeStopTimer", "UNSET")
         self.sleep_timer_label.config(text=f"Sleep timer: {'Nastaven' if sleep_timer == 'SET' else 'Nevystaven'}")
         
     def set_sleep_timer(self, hours, minutes):
@@ -306,6 +368,11 @@ class InfoPanel(ttk.Frame):
         self.energy_label = ttk.Label(info_frame, text="Spotřeba: Nedostupná", font=("Segoe UI", 9))
         self.energy_label.pack(anchor='w', pady=1)
         
+        # Provoz dnes (z historie stavů)
+        self.runtime_label = ttk.Label(info_frame, text="Provoz dnes: --", font=("Segoe UI", 9))
+        self.runtime_label.pack(anchor='w', pady=1)
+        self._energy_estimate = None
+        
         # Stav běhu
         self.run_state_label = ttk.Label(info_frame, text="Stav systému: --", font=("Segoe UI", 9))
         self.run_state_label.pack(anchor='w', pady=1)
@@ -318,13 +385,22 @@ class InfoPanel(ttk.Frame):
         self.temp_unit_label = ttk.Label(info_frame, text="Jednotka: °C", font=("Segoe UI", 9))
         self.temp_unit_label.pack(anchor='w', pady=1)
         
-    def update_status(self, device_status: dict):
-        """Aktualizace informačního panelu"""
-        run_state = device_status.get("runState", {}).get("currentState", "Neznámý")
-        wind_detail = device_status.get("airFlow", {}).get("windStrengthDetail", "Nedostupný")
-        temp_unit = device_status.get("temperature", {}).get("unit", "C")
+    def status_subscriptions(self):
+        """Pole stavu zobrazovaná tímto widgetem a jejich handlery (pro StatusDispatcher)"""
+        return [
+            (("energy", "power"), self._update_energy),
+            ("runState.currentState", self._update_run_state),
+            ("airFlow.windStrengthDetail", self._update_wind_detail),
+            ("temperature.unit", self._update_temp_unit),
+        ]
         
-        # Pokus o získání informací o spotřebě (experimentální)
+    def update_status(self, device_status: dict):
+        """Aktualizace informačního panelu (všechna pole)"""
+        for _, handler in self.status_subscriptions():
+            handler(device_status)
+    
+    def _update_energy(self, device_status: dict):
+        """Pokus o získání informací o spotřebě (experimentální)"""
         energy_info = "Nedostupná"
         if "energy" in device_status:
             energy_data = device_status["energy"]
@@ -340,8 +416,37 @@ class InfoPanel(ttk.Frame):
                 consumption = power_data.get("consumption", power_data.get("current", "N/A"))
                 if consumption != "N/A":
                     energy_info = f"{consumption} W"
+        
+        if energy_info == "Nedostupná" and self._energy_estimate is not None:
+            energy_info = f"~{self._energy_estimate:.2f} kWh dnes (odhad)"
                     
         self.energy_label.config(text=f"Spotřeba: {energy_info}")
+    
+    def update_analytics(self, summary: dict):
+        """Dnešní statistiky provozu (history_analytics.today_summary)"""
+        if not summary:
+            return
+        from history_analytics import format_duration
+        
+        modes = ", ".join(f"{mode} {format_duration(seconds)}"
+                          for mode, seconds in sorted(summary["runtime"].items(), key=lambda m: -m[1]))
+        text = f"Provoz dnes: {format_duration(summary['running'])} ({summary['duty_cycle']:.0%})"
+        if modes:
+            text += f" – {modes}"
+        self.runtime_label.config(text=text)
+        
+        self._energy_estimate = summary["energy_kwh"]
+        if self.energy_label.cget("text") == "Spotřeba: Nedostupná" or "(odhad)" in self.energy_label.cget("text"):
+            self.energy_label.config(text=f"Spotřeba: ~{self._energy_estimate:.2f} kWh dnes (odhad)")
+        
+    def _update_run_state(self, device_status: dict):
+        run_state = device_status.get("runState", {}).get("currentState", "Neznámý")
         self.run_state_label.config(text=f"Stav systému: {run_state}")
+        
+    def _update_wind_detail(self, device_status: dict):
+        wind_detail = device_status.get("airFlow", {}).get("windStrengthDetail", "Nedostupný")
         self.wind_detail_info.config(text=f"Detail proudění: {wind_detail}")
+        
+    def _update_temp_unit(self, device_status: dict):
+        temp_unit = device_status.get("temperature", {}).get("unit", "C")
         self.temp_unit_label.config(text=f"Jednotka: °{temp_unit}")
@@ -5,116 +5,12 @@ Umožňuje vytváření časových plánů s různými režimy a nastaveními.
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime, time
-import json
-import os
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List
 
-class ScheduleEntry:
-    """Třída reprezentující jeden záznam v plánu"""
-    
-    def __init__(self, name: str = "", start_time: str = "08:00", 
-                 end_time: str = "10:00", mode: str = "FAN", temperature: int = 22, 
-                 wind: str = "AUTO", power_on: bool = True, power_off_at_end: bool = True):
-        self.name = name
-        self.start_time = start_time
-        self.end_time = end_time
-        self.mode = mode
-        self.temperature = temperature
-        self.wind = wind
-        self.power_on = power_on
-        self.power_off_at_end = power_off_at_end  # Vypnout na konci plánu
-        self.enabled = True
-        
-        # Zpětná kompatibilita - pokud je zadána jen délka
-        self.duration_hours = self._calculate_duration_hours()
-        
-    def _calculate_duration_hours(self) -> float:
-        """Výpočet délky trvání z časů start a end"""
-        try:
-            start = datetime.strptime(self.start_time, "%H:%M").time()
-            end = datetime.strptime(self.end_time, "%H:%M").time()
-            
-            # Převod na minuty pro výpočet
-            start_minutes = start.hour * 60 + start.minute
-            end_minutes = end.hour * 60 + end.minute
-            
-            # Pokud end_time je menší než start_time, předpokládáme přes půlnoc
-            if end_minutes <= start_minutes:
-                end_minutes += 24 * 60  # Přidat 24 hodin
-            
-            duration_minutes = end_minutes - start_minutes
-            return round(duration_minutes / 60.0, 2)
-        except:
-            return 2.0  # Výchozí 2 hodiny
-        
-    def _calculate_end_time_from_duration(self, duration_hours: float) -> str:
-        """Výpočet end_time z start_time a duration"""
-        try:
-            start = datetime.strptime(self.start_time, "%H:%M")
-            end = start.replace(hour=start.hour + int(duration_hours), 
-                              minute=start.minute + int((duration_hours % 1) * 60))
-            
-            # Handle překročení 24h
-            if end.hour >= 24:
-                end = end.replace(hour=end.hour - 24)
-            
-            return end.strftime("%H:%M")
-        except:
-            return "10:00"
-    
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "name": self.name,
-            "start_time": self.start_time,
-            "end_time": self.end_time,
-            "mode": self.mode,
-            "temperature": self.temperature,
-            "wind": self.wind,
-            "power_on": self.power_on,
-            "power_off_at_end": getattr(self, 'power_off_at_end', True),
-            "enabled": self.enabled,
-            # Zpětná kompatibilita
-            "time": self.start_time,
-            "duration_hours": self.duration_hours
-        }
-    
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'ScheduleEntry':
-        """Vytvoření instance z dict s podporou starého i nového formátu"""
-        # Nový formát s start_time a end_time
-        if "start_time" in data and "end_time" in data:
-            entry = cls(
-                name=data.get("name", ""),
-                start_time=data.get("start_time", "08:00"),
-                end_time=data.get("end_time", "10:00"),
-                mode=data.get("mode", "FAN"),
-                temperature=data.get("temperature", 22),
-                wind=data.get("wind", "AUTO"),
-                power_on=data.get("power_on", True),
-                power_off_at_end=data.get("power_off_at_end", True)
-            )
-        else:
-            # Starý formát - převést duration_hours na end_time
-            start_time = data.get("time", "08:00")
-            duration_hours = data.get("duration_hours", 2)
-            
-            entry = cls(
-                name=data.get("name", ""),
-                start_time=start_time,
-                end_time="10:00",  # Dočasně
-                mode=data.get("mode", "FAN"),
-                temperature=data.get("temperature", 22),
-                wind=data.get("wind", "AUTO"),
-                power_on=data.get("power_on", True),
-                power_off_at_end=data.get("power_off_at_end", True)
-            )
-            
-            # Vypočítat end_time z duration
-            entry.end_time = entry._calculate_end_time_from_duration(duration_hours)
-        
-        entry.enabled = data.get("enabled", True)
-        return entry
+from schedule_logic import (ScheduleEntry, CompiledSchedule, SCHEDULE_FILE,
+                            find_priority_conflicts, merge_entries)
+from schedule_store import ScheduleStore
 
 class SchedulerWidget(ttk.Frame):
     """Widget pro správu časového plánu"""
@@ -125,8 +21,11 @@ class SchedulerWidget(ttk.Frame):
         self.modes = modes
         self.wind_options = wind_options
         self.on_schedule_change = on_schedule_change
-        self.schedule_file = "data/schedule.json"
+        self.schedule_file = SCHEDULE_FILE
+        self.store = ScheduleStore(self.schedule_file)  # Zápisy běží na pracovním vlákně
         self.schedule_entries: List[ScheduleEntry] = []
+        self.compiled_schedule = CompiledSchedule([])
+        self.priority_conflicts = []
         
         self.create_widgets()
         self.load_schedule()
@@ -215,9 +114,9 @@ class SchedulerWidget(ttk.Frame):
         item_id = selection[0]
         index = int(item_id) if item_id.isdigit() else 0
         if 0 <= index < len(self.schedule_entries):
-            del self.schedule_entries[index]
-            self.refresh_display()
-            self.save_schedule()
+            removed = self.schedule_entries.pop(index)
+            self.store.delete(removed.id)
+            self.schedule_changed()
             
     def toggle_selected(self):
         """Zapnutí/vypnutí vybraného záznamu"""
@@ -228,9 +127,10 @@ class SchedulerWidget(ttk.Frame):
         item_id = selection[0]
         index = int(item_id) if item_id.isdigit() else 0
         if 0 <= index < len(self.schedule_entries):
-            self.schedule_entries[index].enabled = not self.schedule_entries[index].enabled
-            self.refresh_display()
-            self.save_schedule()
+            entry = self.schedule_entries[index]
+            entry.enabled = not entry.enabled
+            self.store.put(entry)
+            self.schedule_changed()
             
     def open_schedule_dialog(self, entry: ScheduleEntry = None, index: int = -1):
         """Otevření dialogu pro úpravu/přidání plánu"""
@@ -239,12 +139,13 @@ class SchedulerWidget(ttk.Frame):
         
         if result:
             if index >= 0:  # Úprava existujícího
+                result.id = entry.id
                 self.schedule_entries[index] = result
             else:  # Přidání nového
                 self.schedule_entries.append(result)
             
-            self.refresh_display()
-            self.save_schedule()
+            self.store.put(result)
+            self.schedule_changed()
             
     def refresh_display(self):
         """Obnovení zobrazení seznamu plánů"""
@@ -266,72 +167,57 @@ class SchedulerWidget(ttk.Frame):
         # Aktualizace status labelu
         enabled_count = sum(1 for e in self.schedule_entries if e.enabled)
         total_count = len(self.schedule_entries)
-        self.status_label.config(text=f"Plánů: {total_count}, Aktivních: {enabled_count}")
+        status_text = f"Plánů: {total_count}, Aktivních: {enabled_count}"
+        self.priority_conflicts = find_priority_conflicts(self.schedule_entries)
+        if self.priority_conflicts:
+            status_text += f", ⚠️ Konfliktů: {len(self.priority_conflicts)}"
+        self.status_label.config(text=status_text)
+        
+    def schedule_changed(self):
+        """Po přidání/úpravě/smazání: překompilovat, překreslit a oznámit změnu (uložení zařídí store)"""
+        self.compiled_schedule = CompiledSchedule(self.schedule_entries)
+        self.refresh_display()
+        self.warn_priority_conflicts()
+        if self.on_schedule_change:
+            self.on_schedule_change(self.schedule_entries)
+        
+    def warn_priority_conflicts(self):
+        """Upozornění na překrývající se plány se stejnou prioritou (zjištěné v refresh_display)"""
+        conflicts = self.priority_conflicts
+        if not conflicts:
+            return
+        
+        lines = [f"• {a.name or 'Plán'} ({a.start_time}-{a.end_time}) × "
+                 f"{b.name or 'Plán'} ({b.start_time}-{b.end_time})"
+                 for a, b in conflicts[:5]]
+        if len(conflicts) > 5:
+            lines.append(f"... a dalších {len(conflicts) - 5}")
+        messagebox.showwarning(
+            "Překrývající se plány",
+            "Tyto plány se překrývají a mají stejnou prioritu:\n\n" + "\n".join(lines) +
+            "\n\nPlatí plán výše v seznamu. Pro jednoznačné pořadí nastavte různé priority.")
         
     def save_schedule(self):
-        """Uložení plánu do souboru"""
-        try:
-            os.makedirs("data", exist_ok=True)
-            schedule_data = [entry.to_dict() for entry in self.schedule_entries]
-            data = {
-                "schedules": schedule_data,
-                "settings": {
-                    "enable_scheduler": True,
-                    "notification_enabled": True,
-                    "auto_execute": True
-                }
-            }
-            with open(self.schedule_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving schedule: {e}")
+        """Uložení celého plánu (nový snapshot) - jednotlivé změny ukládá store průběžně"""
+        self.store.replace_all(self.schedule_entries)
             
     def load_schedule(self):
-        """Načtení plánu ze souboru"""
-        try:
-            if os.path.exists(self.schedule_file):
-                with open(self.schedule_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Kontrola struktury souboru
-                    if isinstance(data, dict) and "schedules" in data:
-                        schedules_data = data["schedules"]
-                    elif isinstance(data, list):
-                        schedules_data = data
-                    else:
-                        schedules_data = []
-                    
-                    self.schedule_entries = [ScheduleEntry.from_dict(item) for item in schedules_data]
-                    self.refresh_display()
-        except Exception as e:
-            print(f"Error loading schedule: {e}")
-            self.schedule_entries = []
+        """Načtení plánu ze souboru (snapshot + žurnál změn)"""
+        self.schedule_entries = self.store.load()
+        self.compiled_schedule = CompiledSchedule(self.schedule_entries)
+        self.refresh_display()
+            
+    def apply_reloaded(self, entries: List[ScheduleEntry]):
+        """Převzetí plánů znovu načtených ze souboru (hot reload) - nic se neukládá"""
+        merged, changed = merge_entries(self.schedule_entries, entries)
+        if not changed and [e.id for e in merged] == [e.id for e in self.schedule_entries]:
+            return
+        self.schedule_entries = merged
+        self.schedule_changed()
             
     def get_active_schedule_for_time(self, current_time: datetime) -> ScheduleEntry:
-        """Získání aktivního plánu pro daný čas"""
-        current_time_only = current_time.time()
-        
-        for entry in self.schedule_entries:
-            if not entry.enabled:
-                continue
-                
-            try:
-                start_time = datetime.strptime(entry.start_time, "%H:%M").time()
-                end_time = datetime.strptime(entry.end_time, "%H:%M").time()
-                
-                # Kontrola, zda aktuální čas je mezi start_time a end_time
-                if end_time > start_time:
-                    # Normální rozsah (např. 8:00 - 10:00)
-                    if start_time <= current_time_only <= end_time:
-                        return entry
-                else:
-                    # Rozsah přes půlnoc (např. 22:00 - 02:00)
-                    if current_time_only >= start_time or current_time_only <= end_time:
-                        return entry
-                        
-            except ValueError:
-                continue
-                
-        return None
+        """Získání aktivního plánu pro daný čas (předkompilovaná časová osa, O(log n))"""
+        return self.compiled_schedule.active_at(current_time)
 
 class ScheduleEditDialog:
     """Dialog pro úpravu/vytvoření plánu"""
@@ -346,7 +232,7 @@ class ScheduleEditDialog:
         # Vytvoření modálního okna
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Úprava plánu")
-        self.dialog.geometry("400x500")
+        self.dialog.geometry("400x550")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
@@ -407,6 +293,11 @@ class ScheduleEditDialog:
         self.power_off_var = tk.BooleanVar()
         ttk.Checkbutton(main_frame, text="Vypnout zařízení na konci plánu", variable=self.power_off_var).pack(anchor="w", pady=2)
         
+        # Priorita při překryvu s jiným plánem
+        ttk.Label(main_frame, text="Priorita (vyšší vyhrává při překryvu):").pack(anchor="w", pady=(10,2))
+        self.priority_var = tk.IntVar()
+        ttk.Spinbox(main_frame, from_=0, to=10, textvariable=self.priority_var, width=5).pack(anchor="w", pady=2)
+        
         # Tlačítka
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(fill="x", pady=(20,0))
@@ -435,6 +326,7 @@ class ScheduleEditDialog:
         self.wind_var.set(self.entry.wind)
         self.power_var.set(self.entry.power_on)
         self.power_off_var.set(getattr(self.entry, 'power_off_at_end', True))
+        self.priority_var.set(getattr(self.entry, 'priority', 0))
         
         # Aktualizace labelu teploty
         self.update_temp_label(self.entry.temperature)
@@ -462,7 +354,8 @@ class ScheduleEditDialog:
                 temperature=int(self.temp_var.get()),
                 wind=self.wind_var.get(),
                 power_on=self.power_var.get(),
-                power_off_at_end=self.power_off_var.get()
+                power_off_at_end=self.power_off_var.get(),
+                priority=int(self.priority_var.get())
             )
             
             self.dialog.destroy()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Analýza provozu klimatizace nad historií stavů (status_history).
+
+Všechny výpočty jsou vektorové (NumPy) nad sloupci historie:
+    - denní doba provozu podle režimu a duty cycle (podíl provozu)
+    - doba od zapnutí do dosažení cílové teploty
+    - odhad spotřeby energie (ThinQ API spotřebu u klimatizací nehlásí)
+
+Každý vzorek platí až do následujícího, nejvýše však MAX_SAMPLE_GAP
+sekund - výpadek aplikace se nepočítá jako provoz. Dny se počítají
+v lokálním čase (posun podle aktuálního pásma).
+
+    python src/main.py --mode cli --analytics --days 7
+"""
+import json
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from status_history import MISSING, StatusHistory
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = Path(__file__).parent.parent / "data" / "config.json"
+MAX_SAMPLE_GAP = 1800        # Max. doba platnosti jednoho vzorku (s)
+TARGET_TOLERANCE = 0.5       # Cílová teplota dosažena s tolerancí (°C)
+POWER_ON_VALUES = ("POWER_ON",)
+
+# Odhad příkonu podle režimu (W) - lze přepsat v config.json: "analytics": {"rated_power": {...}}
+DEFAULT_RATED_POWER = {"COOL": 900, "HEAT": 1000, "AUTO": 900, "AIR_DRY": 500, "FAN": 40}
+# Poměr příkonu podle síly ventilátoru
+WIND_FACTOR = {"LOW": 0.7, "MID": 0.85, "HIGH": 1.0, "AUTO": 0.9}
+# Režimy s kompresorem - příkon roste s rozdílem aktuální a cílové teploty
+COMPRESSOR_MODES = ("COOL", "HEAT", "AUTO", "AIR_DRY")
+
+
+def load_arrays(history: StatusHistory, device_id: str, start: float = None, end: float = None):
+    """
+    Sloupce historie jako NumPy pole (bez kopírování bufferů).
+
+    Returns:
+        dict: timestamp (int64), current/target (float, NaN = chybí),
+              job_mode/wind_strength/power (kódy uint8) a slovníky kódů
+    """
+    columns = history.query_columns(device_id, start, end)
+
+    def temperature(name):
+        raw = np.frombuffer(columns.numbers[name], dtype=np.int16).astype(np.float64)
+        raw[raw == MISSING] = np.nan
+        return raw / 10.0
+
+    return {
+        "timestamp": np.frombuffer(columns.timestamps, dtype=np.int64),
+        "current": temperature("current_temperature"),
+        "target": temperature("target_temperature"),
+        "job_mode": np.frombuffer(columns.enums["job_mode"], dtype=np.uint8),
+        "wind_strength": np.frombuffer(columns.enums["wind_strength"], dtype=np.uint8),
+        "power": np.frombuffer(columns.enums["power"], dtype=np.uint8),
+        "values": {field: history.enum_values(field) for field in ("job_mode", "wind_strength", "power")},
+    }
+
+
+def sample_durations(timestamps: np.ndarray, end: float = None,
+                     max_gap: float = MAX_SAMPLE_GAP) -> np.ndarray:
+    """Doba platnosti každého vzorku (s) - do dalšího vzorku, nejvýše max_gap"""
+    if not len(timestamps):
+        return np.zeros(0)
+    last = end if end is not None else timestamps[-1] + max_gap
+    following = np.append(timestamps[1:], max(last, timestamps[-1]))
+    return np.minimum(following - timestamps, max_gap).astype(np.float64)
+
+
+def _codes_for(values: Dict[int, str], names: Iterable[str]) -> np.ndarray:
+    """Kódy slovníku pro dané hodnoty výčtu"""
+    return np.array([code for code, value in values.items() if value in names], dtype=np.uint8)
+
+
+def _lookup(values: Dict[int, str], table: Dict[str, float], default: float) -> np.ndarray:
+    """Převodní tabulka kód -> číslo (index = kód uint8)"""
+    lookup = np.full(256, default, dtype=np.float64)
+    for code, value in values.items():
+        lookup[code] = table.get(value, default)
+    return lookup
+
+
+def time_to_target(arrays: dict, running: np.ndarray,
+                   tolerance: float = TARGET_TOLERANCE) -> np.ndarray:
+    """
+    Doba od zapnutí do dosažení cílové teploty pro každé zapnutí (s).
+
+    Zapnutí, po kterém se cíle nedosáhlo před vypnutím, se vynechá.
+    """
+    timestamps = arrays["timestamp"]
+    if not len(timestamps):
+        return np.zeros(0)
+
+    previous = np.concatenate(([False], running[:-1]))
+    starts = np.flatnonzero(running & ~previous)
+    stops = np.flatnonzero(~running & previous)
+    with np.errstate(invalid="ignore"):
+        reached = np.flatnonzero(running & (np.abs(arrays["current"] - arrays["target"]) <= tolerance))
+    if not len(starts):
+        return np.zeros(0)
+
+    # První dosažení cíle a první vypnutí po každém zapnutí (binární hledání);
+    # zarážka len(timestamps) = nenastalo
+    sentinel = [len(timestamps)]
+    first_reached = np.append(reached, sentinel)[np.searchsorted(reached, starts)]
+    next_stop = np.append(stops, sentinel)[np.searchsorted(stops, starts)]
+    valid = first_reached < next_stop
+    return (timestamps[first_reached[valid]] - timestamps[starts[valid]]).astype(np.float64)
+
+
+def analyze_device(history: StatusHistory, device_id: str, start: float = None,
+                   end: float = None, rated_power: Dict[str, float] = None) -> Optional[dict]:
+    """
+    Denní statistiky provozu jednoho zařízení.
+
+    Returns:
+        dict: {"days": [{"date", "runtime" {režim: s}, "running", "covered",
+               "duty_cycle", "energy_kwh"}], "time_to_target": {...},
+               "total": {...}} nebo None bez dat
+    """
+    arrays = load_arrays(history, device_id, start, end)
+    timestamps = arrays["timestamp"]
+    if not len(timestamps):
+        return None
+
+    values = arrays["values"]
+    durations = sample_durations(timestamps, end)
+    running = np.isin(arrays["power"], _codes_for(values["power"], POWER_ON_VALUES))
+    run_time = np.where(running, durations, 0.0)
+
+    # Dny v lokálním čase
+    utc_offset = time.localtime().tm_gmtoff
+    days = (timestamps + utc_offset) // 86400
+    first_day = days[0]
+    day_index = (days - first_day).astype(np.int64)
+    day_count = int(day_index[-1]) + 1
+
+    # Doba provozu podle (den, režim) - jeden bincount přes složený index
+    mode_codes = arrays["job_mode"].astype(np.int64)
+    runtime = np.bincount(day_index * 256 + mode_codes, weights=run_time,
+                          minlength=day_count * 256).reshape(day_count, 256)
+    covered = np.bincount(day_index, weights=durations, minlength=day_count)
+    running_per_day = runtime.sum(axis=1)
+
+    # Odhad příkonu: režim x ventilátor x zátěž kompresoru
+    power_table = {**DEFAULT_RATED_POWER, **(rated_power or {})}
+    watts = _lookup(values["job_mode"], power_table, 0.0)[arrays["job_mode"]]
+    watts = watts * _lookup(values["wind_strength"], WIND_FACTOR, 0.9)[arrays["wind_strength"]]
+    compressor = np.isin(arrays["job_mode"], _codes_for(values["job_mode"], COMPRESSOR_MODES))
+    with np.errstate(invalid="ignore"):
+        load = np.clip(0.3 + 0.15 * np.abs(arrays["current"] - arrays["target"]), 0.3, 1.0)
+    load = np.where(np.isnan(load), 0.6, load)
+    watts = np.where(compressor, watts * load, watts)
+    energy = np.bincount(day_index, weights=watts * run_time, minlength=day_count) / 3.6e6
+
+    result_days = []
+    mode_names = values["job_mode"]
+    for index in np.flatnonzero(covered):
+        day_start = (first_day + index) * 86400 - utc_offset
+        modes = {mode_names.get(code, "?"): float(seconds)
+                 for code, seconds in enumerate(runtime[index]) if seconds}
+        result_days.append({
+            "date": datetime.fromtimestamp(day_start).strftime("%Y-%m-%d"),
+            "runtime": modes,
+            "running": float(running_per_day[index]),
+            "covered": float(covered[index]),
+            "duty_cycle": float(running_per_day[index] / covered[index]),
+            "energy_kwh": float(energy[index])
+        })
+
+    reach_times = time_to_target(arrays, running)
+    return {
+        "device_id": device_id,
+        "samples": int(len(timestamps)),
+        "days": result_days,
+        "time_to_target": {
+            "count": int(len(reach_times)),
+            "median": float(np.median(reach_times)) if len(reach_times) else None,
+            "mean": float(reach_times.mean()) if len(reach_times) else None,
+        },
+        "total": {
+            "running": float(running_per_day.sum()),
+            "covered": float(covered.sum()),
+            "duty_cycle": float(running_per_day.sum() / covered.sum()) if covered.sum() else 0.0,
+            "energy_kwh": float(energy.sum())
+        }
+    }
+
+
+def analyze_fleet(history: StatusHistory, device_ids: Iterable[str] = None, start: float = None,
+                  end: float = None, rated_power: Dict[str, float] = None) -> Dict[str, dict]:
+    """Statistiky všech zařízení v historii (nebo zadaného seznamu)"""
+    results = {}
+    for device_id in device_ids or history.devices():
+        result = analyze_device(history, device_id, start, end, rated_power)
+        if result:
+            results[device_id] = result
+    return results
+
+
+def today_summary(history: StatusHistory, device_id: str,
+                  rated_power: Dict[str, float] = None) -> Optional[dict]:
+    """Statistiky dnešního dne (od lokální půlnoci) - pro InfoPanel"""
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    result = analyze_device(history, device_id, midnight, time.time(), rated_power)
+    if not result or not result["days"]:
+        return None
+    return {**result["days"][-1], "time_to_target": result["time_to_target"]}
+
+
+def load_rated_power(config_file=CONFIG_FILE) -> Dict[str, float]:
+    """Příkon podle režimu z config.json ("analytics": {"rated_power": {...}}), jinak výchozí"""
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return {**DEFAULT_RATED_POWER, **config.get("analytics", {}).get("rated_power", {})}
+    except Exception:
+        return dict(DEFAULT_RATED_POWER)
+
+
+def format_duration(seconds: float) -> str:
+    """Doba v sekundách jako "2 h 15 min" """
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60} h {minutes % 60:02d} min"
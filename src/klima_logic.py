@@ -6,11 +6,14 @@ Obsahuje všechny typy kontrolních příkazů.
 import logging
 import json
 
+from profile_validator import PayloadValidationError
+
 logger = logging.getLogger(__name__)
 
 def create_control_payload(command_type: str, *args, **kwargs):
     """
     Univerzální funkce pro vytváření payloadů pro různé typy příkazů.
+    Profil zařízení se tu nekontroluje - to dělá ThinQAPI.send_device_command (validátor cílového zařízení).
     
     Args:
         command_type: Typ příkazu (power, mode, temperature, wind_strength, atd.)
@@ -20,6 +23,30 @@ def create_control_payload(command_type: str, *args, **kwargs):
     Returns:
         dict: Payload pro ThinQ API
     """
+    return _build_control_payload(command_type, *args, **kwargs)
+
+def validate_payload(payload: dict, mode: str = None, validator=None):
+    """
+    Kontrola payloadu podle profilu zařízení - čísla se oříznou do rozsahu, neplatné hodnoty odmítnou.
+    
+    Args:
+        payload: Payload příkazu
+        mode: Režim zařízení (rozsah cílové teploty)
+        validator: PayloadValidator cílového zařízení (ThinQAPI.payload_validator), None = bez kontroly
+    
+    Raises:
+        PayloadValidationError: Neznámá vlastnost nebo hodnota mimo profil
+    """
+    if validator is None or not payload:
+        return payload  # Bez profilu rozhodne až server
+    try:
+        return validator.validate(payload, mode)
+    except PayloadValidationError as e:
+        logger.error(f"❌ Neplatný příkaz: {e}")
+        raise
+
+def _build_control_payload(command_type: str, *args, **kwargs):
+    """Sestavení payloadu bez kontroly profilu (viz create_control_payload)"""
     try:
         if command_type == "power":
             state = args[0] if args else "POWER_ON"
@@ -34,34 +61,18 @@ def create_control_payload(command_type: str, *args, **kwargs):
             temperature = args[0] if args else 22
             mode = args[1] if len(args) > 1 else kwargs.get("mode")
             
-            # Celá čísla pouze (žádné půlstupně)
+            # Celá čísla pouze (žádné půlstupně) - rozsah podle režimu hlídá profil zařízení při odeslání
             temp_int = int(round(float(temperature)))
             
-            # Rozsah podle módu pro validaci (ale vždy odesíláme do obecného targetTemperature)
-            if mode == "HEAT":
-                # Pro vytápění: rozsah 16-30°C
-                temp_clamped = max(16, min(30, temp_int))
-                mode_info = "HEAT (16-30°C)"
-            elif mode in ["COOL", "AUTO", "AIR_DRY"]:
-                # Pro chlazení/auto/odvlhčování: rozsah 18-30°C
-                temp_clamped = max(18, min(30, temp_int))
-                mode_info = f"{mode} (18-30°C)"
-            else:
-                # Fallback - obecný rozsah
-                temp_clamped = max(18, min(30, temp_int))
-                mode_info = f"{mode or 'DEFAULT'} (18-30°C)"
-            
-            logger.info(f"🌡️ TEPLOTA - Vstup: {temperature}")
-            logger.info(f"   ↳ Celé číslo: {temp_int} -> Omezeno: {temp_clamped}")
-            logger.info(f"   ↳ FUNGUJÍCÍ ŘEŠENÍ: Pouze targetTemperature jako number, bez režimu")
+            logger.info(f"🌡️ TEPLOTA - Vstup: {temperature} -> {temp_int} ({mode or 'bez režimu'})")
             
             # FUNGUJÍCÍ ŘEŠENÍ: Pouze teplota bez režimu
-            payload = {"temperature": {"targetTemperature": temp_clamped}}
+            payload = {"temperature": {"targetTemperature": temp_int}}
             
             # NEBUDEME měnit režim současně - způsobuje problémy
             # if mode:
             #     payload["airConJobMode"] = {"currentJobMode": mode}
-                
+            
             logger.info(f"🔧 PAYLOAD: {json.dumps(payload, ensure_ascii=False)}")
             return payload
         
@@ -113,6 +124,95 @@ def create_control_payload(command_type: str, *args, **kwargs):
         logger.error(f"Chyba při vytváření payloadu pro {command_type}: {e}")
         return {}
 
+def create_command_payload(command: str, *args, current_status: dict = None, validator=None):
+    """
+    Převod pojmenovaného příkazu (GUI, plánovač, daemon) na payload.
+    
+    Args:
+        command: Název příkazu (toggle_power, power_on, change_mode, set_temperature, ...)
+        *args: Parametry příkazu (set_temperature: teplota, volitelně režim pro rozsah podle profilu)
+        current_status: Aktuální stav zařízení (nutný pro toggle_power, režim pro set_temperature)
+        validator: PayloadValidator cílového zařízení - payload se rovnou zkontroluje (None = kontrola až při odeslání)
+    
+    Returns:
+        dict: Payload pro ThinQ API, nebo None pro neznámý příkaz
+    
+    Raises:
+        PayloadValidationError: Hodnota, kterou zařízení podle profilu validatoru nepřijme
+    """
+    payload = _command_payload(command, *args, current_status=current_status)
+    if validator is None or payload is None:
+        return payload
+    mode = None
+    if command == "set_temperature":
+        mode = args[1] if len(args) > 1 else (current_status or {}).get("airConJobMode", {}).get("currentJobMode")
+    return validate_payload(payload, mode, validator)
+
+def _command_payload(command: str, *args, current_status: dict = None):
+    """Payload pojmenovaného příkazu bez kontroly profilu (viz create_command_payload)"""
+    if command == "toggle_power":
+        # Podle device_profile.json: operation.airConOperationMode pro power stav
+        current_power = (current_status or {}).get("operation", {}).get("airConOperationMode", "POWER_OFF")
+        
+        # Pokud je vypnuté, zapneme. Pokud je zapnuté, vypneme
+        new_state = "POWER_ON" if current_power == "POWER_OFF" else "POWER_OFF"
+        logger.info(f"Toggle power: {current_power} -> {new_state}")
+        return create_control_payload("power", new_state)
+    
+    elif command == "power_on":
+        return create_control_payload("power", "POWER_ON")
+    
+    elif command == "power_off":
+        return create_control_payload("power", "POWER_OFF")
+    
+    elif command == "change_mode":
+        return create_control_payload("mode", args[0])
+    
+    elif command == "set_temperature":
+        # Pouze teplota bez režimu (fungující řešení) - režim určí jen povolený rozsah
+        return create_control_payload("temperature", *args[:2])
+    
+    elif command == "set_wind_strength":
+        return create_control_payload("wind_strength", args[0])
+    
+    elif command == "set_wind_direction":
+        return create_control_payload("wind_direction", args[0], args[1])
+    
+    elif command == "set_power_save":
+        return create_control_payload("power_save", args[0])
+    
+    elif command == "set_sleep_timer":
+        return create_control_payload("sleep_timer", args[0], args[1])
+    
+    elif command == "cancel_all_timers":
+        return create_control_payload("cancel_timers")
+    
+    logger.warning(f"Neznámý příkaz: {command}")
+    return None
+
+def parse_cli_command(command: str):
+    """
+    Převod CLI příkazu (power_on, power_off, mode_cool, temp_22, ...) na payload.
+    Rozsah teploty podle profilu a režimu zařízení zkontroluje až send_device_command.
+    
+    Args:
+        command: CLI příkaz
+    
+    Returns:
+        dict: Payload pro ThinQ API, nebo None pro neznámý příkaz
+    """
+    if command.lower() == "power_on":
+        return create_control_payload("power", "POWER_ON")
+    elif command.lower() == "power_off":
+        return create_control_payload("power", "POWER_OFF")
+    elif command.lower().startswith("mode_"):
+        mode = command.lower().replace("mode_", "").upper()
+        return create_control_payload("mode", mode)
+    elif command.lower().startswith("temp_"):
+        temp = float(command.lower().replace("temp_", ""))
+        return create_control_payload("temperature", temp)
+    return None
+
 # Zpětná kompatibilita s původními funkcemi
 def get_power_payload(power_state: str):
     """Zpětně kompatibilní funkce pro power payload"""
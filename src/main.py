@@ -11,34 +11,58 @@ from pathlib import Path
 # Zajistíme, že Python najde naše moduly
 sys.path.insert(0, str(Path(__file__).parent))
 
+AIR_CONDITIONER = "AIR_CONDITIONER"  # Typ bez předpony DEVICE_ (fleet.normalize_devices)
+
+# Typ zařízení -> název v nadpisu výpisu stavu ("Stav ...")
+DEVICE_TYPE_TITLES = {
+    AIR_CONDITIONER: "klimatizace",
+    "REFRIGERATOR": "lednice",
+    "WASHER": "pračky",
+    "DRYER": "sušičky",
+}
+
 def main():
     """Hlavní funkce aplikace"""
     parser = argparse.ArgumentParser(description="LG ThinQ Klimatizace - Ovládání & Plánování")
-    parser.add_argument("--mode", choices=["gui", "cli"], default="gui", 
-                       help="Režim spuštění: gui (výchozí) nebo cli")
+    parser.add_argument("--mode", choices=["gui", "cli", "daemon"], default="gui", 
+                       help="Režim spuštění: gui (výchozí), cli nebo daemon (plánovač bez GUI)")
     parser.add_argument("--device-id", type=str,
-                       help="ID zařízení (pro CLI režim)")
+                       help="ID zařízení (pro CLI a daemon režim)")
     parser.add_argument("--command", type=str,
                        help="Příkaz pro zařízení (pro CLI režim)")
     parser.add_argument("--status", action="store_true",
                        help="Zobrazit stav zařízení (CLI)")
+    parser.add_argument("--all", action="store_true",
+                       help="Se --status zobrazit stav všech zařízení z devices.json (CLI)")
+    parser.add_argument("--analytics", action="store_true",
+                       help="Statistiky provozu z historie stavů (CLI, vyžaduje numpy)")
+    parser.add_argument("--days", type=int, default=7,
+                       help="Počet dní pro --analytics (výchozí 7)")
     
     args = parser.parse_args()
     
     if args.mode == "gui":
         run_gui()
+    elif args.mode == "daemon":
+        run_daemon(args.device_id)
     elif args.mode == "cli":
         # CLI režim
         print("LG ThinQ Klimatizace - CLI režim")
         
-        if args.status:
+        if args.analytics:
+            # Statistiky provozu z uložené historie (bez volání API)
+            cli_show_analytics(args.device_id, args.days, args.all)
+        elif args.status and args.all:
+            # Souběžné zobrazení stavu všech zařízení
+            asyncio.run(cli_show_fleet_status())
+        elif args.status:
             # Zobrazení stavu zařízení
             asyncio.run(cli_show_status(args.device_id))
         elif args.command:
             # Provedení příkazu
             asyncio.run(cli_execute_command(args.device_id, args.command))
         else:
-            print("Pro CLI režim zadejte --status nebo --command")
+            print("Pro CLI režim zadejte --status, --command nebo --analytics")
             parser.print_help()
 
 def run_cli():
@@ -55,69 +79,178 @@ def run_gui():
         print("Zkuste nainstalovat potřebné závislosti: pip install tkinter")
         sys.exit(1)
 
+def run_daemon(device_id=None):
+    """Spuštění headless daemonu (plánovač + kontrola stavu, bez tkinter)"""
+    from daemon import main as daemon_main
+    daemon_main(device_id)
+
 async def cli_show_status(device_id=None):
     """CLI funkce pro zobrazení stavu zařízení"""
     try:
-        from server_api import ThinQAPI
-        
-        api = ThinQAPI()
-        await api.initialize()
-        
         # Použití výchozího device_id, pokud není zadáno
         if not device_id:
             device_id = "ef279add7b418795378e9d20631cd85d86aa5e356a7e4599584434c4ead89c4e"
-            
-        status = await api.get_device_status(device_id)
         
-        # Podle device_profile.json: kombinace runState a operation
-        run_state = status.get("runState", {}).get("currentState", "N/A")
-        power_operation = status.get("operation", {}).get("airConOperationMode", "N/A")
-        
-        print(f"\n=== Stav klimatizace (ID: {device_id[:8]}...) ===")
-        print(f"Napájení: {power_operation} (Běh: {run_state})")
-        print(f"Režim: {status.get('airConJobMode', {}).get('currentJobMode', 'N/A')}")
-        print(f"Aktuální teplota: {status.get('temperature', {}).get('currentTemperature', 'N/A')}°C")
-        print(f"Cílová teplota: {status.get('temperature', {}).get('targetTemperature', 'N/A')}°C")
-        print(f"Síla větru: {status.get('airFlow', {}).get('windStrength', 'N/A')}")
-        print(f"Úspora energie: {status.get('powerSave', {}).get('powerSaveEnabled', False)}")
+        # Běžící daemon - bez načítání konfigurace a nového TLS spojení
+        response = await daemon_request({"op": "status", "device_id": device_id})
+        if response is not None:
+            if not response.get("ok"):
+                raise RuntimeError(response.get("error"))
+            status = response["status"]
+        else:
+            from server_api import ThinQAPI
+            
+            api = ThinQAPI()
+            await api.initialize()
+            status = await api.get_device_status(device_id)
+            await api.close()
         
-        await api.close()
+        print_device_status(device_id, status)
         
     except Exception as e:
         print(f"Chyba při získávání stavu: {e}")
 
-async def cli_execute_command(device_id, command):
-    """CLI funkce pro provedení příkazu"""
+async def daemon_request(request):
+    """
+    Pokus o vyřízení požadavku běžícím daemonem přes řídicí socket.
+    
+    Returns:
+        dict: Odpověď daemonu, nebo None pokud daemon neběží
+    """
+    from control_server import control_request
+    
+    try:
+        return await control_request(request)
+    except ConnectionError:
+        return None
+
+def print_device_status(device_id, status, alias=None, device_type=AIR_CONDITIONER):
+    """
+    Výpis stavu jednoho zařízení do konzole.
+    
+    Args:
+        device_type: Typ zařízení (devices.json) - jiná než klimatizace se vypíšou obecně (všechna pole)
+    """
+    title = f"{alias} " if alias else ""
+    if device_type and device_type != AIR_CONDITIONER:
+        from status_diff import flatten_status
+        
+        name = DEVICE_TYPE_TITLES.get(device_type, "zařízení")
+        print(f"\n=== Stav {name} {title}(ID: {device_id[:8]}...) ===")
+        for path, value in flatten_status(status).items():
+            print(f"{path}: {value}")
+        return
+    
+    # Podle device_profile.json: kombinace runState a operation
+    run_state = status.get("runState", {}).get("currentState", "N/A")
+    power_operation = status.get("operation", {}).get("airConOperationMode", "N/A")
+    
+    print(f"\n=== Stav klimatizace {title}(ID: {device_id[:8]}...) ===")
+    print(f"Napájení: {power_operation} (Běh: {run_state})")
+    print(f"Režim: {status.get('airConJobMode', {}).get('currentJobMode', 'N/A')}")
+    print(f"Aktuální teplota: {status.get('temperature', {}).get('currentTemperature', 'N/A')}°C")
+    print(f"Cílová teplota: {status.get('temperature', {}).get('targetTemperature', 'N/A')}°C")
+    print(f"Síla větru: {status.get('airFlow', {}).get('windStrength', 'N/A')}")
+    print(f"Úspora energie: {status.get('powerSave', {}).get('powerSaveEnabled', False)}")
+
+async def cli_show_fleet_status():
+    """CLI funkce pro souběžné zobrazení stavu všech zařízení"""
     try:
         from server_api import ThinQAPI
-        from klima_logic import create_control_payload
+        from fleet import FleetPoller
         
         api = ThinQAPI()
         await api.initialize()
         
+        try:
+            results = await FleetPoller(api).poll_all()
+        finally:
+            await api.close()
+        
+        for device_id, result in results.items():
+            alias = result["device"].get("alias")
+            if result["error"]:
+                print(f"\n=== {alias or ''} (ID: {device_id[:8]}...) ===")
+                print(f"Chyba: {result['error']}")
+            else:
+                print_device_status(device_id, result["status"], alias, result["device"].get("type"))
+        
+    except Exception as e:
+        print(f"Chyba při získávání stavu zařízení: {e}")
+
+def cli_show_analytics(device_id=None, days=7, all_devices=False):
+    """CLI funkce pro výpis statistik provozu z historie stavů"""
+    try:
+        import time
+        from status_history import StatusHistory
+        from history_analytics import analyze_fleet, load_rated_power, format_duration
+    except ImportError as e:
+        print(f"Statistiky vyžadují numpy ({e}) - pip install numpy")
+        return
+    
+    if not device_id and not all_devices:
+        device_id = "ef279add7b418795378e9d20631cd85d86aa5e356a7e4599584434c4ead89c4e"
+    
+    history = StatusHistory()
+    try:
+        end = time.time()
+        results = analyze_fleet(history, None if all_devices else [device_id],
+                                end - days * 86400, end, load_rated_power())
+    finally:
+        history.close()
+    
+    if not results:
+        print("Historie stavů je prázdná - data sbírá GUI nebo daemon režim")
+        return
+    
+    for result_id, result in results.items():
+        total = result["total"]
+        print(f"\n=== Provoz za {days} dní (ID: {result_id[:8]}...) ===")
+        for day in result["days"]:
+            modes = ", ".join(f"{mode} {format_duration(seconds)}"
+                              for mode, seconds in sorted(day["runtime"].items()))
+            print(f"{day['date']}: {format_duration(day['running']):>12}  "
+                  f"duty {day['duty_cycle']:5.1%}  ~{day['energy_kwh']:.2f} kWh  {modes}")
+        print(f"Celkem: {format_duration(total['running'])}, duty cycle {total['duty_cycle']:.1%}, "
+              f"odhad spotřeby {total['energy_kwh']:.2f} kWh")
+        reach = result["time_to_target"]
+        if reach["count"]:
+            print(f"Dosažení cílové teploty po zapnutí: medián {format_duration(reach['median'])} "
+                  f"({reach['count']}×)")
+
+async def cli_execute_command(device_id, command):
+    """CLI funkce pro provedení příkazu"""
+    try:
+        from klima_logic import parse_cli_command
+        
         if not device_id:
             device_id = "ef279add7b418795378e9d20631cd85d86aa5e356a7e4599584434c4ead89c4e"
         
         # Parsing příkazů
-        if command.lower() == "power_on":
-            payload = create_control_payload("power", "POWER_ON")
-        elif command.lower() == "power_off":
-            payload = create_control_payload("power", "POWER_OFF")
-        elif command.lower().startswith("mode_"):
-            mode = command.replace("mode_", "").upper()
-            payload = create_control_payload("mode", mode)
-        elif command.lower().startswith("temp_"):
-            temp = float(command.replace("temp_", ""))
-            payload = create_control_payload("temperature", temp)
-        else:
+        payload = parse_cli_command(command)
+        if payload is None:
             print(f"Neznámý příkaz: {command}")
             print("Dostupné příkazy: power_on, power_off, mode_cool, mode_heat, mode_fan, mode_auto, temp_22, atd.")
             return
         
-        result = await api.send_device_command(device_id, payload)
-        print(f"Příkaz '{command}' úspěšně odeslán: {result}")
+        # Běžící daemon - příkaz odešle přes své zahřáté spojení
+        response = await daemon_request({"op": "command", "device_id": device_id, "command": command})
+        if response is not None:
+            if not response.get("ok"):
+                raise RuntimeError(response.get("error"))
+            result = response.get("result")
+        else:
+            from server_api import ThinQAPI
+            
+            api = ThinQAPI()
+            await api.initialize()
+            if command.lower().startswith("temp_"):
+                # Rozsah teploty podle aktuálního režimu zařízení (send_device_command čte režim z cache)
+                await api.get_device_status(device_id)
+            result = await api.send_device_command(device_id, payload)
+            await api.close()
         
-        await api.close()
+        print(f"Příkaz '{command}' úspěšně odeslán: {result}")
         
     except Exception as e:
         print(f"Chyba při provádění příkazu: {e}")
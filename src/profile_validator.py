@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Kontrola payloadů příkazů podle profilu zařízení - lokálně, před odesláním.
+
+Profil (data/device_profile.json, nebo profil z API pro jiné typy
+zařízení) popisuje u každé vlastnosti typ, režim r/w a povolené hodnoty
+(výčet, nebo min/max/step). Validátor se z profilu zkompiluje jednou
+pro každý model - výčty jako frozenset, rozsahy jako tabulka
+(min, max, step) - a kontrola payloadu pak trvá jednotky mikrosekund:
+
+    - neznámá nebo jen čitelná vlastnost      -> PayloadValidationError
+    - hodnota mimo výčet / špatný typ         -> PayloadValidationError
+    - číslo mimo rozsah nebo mimo krok        -> oříznutí a zaokrouhlení na krok
+
+Cílová teplota má rozsah podle režimu (heat/cool/autoTargetTemperature).
+Mezery v profilu, které zařízení ve skutečnosti přijímá (sleep timer
+"SET" s počtem minut), doplňuje PROFILE_GAPS.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE = Path(__file__).parent.parent / "data" / "device_profile.json"
+DEFAULT_MODEL = "device_profile.json"  # Klíč cache pro lokální profil bez názvu modelu
+
+# Rozsah cílové teploty podle režimu: (cesta, režim) -> vlastnost s rozsahem pro zápis
+MODE_RANGES = {
+    ("temperature.targetTemperature", "HEAT"): "temperature.heatTargetTemperature",
+    ("temperature.targetTemperature", "COOL"): "temperature.coolTargetTemperature",
+    ("temperature.targetTemperature", "AUTO"): "temperature.autoTargetTemperature",
+}
+
+# Hodnoty, které profil neuvádí, ale zařízení je přijímá (jen pro prostředky, které profil má)
+PROFILE_GAPS = {
+    "sleepTimer.relativeStopTimer": {"type": "enum", "mode": ["w"], "value": {"w": ["SET", "UNSET"]}},
+    "sleepTimer.relativeStopTimerTimeMinutes": {"type": "number", "mode": ["w"]},
+}
+
+ENUM = "enum"
+NUMBER = "number"
+
+
+class PayloadValidationError(ValueError):
+    """Payload neodpovídá profilu zařízení (neodesílá se)"""
+
+
+class PropertyRule:
+    """Zkompilované pravidlo jedné zapisovatelné vlastnosti"""
+
+    __slots__ = ("path", "kind", "values", "low", "high", "step")
+
+    def __init__(self, path: str, prop: dict):
+        self.path = path
+        allowed = prop.get("value", {}).get("w")
+        if prop.get("type") in ("enum", "boolean"):
+            self.kind = ENUM
+            self.values = frozenset(allowed) if allowed is not None else None
+            self.low = self.high = self.step = None
+        else:
+            self.kind = NUMBER
+            self.values = None
+            allowed = allowed if isinstance(allowed, dict) else {}
+            self.low, self.high, self.step = allowed.get("min"), allowed.get("max"), allowed.get("step")
+
+    def check(self, value):
+        """Kontrolovaná (případně oříznutá) hodnota"""
+        if self.kind == ENUM:
+            if self.values is not None and value not in self.values:
+                raise PayloadValidationError(
+                    f"{self.path}: hodnota {value!r} není povolena ({', '.join(map(str, sorted(self.values, key=str)))})")
+            return value
+
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise PayloadValidationError(f"{self.path}: očekáváno číslo, ne {value!r}")
+        checked = value
+        if self.step and self.low is not None:
+            checked = self.low + round((checked - self.low) / self.step) * self.step
+        if self.low is not None and checked < self.low:
+            checked = self.low
+        if self.high is not None and checked > self.high:
+            checked = self.high
+        if checked == value:
+            return value
+        if isinstance(value, int) and float(checked).is_integer():
+            checked = int(checked)
+        logger.info(f"   ↳ {self.path}: {value} -> {checked} (rozsah {self.low}-{self.high})")
+        return checked
+
+
+class PayloadValidator:
+    """Validátor payloadů zkompilovaný z profilu jednoho modelu"""
+
+    def __init__(self, profile: dict, model_name: str = DEFAULT_MODEL):
+        """
+        Args:
+            profile: Profil zařízení ({"property": {prostředek: {vlastnost: specifikace}}})
+            model_name: Název modelu (pro log a cache)
+        """
+        self.model_name = model_name
+        self.rules: Dict[str, PropertyRule] = {}
+        self.resources = frozenset()
+        self._compile(profile or {})
+
+    def _compile(self, profile: dict):
+        resources = set()
+        for resource, properties in profile.get("property", {}).items():
+            if not isinstance(properties, dict):
+                continue  # Např. temperatureInUnits - seznam podle jednotek, nezapisuje se
+            resources.add(resource)
+            for name, prop in properties.items():
+                if isinstance(prop, dict) and "w" in prop.get("mode", []):
+                    self.rules[f"{resource}.{name}"] = PropertyRule(f"{resource}.{name}", prop)
+        for path, prop in PROFILE_GAPS.items():
+            if path.partition(".")[0] in resources:
+                self.rules[path] = PropertyRule(path, prop)
+        self.resources = frozenset(resources)
+
+    def range_for(self, path: str, mode: str = None) -> Optional[Tuple[float, float]]:
+        """Rozsah (min, max) číselné vlastnosti pro zápis, případně podle režimu"""
+        rule = self.rules.get(MODE_RANGES.get((path, mode), path)) or self.rules.get(path)
+        if rule is None or rule.kind != NUMBER or rule.low is None or rule.high is None:
+            return None
+        return rule.low, rule.high
+
+    def validate(self, payload: dict, mode: str = None) -> dict:
+        """
+        Kontrola payloadu.
+
+        Args:
+            payload: Payload příkazu
+            mode: Režim zařízení (rozsah cílové teploty)
+
+        Returns:
+            dict: Payload s oříznutými čísly (nový dict jen při změně)
+
+        Raises:
+            PayloadValidationError: Neznámá / jen čitelná vlastnost nebo neplatná hodnota
+        """
+        if not isinstance(payload, dict) or not payload:
+            raise PayloadValidationError("Prázdný příkaz")
+        result = payload
+        for resource, values in payload.items():
+            if not isinstance(values, dict):
+                raise PayloadValidationError(f"{resource}: očekáván objekt vlastností")
+            for name, value in values.items():
+                path = f"{resource}.{name}"
+                rule = self.rules.get(MODE_RANGES.get((path, mode), path)) if mode else None
+                rule = rule or self.rules.get(path)
+                if rule is None:
+                    if resource not in self.resources:
+                        raise PayloadValidationError(f"Model {self.model_name} nemá prostředek {resource}")
+                    raise PayloadValidationError(f"{path} nelze zapisovat (model {self.model_name})")
+                checked = rule.check(value)
+                if checked is not value:
+                    if result is payload:
+                        result = {key: dict(section) for key, section in payload.items()}
+                    result[resource][name] = checked
+        return result
+
+
+_validators: Dict[str, Optional[PayloadValidator]] = {}
+
+
+def validator_for(model_name: str, profile: dict = None) -> Optional[PayloadValidator]:
+    """
+    Validátor modelu - kompiluje se jednou, pak se vrací z cache.
+
+    Args:
+        model_name: Název modelu (devices.json: modelName)
+        profile: Profil pro kompilaci, pokud model ještě není v cache
+
+    Returns:
+        PayloadValidator, nebo None (model není v cache a profil nebyl předán)
+    """
+    validator = _validators.get(model_name)
+    if validator is None and profile is not None:
+        validator = _validators[model_name] = PayloadValidator(profile, model_name)
+        logger.debug(f"Validátor payloadů pro {model_name}: {len(validator.rules)} zapisovatelných vlastností")
+    return validator
+
+
+def load_profile(path=PROFILE_FILE) -> Optional[dict]:
+    """Lokální profil zařízení (None = soubor chybí nebo je neplatný)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Profil zařízení nelze načíst: {e}")
+        return None
+
+
+def default_validator() -> Optional[PayloadValidator]:
+    """Validátor podle lokálního data/device_profile.json (None = profil chybí, payloady se nekontrolují)"""
+    if DEFAULT_MODEL not in _validators:
+        profile = load_profile()
+        # None = nezkoušet znovu při každém příkazu
+        _validators[DEFAULT_MODEL] = validator_for(DEFAULT_MODEL, profile) if profile is not None else None
+    return _validators[DEFAULT_MODEL]
+
+
+def invalidate(model_name: str = None):
+    """Vyřazení validátoru z cache (změna profilu) - None = všechny"""
+    if model_name is None:
+        _validators.clear()
+    else:
+        _validators.pop(model_name, None)
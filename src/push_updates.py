@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+Push aktualizace stavu zařízení přes ThinQ MQTT event stream.
+Zprávy DEVICE_STATUS se slučují do ThinQAPI.device_cache a předávají do GUI,
+takže pravidelné dotazování může běžet jen jako pomalý záložní heartbeat.
+
+Pro testování bez AWS IoT lze použít lokální zástupný broker (LocalPushBroker),
+který přeposílá JSON zprávy (jedna na řádek) mezi připojenými klienty:
+
+    python src/push_updates.py --port 1884
+"""
+import json
+import uuid
+import asyncio
+import inspect
+import logging
+import argparse
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEVICE_STATUS_MESSAGE = "DEVICE_STATUS"
+DEVICE_PUSH_MESSAGE = "DEVICE_PUSH"
+
+
+class StatusPushListener:
+    """Příjem push zpráv o stavu zařízení (AWS IoT MQTT nebo lokální broker)"""
+
+    def __init__(self, api, on_status: Callable = None, on_connection_change: Callable = None):
+        """
+        Args:
+            api: Instance ThinQAPI (cache stavů + přihlášení k odběru)
+            on_status: Callback (device_id, status) volaný v asyncio smyčce
+            on_connection_change: Callback (connected: bool) při změně spojení
+        """
+        self.api = api
+        self.on_status = on_status
+        self.on_connection_change = on_connection_change
+        self.loop = None
+        self.connected = False
+        self.messages_received = 0
+        self._mqtt_client = None
+        self._local_task = None
+        self._local_writer = None
+
+    def handle_message(self, message):
+        """
+        Zpracování jedné push zprávy (bytes, str nebo dict).
+
+        Returns:
+            dict: Sloučený stav zařízení, nebo None pokud zpráva nenese stav
+        """
+        try:
+            if isinstance(message, (bytes, bytearray)):
+                message = message.decode("utf-8")
+            if isinstance(message, str):
+                message = json.loads(message)
+        except Exception as e:
+            logger.warning(f"Neplatná push zpráva: {e}")
+            return None
+
+        push_type = message.get("pushType")
+        device_id = message.get("deviceId")
+
+        if push_type == DEVICE_PUSH_MESSAGE:
+            logger.info(f"🔔 Notifikace zařízení: {message.get('pushCode')}")
+            return None
+        if push_type != DEVICE_STATUS_MESSAGE or not device_id:
+            logger.debug(f"Ignoruji push zprávu typu {push_type}")
+            return None
+
+        self.messages_received += 1
+        status = self.api.apply_status_update(device_id, message.get("report", {}))
+        if status is None:
+            # Stav ještě nebyl načten - posluchač dostane celý stav po jeho načtení
+            asyncio.ensure_future(self._deliver_full_status(device_id))
+            return None
+
+        if self.on_status:
+            try:
+                self.on_status(device_id, status)
+            except Exception as e:
+                logger.error(f"Chyba při zpracování push stavu: {e}")
+        return status
+
+    async def _deliver_full_status(self, device_id: str):
+        """Předání celého stavu (načítá se místo částečné push zprávy) posluchači"""
+        try:
+            status = await self.api.get_device_status(device_id)  # Připojí se k rozpracovanému dotazu
+        except Exception as e:
+            logger.warning(f"Stav zařízení po push zprávě nelze načíst: {e}")
+            return
+        if self.on_status:
+            try:
+                self.on_status(device_id, status)
+            except Exception as e:
+                logger.error(f"Chyba při zpracování push stavu: {e}")
+
+    def _set_connected(self, connected: bool):
+        """Uložení stavu spojení a notifikace posluchače"""
+        if connected == self.connected:
+            return
+        self.connected = connected
+        logger.info("📡 Push spojení aktivní" if connected else "📡 Push spojení přerušeno")
+        if self.on_connection_change:
+            self.on_connection_change(connected)
+
+    def _call_in_loop(self, callback, *args):
+        """Přesun volání z vlákna MQTT klienta do asyncio smyčky"""
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    # ------------------------------------------------------------------
+    # AWS IoT MQTT (thinqconnect + awsiotsdk)
+    # ------------------------------------------------------------------
+    async def start_mqtt(self, device_ids):
+        """
+        Připojení k ThinQ MQTT a přihlášení k odběru událostí zařízení.
+
+        Returns:
+            bool: True pokud se podařilo připojit
+        """
+        self.loop = asyncio.get_running_loop()
+        try:
+            from thinqconnect import ThinQMQTTClient
+        except ImportError as e:
+            logger.warning(f"MQTT klient není dostupný ({e}) - zůstávám u dotazování")
+            return False
+
+        try:
+            api = await self.api.initialize()
+            client_id = self.api.config.get("mqtt_client_id") or str(uuid.uuid4())
+
+            client = ThinQMQTTClient(
+                api, client_id,
+                on_message_received=self._on_mqtt_message,
+                on_connection_interrupted=self._on_mqtt_interrupted,
+                on_connection_success=self._on_mqtt_success
+            )
+            # ThinQMQTTClient se v novějších verzích vytváří přes await
+            if inspect.isawaitable(client):
+                client = await client
+
+            if not await client.async_prepare_mqtt():
+                logger.warning("Příprava MQTT certifikátů selhala - zůstávám u dotazování")
+                return False
+            await client.async_connect_mqtt()
+            self._mqtt_client = client
+
+            for device_id in device_ids:
+                await self.api.subscribe_device_events(device_id)
+
+            self._set_connected(True)
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Nelze spustit push aktualizace: {e}")
+            return False
+
+    def _on_mqtt_message(self, topic, payload, dup=False, qos=None, retain=False, **kwargs):
+        """Callback awscrt (běží ve vlákně MQTT klienta)"""
+        self._call_in_loop(self.handle_message, payload)
+
+    def _on_mqtt_interrupted(self, connection=None, error=None, **kwargs):
+        """Callback awscrt při přerušení spojení"""
+        self._call_in_loop(self._set_connected, False)
+
+    def _on_mqtt_success(self, connection=None, callback_data=None, **kwargs):
+        """Callback awscrt při (opětovném) připojení"""
+        self._call_in_loop(self._set_connected, True)
+
+    # ------------------------------------------------------------------
+    # Lokální zástupný broker (testování bez AWS IoT)
+    # ------------------------------------------------------------------
+    async def start_local(self, host: str = "127.0.0.1", port: int = 1884):
+        """Připojení k lokálnímu brokeru - zprávy jsou JSON, jedna na řádek"""
+        self.loop = asyncio.get_running_loop()
+        try:
+            reader, self._local_writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            logger.error(f"❌ Lokální push broker {host}:{port} nedostupný: {e}")
+            return False
+
+        self._local_task = asyncio.create_task(self._read_local(reader))
+        self._set_connected(True)
+        return True
+
+    async def _read_local(self, reader):
+        """Čtení zpráv z lokálního brokeru"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    self.handle_message(line)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._set_connected(False)
+
+    async def stop(self):
+        """Odpojení od MQTT / lokálního brokeru"""
+        if self._mqtt_client:
+            try:
+                await self._mqtt_client.async_disconnect()
+            except Exception as e:
+                logger.debug(f"Chyba při odpojení MQTT: {e}")
+            self._mqtt_client = None
+
+        if self._local_task:
+            self._local_task.cancel()
+            self._local_task = None
+        if self._local_writer:
+            self._local_writer.close()
+            self._local_writer = None
+
+        self._set_connected(False)
+
+
+class LocalPushBroker:
+    """Zástupný broker - přeposílá každý přijatý řádek všem ostatním klientům"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1884):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.clients = set()
+
+    async def start(self):
+        """Spuštění serveru"""
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        # Port 0 = náhodný volný port
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"📡 Lokální push broker naslouchá na {self.host}:{self.port}")
+        return self
+
+    async def _handle_client(self, reader, writer):
+        """Obsluha jednoho klienta"""
+        self.clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self.publish(line, exclude=writer)
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def publish(self, message, exclude: Optional[asyncio.StreamWriter] = None):
+        """Odeslání zprávy (dict, str nebo bytes) všem připojeným klientům"""
+        if isinstance(message, dict):
+            message = json.dumps(message, ensure_ascii=False)
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        if not message.endswith(b"\n"):
+            message += b"\n"
+
+        for writer in list(self.clients):
+            if writer is exclude:
+                continue
+            try:
+                writer.write(message)
+                await writer.drain()
+            except ConnectionError:
+                self.clients.discard(writer)
+
+    async def close(self):
+        """Zastavení serveru"""
+        for writer in list(self.clients):
+            writer.close()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+async def _run_broker(host, port):
+    """Běh lokálního brokeru do přerušení"""
+    broker = await LocalPushBroker(host, port).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await broker.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Lokální zástupný push broker pro testování")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1884)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run_broker(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
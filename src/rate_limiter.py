@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Klientský rate limiter (token bucket) pro volání LG ThinQ API.
+Při vyčerpání tokenů se asynchronně čeká - požadavky se rozloží v čase
+místo toho, aby je server odmítl s chybou 429/503.
+"""
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket s asynchronním čekáním a počítadly throttlingu"""
+
+    def __init__(self, rate_per_minute: float, burst: int, name: str = ""):
+        """
+        Args:
+            rate_per_minute: Průměrný počet povolených volání za minutu
+            burst: Kapacita bucketu (max. počet volání naráz)
+            name: Název pro logování a statistiky
+        """
+        self.name = name
+        self.rate = max(rate_per_minute, 0.001) / 60.0  # tokeny za sekundu
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        # Statistiky
+        self.acquired = 0
+        self.throttled = 0
+        self.throttled_time = 0.0
+
+    def _refill(self):
+        """Doplnění tokenů podle uplynulého času"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int = 1):
+        """Odebrání tokenů - pokud nejsou k dispozici, čeká (FIFO přes zámek)"""
+        async with self._lock:
+            self._refill()
+            if self.tokens < tokens:
+                wait = (tokens - self.tokens) / self.rate
+                self.throttled += 1
+                self.throttled_time += wait
+                logger.info(f"⏳ Rate limit ({self.name}): čekám {wait:.1f}s")
+                await asyncio.sleep(wait)
+                self._refill()
+
+            self.tokens -= tokens
+            self.acquired += 1
+
+    def stats(self):
+        """Počítadla pro diagnostiku"""
+        return {
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "throttled_time": round(self.throttled_time, 3),
+            "tokens": round(self.tokens, 2)
+        }
+
+
+def create_limiters(config: dict):
+    """
+    Vytvoření read/write bucketů z konfigurace.
+
+    config.json:
+        "rate_limit": {
+            "read": {"rate_per_minute": 30, "burst": 10},
+            "write": {"rate_per_minute": 20, "burst": 5}
+        }
+
+    Returns:
+        tuple: (read_bucket, write_bucket)
+    """
+    defaults = {
+        "read": {"rate_per_minute": 30, "burst": 10},
+        "write": {"rate_per_minute": 20, "burst": 5}
+    }
+    rate_config = config.get("rate_limit", {}) if config else {}
+
+    buckets = []
+    for kind in ("read", "write"):
+        settings = {**defaults[kind], **rate_config.get(kind, {})}
+        buckets.append(TokenBucket(settings["rate_per_minute"], settings["burst"], name=kind))
+    return tuple(buckets)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Požadovaný stav zařízení a dorovnání hlášeného stavu (reconciler).
+
+Pro každé zařízení se drží požadovaný stav (zapnutí, režim, cílová
+teplota, vítr, směr vyfukování, úsporný režim). Dorovnání porovná
+požadovaný stav s posledním stavem z cache a odešle jen příkazy,
+které ještě neplatí - opětovné použití plánu po restartu, když se
+nic nezměnilo, nestojí žádný zápis.
+
+Příkazy provádí SchedulePipeline zařízení (pořadí, potvrzení, zrušení).
+Po každém kole se stav porovná znovu a chybějící kroky se opakují,
+dokud zařízení požadovaný stav nehlásí (nejvýše max_rounds kol).
+Vlastnost, kterou mezitím změnil uživatel, se už nedorovnává - jeho
+změna má přednost. Na každé zařízení běží nejvýše jedno dorovnání
+(start), novější dorovnání nebo cancel běžící zruší i mezi koly.
+
+Požadovaný stav (klíče viz DESIRED_PROPERTIES):
+    {"power": "POWER_ON", "mode": "COOL", "temperature": 22,
+     "wind_strength": "HIGH", "wind_direction": (False, True), "power_save": False}
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from klima_logic import create_command_payload
+from profile_validator import PayloadValidationError
+from command_tracker import is_reported
+from schedule_pipeline import STEP_DEPENDS_ON, SENT, CONFIRMED, UNCONFIRMED, UNVERIFIED
+
+logger = logging.getLogger(__name__)
+
+DESIRED_PROPERTIES = ("power", "mode", "temperature", "wind_strength", "wind_direction", "power_save")
+
+MAX_ROUNDS = 3              # Max. počet kol dorovnání
+STATUS_MAX_AGE = 5.0        # Stáří stavu z cache pro první porovnání (s)
+RECHECK_MAX_AGE = 1.0       # Stáří stavu pro další kola (s) - cache obnovují kontroly potvrzení
+ROUND_DELAY = 2.0           # Pauza před opakováním nesplněných kroků (s)
+
+# Pojmenovaný příkaz -> vlastnost požadovaného stavu
+COMMAND_PROPERTIES = {
+    "power_on": "power",
+    "power_off": "power",
+    "change_mode": "mode",
+    "set_temperature": "temperature",
+    "set_wind_strength": "wind_strength",
+    "set_wind_direction": "wind_direction",
+    "set_power_save": "power_save",
+}
+
+
+def property_step(name: str, value, mode: str = None) -> Tuple:
+    """Příkaz (název, *argumenty), který nastaví vlastnost požadovaného stavu (mode = rozsah teploty)"""
+    if name == "power":
+        return ("power_on",) if value == "POWER_ON" else ("power_off",)
+    if name == "mode":
+        return ("change_mode", value)
+    if name == "temperature":
+        return ("set_temperature", value, mode) if mode else ("set_temperature", value)
+    if name == "wind_strength":
+        return ("set_wind_strength", value)
+    if name == "wind_direction":
+        return ("set_wind_direction", *value)
+    if name == "power_save":
+        return ("set_power_save", value)
+    raise ValueError(f"Neznámá vlastnost požadovaného stavu: {name}")
+
+
+def command_property(command: str, *args) -> Optional[Tuple[str, object]]:
+    """
+    Vlastnost požadovaného stavu, kterou nastavuje pojmenovaný příkaz.
+
+    Returns:
+        tuple: (vlastnost, hodnota), nebo None (toggle_power, časovače, ...)
+    """
+    name = COMMAND_PROPERTIES.get(command)
+    if name is None:
+        return None
+    if name == "power":
+        return name, "POWER_ON" if command == "power_on" else "POWER_OFF"
+    if name == "wind_direction":
+        return name, tuple(args[:2])
+    return name, args[0]
+
+
+def desired_from_entry(entry) -> dict:
+    """Požadovaný stav podle položky plánu (jen vlastnosti, které plán nastavuje)"""
+    desired = {}
+    if entry.power_on:
+        desired["power"] = "POWER_ON"
+    if entry.mode:
+        desired["mode"] = entry.mode
+    if entry.temperature and entry.mode != "FAN":
+        desired["temperature"] = entry.temperature
+    if entry.wind:
+        desired["wind_strength"] = entry.wind
+    return desired
+
+
+def plan_steps(desired: dict, status: Optional[dict], profile: dict = None,
+               properties: Iterable[str] = None, validator=None) -> List[Tuple]:
+    """
+    Příkazy potřebné k dosažení požadovaného stavu.
+
+    Args:
+        desired: Požadovaný stav
+        status: Hlášený stav zařízení (None = neznámý, odešle se vše)
+        profile: Profil zařízení (která pole zařízení hlásí)
+        properties: Jen tyto vlastnosti (None = všechny požadované)
+        validator: PayloadValidator zařízení - neplatné hodnoty se vynechají, čísla se porovnají oříznutá
+
+    Returns:
+        list: [(příkaz, *argumenty), ...] v pořadí odeslání
+    """
+    names = [name for name in DESIRED_PROPERTIES
+             if name in desired and (properties is None or name in properties)]
+    if desired.get("power") == "POWER_OFF":
+        names = [name for name in names if name == "power"]  # Vypnuté zařízení se dál nenastavuje
+
+    # Rozsah teploty podle režimu, ve kterém se bude nastavovat (požadovaný, jinak hlášený)
+    mode = desired.get("mode") or (status or {}).get("airConJobMode", {}).get("currentJobMode")
+    steps, needed = [], set()
+    for name in names:
+        step = property_step(name, desired[name], mode)
+        try:
+            payload = create_command_payload(*step, validator=validator)
+        except PayloadValidationError as e:
+            logger.warning(f"⚠️ Požadovaný stav {name}={desired[name]!r} nelze nastavit: {e}")
+            continue  # Neplatná hodnota (např. v plánu) - ostatní vlastnosti se nastaví
+        steps.append(step)
+        if not is_reported(payload, status, profile):
+            needed.add(step[0])
+    # Krok závislý na odesílaném kroku se ponechá - např. změna režimu přepíše cílovou teplotu
+    return [step for step in steps
+            if step[0] in needed or needed.intersection(STEP_DEPENDS_ON.get(step[0], ()))]
+
+
+class ReconcileResult:
+    """Výsledek dorovnání jednoho zařízení"""
+
+    def __init__(self, device_id: str, name: str):
+        self.device_id = device_id
+        self.name = name
+        self.rounds = 0
+        self.writes = 0
+        self.converged = False
+        self.cancelled = False
+        self.last_run = None
+
+    def summary(self) -> str:
+        """Krátký text pro status bar a log"""
+        if self.cancelled:
+            return f"Plán '{self.name}' přerušen"
+        if self.converged and not self.writes:
+            return f"Plán '{self.name}' - zařízení už je v požadovaném stavu"
+        if self.converged:
+            return f"Plán '{self.name}' dokončen ({self.writes} příkazů)"
+        if self.last_run is not None:
+            return self.last_run.summary()
+        return f"⚠️ Plán '{self.name}' - stav zařízení se nepodařilo dorovnat"
+
+
+class Reconciler:
+    """Požadovaný stav zařízení a jeho dorovnání přes SchedulePipeline zařízení"""
+
+    def __init__(self, api, max_rounds: int = MAX_ROUNDS):
+        """
+        Args:
+            api: ThinQAPI (get_device_status s max_age)
+            max_rounds: Max. počet kol dorovnání (odeslání + kontrola)
+        """
+        self.api = api
+        self.max_rounds = max(1, int(max_rounds))
+        self.pipelines = {}
+        self.desired: Dict[str, dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+        # Statistiky
+        self.writes = 0
+        self.skipped = 0
+
+    def register(self, device_id: str, pipeline):
+        """Přiřazení SchedulePipeline zařízení (její tracker nese profil a nepotvrzené příkazy)"""
+        self.pipelines[device_id] = pipeline
+        self.desired.setdefault(device_id, {})
+
+    def set_desired(self, device_id: str, **properties):
+        """Změna požadovaného stavu (ostatní vlastnosti zůstávají)"""
+        unknown = set(properties) - set(DESIRED_PROPERTIES)
+        if unknown:
+            raise ValueError(f"Neznámé vlastnosti požadovaného stavu: {', '.join(sorted(unknown))}")
+        self.desired.setdefault(device_id, {}).update(properties)
+
+    def start(self, device_id: str, name: str = "", properties: Iterable[str] = None) -> asyncio.Task:
+        """
+        Dorovnání na pozadí - běžící dorovnání zařízení se zruší (novější požadavek má přednost).
+
+        Returns:
+            asyncio.Task: Úloha s ReconcileResult
+        """
+        self.cancel(device_id)
+        task = asyncio.ensure_future(self.reconcile(device_id, name, properties))
+        self._tasks[device_id] = task
+
+        def forget(done):
+            if self._tasks.get(device_id) is done:
+                del self._tasks[device_id]
+
+        task.add_done_callback(forget)
+        return task
+
+    def cancel(self, device_id: str):
+        """Zrušení běžícího dorovnání zařízení (i mezi koly) a neodeslaných kroků jeho plánu"""
+        task = self._tasks.pop(device_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+        pipeline = self.pipelines.get(device_id)
+        if pipeline is not None:
+            pipeline.cancel()
+
+    def is_satisfied(self, device_id: str, command: str, *args, status: Optional[dict] = None) -> bool:
+        """Příkaz by nic nezměnil - zařízení (včetně nepotvrzených příkazů) už stav hlásí"""
+        tracker = self.pipelines[device_id].tracker
+        if status is None:
+            return False
+        if is_reported(create_command_payload(command, *args), tracker.overlay(status), tracker.profile):
+            self.skipped += 1
+            return True
+        return False
+
+    async def reconcile(self, device_id: str, name: str = "",
+                        properties: Iterable[str] = None) -> ReconcileResult:
+        """
+        Dorovnání zařízení do požadovaného stavu.
+
+        Args:
+            device_id: ID zařízení (registrované přes register)
+            name: Název pro log a status bar (např. název plánu)
+            properties: Jen tyto vlastnosti (None = celý požadovaný stav)
+        """
+        pipeline = self.pipelines[device_id]
+        initial = dict(self.desired.get(device_id, {}))
+        result = ReconcileResult(device_id, name)
+
+        try:
+            validator = await self.api.payload_validator(device_id)
+            for round_number in range(1, self.max_rounds + 2):
+                status = await self._status(device_id, STATUS_MAX_AGE if round_number == 1 else RECHECK_MAX_AGE)
+                if status is None and round_number > 1:
+                    break  # Bez stavu nelze ověřit - opakování by jen odeslalo vše znovu
+                desired = self._unchanged_desired(device_id, initial)
+                steps = plan_steps(desired, status, pipeline.tracker.profile, properties, validator)
+                if round_number == 1:
+                    self.skipped += len(plan_steps(desired, None, properties=properties, validator=validator)) - len(steps)
+                if not steps:
+                    result.converged = True
+                    break
+                if round_number > self.max_rounds:
+                    break
+                if round_number > 1:
+                    logger.info(f"🔁 Dorovnání '{name}' - kolo {round_number}: {[step[0] for step in steps]}")
+                    await asyncio.sleep(ROUND_DELAY)
+                    steps = plan_steps(self._unchanged_desired(device_id, initial), status,
+                                       pipeline.tracker.profile, properties, validator)
+                    if not steps:
+                        continue  # Uživatel během pauzy nastavil zbývající vlastnosti sám
+
+                run = await pipeline.run(name, steps)
+                result.rounds = round_number
+                result.last_run = run
+                sent = sum(1 for step in run.steps if step.state in (SENT, CONFIRMED, UNCONFIRMED, UNVERIFIED))
+                result.writes += sent
+                self.writes += sent
+                if run.cancelled:
+                    result.cancelled = True
+                    break
+        except asyncio.CancelledError:
+            result.cancelled = True  # Novější dorovnání, konec plánu nebo "Stop plán"
+
+        if result.converged and not result.writes:
+            logger.info(f"✅ {result.summary()} - nic se neodesílá")
+        elif not result.converged and not result.cancelled:
+            logger.warning(f"⚠️ Dorovnání '{name}' po {result.rounds} kolech nedokončeno")
+        return result
+
+    def _unchanged_desired(self, device_id: str, initial: dict) -> dict:
+        """Aktuální požadovaný stav bez vlastností, které se od začátku dorovnání změnily (uživatel)"""
+        current = self.desired.get(device_id, {})
+        return {name: value for name, value in initial.items() if current.get(name) == value}
+
+    async def _status(self, device_id: str, max_age: float) -> Optional[dict]:
+        try:
+            return await self.api.get_device_status(device_id, max_age=max_age)
+        except Exception as e:
+            logger.warning(f"Stav zařízení pro dorovnání nedostupný: {e}")
+            return None
+
+    def stats(self):
+        """Počet odeslaných a ušetřených zápisů (příkazy, které zařízení už splňovalo)"""
+        return {"writes": self.writes, "skipped": self.skipped}
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Odolnost volání LG ThinQ API - opakování a circuit breaker.
+
+Přechodné chyby (503 / INTERNAL_SERVER_ERROR, zpoždění odpovědi zařízení,
+výpadek spojení, timeout, 429 / EXCEEDED_API_CALLS) se opakují podle
+politiky dané operace s "decorrelated jitter" čekáním:
+
+    delay = min(max_delay, random.uniform(base_delay, předchozí_delay * 3))
+
+Chyby požadavku (neplatný příkaz, neexistující zařízení, token) se
+neopakují - server odpověděl, opakování by dopadlo stejně.
+
+Circuit breaker po failure_threshold přechodných chybách po sobě
+přestane volat API (stav "open") a po reset_timeout pustí jeden zkušební
+požadavek ("half_open"). Úspěch okruh uzavře, neúspěch ho znovu otevře
+s dvojnásobným čekáním (nejvýše max_reset_timeout).
+
+config.json:
+    "resilience": {
+        "status":  {"attempts": 3, "base_delay": 0.5, "max_delay": 8},
+        "command": {"attempts": 3, "base_delay": 1, "max_delay": 10},
+        "breaker": {"failure_threshold": 5, "reset_timeout": 30, "max_reset_timeout": 300}
+    }
+"""
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Kódy chyb ThinQ API (thinqconnect.ThinQAPIErrorCodes), které má smysl opakovat
+RETRYABLE_ERROR_CODES = {
+    "0000",  # UNKNOWN_ERROR
+    "1306",  # EXCEEDED_API_CALLS
+    "2000",  # INTERNAL_SERVER_ERROR
+    "2208",  # FAIL_DEVICE_CONTROL
+    "2209",  # DEVICE_RESPONSE_DELAY
+    "2210",  # RETRY_REQUEST
+    "2212",  # SYNCING
+    "2214",  # FAIL_REQUEST
+}
+
+DEFAULT_POLICIES = {
+    "status": {"attempts": 3, "base_delay": 0.5, "max_delay": 8.0},
+    "command": {"attempts": 3, "base_delay": 1.0, "max_delay": 10.0},
+    "devices": {"attempts": 3, "base_delay": 1.0, "max_delay": 10.0},
+    "subscribe": {"attempts": 2, "base_delay": 2.0, "max_delay": 10.0},
+}
+DEFAULT_BREAKER = {"failure_threshold": 5, "reset_timeout": 30.0, "max_reset_timeout": 300.0}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """API se nevolá - circuit breaker je otevřený"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"ThinQ API nedostupné, další pokus za {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Přechodná chyba serveru nebo spojení (opakovat, počítat do breakeru)"""
+    code = getattr(error, "code", None)
+    if isinstance(code, str):
+        return code in RETRYABLE_ERROR_CODES
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                              asyncio.TimeoutError, ConnectionError))
+
+
+class RetryPolicy:
+    """Počet pokusů a rozsah čekání pro jednu operaci"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        Args:
+            attempts: Celkový počet pokusů (1 = bez opakování)
+            base_delay: Minimální čekání před opakováním (s)
+            max_delay: Maximální čekání před opakováním (s)
+        """
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max(base_delay, max_delay)
+
+    def next_delay(self, previous: float, rng: random.Random = random) -> float:
+        """Decorrelated jitter - náhodně mezi base_delay a trojnásobkem předchozího čekání"""
+        return min(self.max_delay, rng.uniform(self.base_delay, max(self.base_delay, previous) * 3))
+
+
+class CircuitBreaker:
+    """Circuit breaker se stavy closed / open / half_open"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 max_reset_timeout: float = 300.0, on_change: Callable = None):
+        """
+        Args:
+            failure_threshold: Počet přechodných chyb po sobě, po kterém se okruh otevře
+            reset_timeout: Čekání před zkušebním požadavkem (s)
+            max_reset_timeout: Strop čekání při opakovaně neúspěšných zkouškách (s)
+            on_change: Callback(state) při změně stavu
+        """
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self.on_change = on_change
+
+        self.state = CLOSED
+        self.failures = 0
+        self.reset_timeout = reset_timeout
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+        # Statistiky
+        self.opened_count = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        """Sekundy do zkušebního požadavku (0 = lze volat)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """
+        Kontrola před voláním API.
+
+        Raises:
+            CircuitOpenError: Okruh je otevřený nebo už běží zkušební požadavek
+        """
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            wait = self.retry_after()
+            if wait > 0:
+                self.rejected += 1
+                raise CircuitOpenError(wait)
+            self._set_state(HALF_OPEN)
+        if self._probe_in_flight:
+            self.rejected += 1
+            raise CircuitOpenError(1.0)
+        self._probe_in_flight = True
+
+    def record_success(self):
+        """Server odpověděl (i chybou požadavku) - okruh se uzavře"""
+        self._probe_in_flight = False
+        self.failures = 0
+        if self.state != CLOSED:
+            self.reset_timeout = self.base_reset_timeout
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        """Přechodná chyba - po překročení prahu (nebo při zkoušce) se okruh otevře"""
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def release(self):
+        """Zkušební požadavek zrušen bez výsledku - pustit další"""
+        self._probe_in_flight = False
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.opened_count += 1
+        logger.warning(f"🔌 Circuit breaker otevřen - API se nevolá {self.reset_timeout:.0f} s")
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        if state == CLOSED:
+            logger.info("✅ Circuit breaker uzavřen - API opět dostupné")
+        if self.on_change:
+            try:
+                self.on_change(state)
+            except Exception as e:
+                logger.error(f"Chyba v callbacku circuit breakeru: {e}")
+
+    def stats(self):
+        """Stav a počítadla pro diagnostiku"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 1),
+            "opened": self.opened_count,
+            "rejected": self.rejected
+        }
+
+
+class Resilience:
+    """Opakování podle politik operací + sdílený circuit breaker"""
+
+    def __init__(self, config: dict = None, rng: random.Random = None):
+        """
+        Args:
+            config: Sekce "resilience" z config.json (politiky operací a "breaker")
+            rng: Generátor náhody pro jitter (testy / reprodukovatelnost)
+        """
+        config = config or {}
+        self.policies: Dict[str, RetryPolicy] = {
+            operation: RetryPolicy(**{**defaults, **config.get(operation, {})})
+            for operation, defaults in DEFAULT_POLICIES.items()
+        }
+        for operation, settings in config.items():
+            if operation != "breaker" and operation not in self.policies:
+                self.policies[operation] = RetryPolicy(**settings)
+        self.breaker = CircuitBreaker(**{**DEFAULT_BREAKER, **config.get("breaker", {})},
+                                      on_change=lambda state: self._notify())
+        self.rng = rng or random.Random()
+        self.listeners = []
+
+        # Statistiky
+        self.retries: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.last_error: Optional[str] = None
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """Callback(stats) při opakování, chybě a změně stavu breakeru (volá se v asyncio smyčce)"""
+        self.listeners.append(callback)
+
+    async def call(self, operation: str, request: Callable[[], Awaitable], limiter=None):
+        """
+        Provedení požadavku s opakováním a circuit breakerem.
+
+        Args:
+            operation: Název politiky ("status", "command", ...)
+            request: Funkce bez argumentů vracející coroutine (nový pokus = nové volání)
+            limiter: TokenBucket - každý pokus spotřebuje token
+
+        Raises:
+            CircuitOpenError: Okruh je otevřený (API se nevolalo)
+            Exception: Poslední chyba požadavku
+        """
+        policy = self.policies.get(operation) or self.policies["status"]
+        delay = policy.base_delay
+
+        for attempt in range(1, policy.attempts + 1):
+            self.breaker.before_call()
+            try:
+                if limiter:
+                    await limiter.acquire()
+                result = await request()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_transient_error(e):
+                    self.breaker.record_success()  # Server odpověděl - chyba je v požadavku
+                    raise
+                self.breaker.record_failure()
+                self.failures[operation] = self.failures.get(operation, 0) + 1
+                self.last_error = str(e)
+                if attempt >= policy.attempts or self.breaker.state == OPEN:
+                    self._notify()
+                    raise
+
+                delay = policy.next_delay(delay, self.rng)
+                self.retries[operation] = self.retries.get(operation, 0) + 1
+                logger.warning(f"🔁 {operation}: {e} - pokus {attempt + 1}/{policy.attempts} za {delay:.1f} s")
+                self._notify()
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _notify(self):
+        stats = self.stats()
+        for callback in self.listeners:
+            try:
+                callback(stats)
+            except Exception as e:
+                logger.error(f"Chyba v listeneru odolnosti API: {e}")
+
+    def stats(self):
+        """Stav breakeru a počty opakování/chyb podle operace"""
+        return {
+            "breaker": self.breaker.stats(),
+            "retries": dict(self.retries),
+            "failures": dict(self.failures),
+            "last_error": self.last_error
+        }
+
+
+def format_health(stats: dict) -> str:
+    """Krátký text pro status bar ("" = vše v pořádku)"""
+    breaker = stats["breaker"]
+    retries = sum(stats["retries"].values())
+    if breaker["state"] == OPEN:
+        return f"🔌 API nedostupné - zkouška za {breaker['retry_after']:.0f} s"
+    if breaker["state"] == HALF_OPEN:
+        return "🔌 API: zkouším spojení..."
+    if retries:
+        return f"🔁 API opakování: {retries}"
+    return ""
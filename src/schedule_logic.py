@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""
+Logika časových plánů nezávislá na GUI.
+Obsahuje ScheduleEntry, načítání/ukládání schedule.json a vyhledání
+aktivního či nejbližšího plánu - používá ji GUI plánovač i daemon režim.
+"""
+import os
+import json
+import uuid
+import logging
+import heapq
+from functools import lru_cache
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_FILE = Path(__file__).parent.parent / "data" / "schedule.json"
+MINUTES_PER_DAY = 24 * 60
+
+class ScheduleEntry:
+    """Třída reprezentující jeden záznam v plánu"""
+    
+    def __init__(self, name: str = "", start_time: str = "08:00", 
+                 end_time: str = "10:00", mode: str = "FAN", temperature: int = 22, 
+                 wind: str = "AUTO", power_on: bool = True, power_off_at_end: bool = True,
+                 priority: int = 0, entry_id: str = None):
+        self.id = entry_id or uuid.uuid4().hex  # Stabilní identita pro inkrementální ukládání
+        self.name = name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.mode = mode
+        self.temperature = temperature
+        self.wind = wind
+        self.power_on = power_on
+        self.power_off_at_end = power_off_at_end  # Vypnout na konci plánu
+        self.priority = priority  # Při překryvu vyhrává vyšší priorita
+        self.enabled = True
+        
+        # Zpětná kompatibilita - pokud je zadána jen délka
+        self.duration_hours = self._calculate_duration_hours()
+        
+    def _calculate_duration_hours(self) -> float:
+        """Výpočet délky trvání z časů start a end"""
+        try:
+            start = datetime.strptime(self.start_time, "%H:%M").time()
+            end = datetime.strptime(self.end_time, "%H:%M").time()
+            
+            # Převod na minuty pro výpočet
+            start_minutes = start.hour * 60 + start.minute
+            end_minutes = end.hour * 60 + end.minute
+            
+            # Pokud end_time je menší než start_time, předpokládáme přes půlnoc
+            if end_minutes <= start_minutes:
+                end_minutes += 24 * 60  # Přidat 24 hodin
+            
+            duration_minutes = end_minutes - start_minutes
+            return round(duration_minutes / 60.0, 2)
+        except:
+            return 2.0  # Výchozí 2 hodiny
+        
+    def _calculate_end_time_from_duration(self, duration_hours: float) -> str:
+        """Výpočet end_time z start_time a duration"""
+        try:
+            start = datetime.strptime(self.start_time, "%H:%M")
+            end = start.replace(hour=start.hour + int(duration_hours), 
+                              minute=start.minute + int((duration_hours % 1) * 60))
+            
+            # Handle překročení 24h
+            if end.hour >= 24:
+                end = end.replace(hour=end.hour - 24)
+            
+            return end.strftime("%H:%M")
+        except:
+            return "10:00"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "mode": self.mode,
+            "temperature": self.temperature,
+            "wind": self.wind,
+            "power_on": self.power_on,
+            "power_off_at_end": getattr(self, 'power_off_at_end', True),
+            "priority": self.priority,
+            "enabled": self.enabled,
+            # Zpětná kompatibilita
+            "time": self.start_time,
+            "duration_hours": self.duration_hours
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ScheduleEntry':
+        """Vytvoření instance z dict s podporou starého i nového formátu"""
+        # Nový formát s start_time a end_time
+        if "start_time" in data and "end_time" in data:
+            entry = cls(
+                name=data.get("name", ""),
+                start_time=data.get("start_time", "08:00"),
+                end_time=data.get("end_time", "10:00"),
+                mode=data.get("mode", "FAN"),
+                temperature=data.get("temperature", 22),
+                wind=data.get("wind", "AUTO"),
+                power_on=data.get("power_on", True),
+                power_off_at_end=data.get("power_off_at_end", True),
+                priority=data.get("priority", 0),
+                entry_id=data.get("id")
+            )
+        else:
+            # Starý formát - převést duration_hours na end_time
+            start_time = data.get("time", "08:00")
+            duration_hours = data.get("duration_hours", 2)
+            
+            entry = cls(
+                name=data.get("name", ""),
+                start_time=start_time,
+                end_time="10:00",  # Dočasně
+                mode=data.get("mode", "FAN"),
+                temperature=data.get("temperature", 22),
+                wind=data.get("wind", "AUTO"),
+                power_on=data.get("power_on", True),
+                power_off_at_end=data.get("power_off_at_end", True),
+                priority=data.get("priority", 0),
+                entry_id=data.get("id")
+            )
+            
+            # Vypočítat end_time z duration
+            entry.end_time = entry._calculate_end_time_from_duration(duration_hours)
+        
+        entry.enabled = data.get("enabled", True)
+        return entry
+
+
+def load_schedule_entries(schedule_file=SCHEDULE_FILE) -> List[ScheduleEntry]:
+    """Načtení plánů ze souboru (nový formát {"schedules": [...]} i starý seznam)"""
+    try:
+        schedule_file = Path(schedule_file)
+        if not schedule_file.exists():
+            return []
+        with open(schedule_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # Kontrola struktury souboru
+        if isinstance(data, dict) and "schedules" in data:
+            schedules_data = data["schedules"]
+        elif isinstance(data, list):
+            schedules_data = data
+        else:
+            schedules_data = []
+        return [ScheduleEntry.from_dict(item) for item in schedules_data]
+    except Exception as e:
+        logger.error(f"Chyba při načítání plánů: {e}")
+        return []
+
+
+def schedule_file_data(schedules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Obsah schedule.json pro seznam plánů (již převedených přes to_dict)"""
+    return {
+        "schedules": schedules,
+        "settings": {
+            "enable_scheduler": True,
+            "notification_enabled": True,
+            "auto_execute": True
+        }
+    }
+
+
+def write_file_atomic(path, content: bytes):
+    """
+    Atomický zápis souboru - dočasný soubor, fsync a os.replace.
+    
+    Při pádu uprostřed zápisu zůstane na disku buď starý, nebo nový obsah,
+    nikdy ne useknutý soubor.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def serialize_schedule(schedules: List[Dict[str, Any]]) -> bytes:
+    """Serializace plánů do podoby schedule.json"""
+    return json.dumps(schedule_file_data(schedules), indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def save_schedule_entries(entries: List[ScheduleEntry], schedule_file=SCHEDULE_FILE):
+    """Uložení plánů do souboru (atomicky)"""
+    write_file_atomic(schedule_file, serialize_schedule([entry.to_dict() for entry in entries]))
+
+
+def merge_entries(current: List[ScheduleEntry], loaded: List[ScheduleEntry]) -> Tuple[List[ScheduleEntry], int]:
+    """
+    Sloučení znovu načtených plánů s aktuálními (hot reload).
+    
+    Nezměněné plány si ponechají původní objekt, takže porovnání identity
+    (např. "naposledy spuštěný plán") po reloadu dál platí.
+    
+    Returns:
+        tuple: (nový seznam plánů, počet přidaných/změněných/odebraných)
+    """
+    by_id = {entry.id: entry for entry in current}
+    merged = []
+    changed = 0
+    for entry in loaded:
+        old = by_id.pop(entry.id, None)
+        if old is not None and old.to_dict() == entry.to_dict():
+            merged.append(old)
+        else:
+            merged.append(entry)
+            changed += 1
+    return merged, changed + len(by_id)
+
+
+def get_active_schedule(entries: List[ScheduleEntry], current_time: datetime) -> Optional[ScheduleEntry]:
+    """
+    Získání aktivního plánu pro daný čas - lineární průchod se stejnou
+    sémantikou jako CompiledSchedule.active_at (reference pro benchmarky).
+    
+    Plán je aktivní v intervalu [start, konec) po minutách - v minutě konce
+    už neběží. Při překryvu vyhrává vyšší priorita, při shodě pořadí v seznamu.
+    """
+    minute = current_time.hour * 60 + current_time.minute
+    best = None
+    
+    for entry in entries:
+        if not entry.enabled:
+            continue
+        try:
+            start = parse_minutes(entry.start_time)
+            end = parse_minutes(entry.end_time)
+        except ValueError:
+            continue
+        
+        if end > start:
+            # Normální rozsah (např. 8:00 - 10:00)
+            active = start <= minute < end
+        elif end == start:
+            active = True  # Celý den
+        else:
+            # Rozsah přes půlnoc (např. 22:00 - 02:00)
+            active = minute >= start or minute < end
+        if active and (best is None or entry.priority > best.priority):
+            best = entry
+            
+    return best
+
+
+def find_next_schedule(entries: List[ScheduleEntry], current_time: datetime) -> Tuple[Optional[ScheduleEntry], Optional[int]]:
+    """
+    Najde nejbližší nadcházející plán.
+    
+    Returns:
+        tuple: (plán, počet minut do jeho začátku) nebo (None, None)
+    """
+    current_minutes = current_time.hour * 60 + current_time.minute
+    
+    closest_schedule = None
+    closest_minutes = None
+    
+    for entry in entries:
+        if not entry.enabled:
+            continue
+            
+        try:
+            start_time = datetime.strptime(entry.start_time, "%H:%M").time()
+        except ValueError:
+            continue
+        start_minutes = start_time.hour * 60 + start_time.minute
+        
+        # Pokud je start_time dnes později, jinak zítra
+        if start_minutes > current_minutes:
+            minutes_diff = start_minutes - current_minutes
+        else:
+            minutes_diff = (24 * 60) - current_minutes + start_minutes
+            
+        if closest_minutes is None or minutes_diff < closest_minutes:
+            closest_minutes = minutes_diff
+            closest_schedule = entry
+    
+    return closest_schedule, closest_minutes
+
+
+def remaining_minutes(entry: ScheduleEntry, current_time: datetime) -> Optional[int]:
+    """Počet minut do konce aktivního plánu (None pokud nelze určit)"""
+    try:
+        end_time = datetime.strptime(entry.end_time, "%H:%M").time()
+    except ValueError:
+        return None
+    
+    # Převod na minuty
+    end_minutes = end_time.hour * 60 + end_time.minute
+    current_minutes = current_time.hour * 60 + current_time.minute
+    
+    if end_minutes < current_minutes:  # Přes půlnoc
+        end_minutes += 24 * 60
+    
+    remaining = end_minutes - current_minutes
+    return remaining if remaining > 0 else None
+
+
+def format_minutes(minutes: int) -> str:
+    """Formátování počtu minut na "Xh Ymin" / "Ymin" """
+    hours = minutes // 60
+    if hours > 24:
+        return f"{hours//24}d {hours%24}h"
+    elif hours > 0:
+        return f"{hours}h {minutes % 60}min"
+    return f"{minutes}min"
+
+
+@lru_cache(maxsize=4096)
+def parse_minutes(value: str) -> int:
+    """Převod "HH:MM" na minutu dne (ValueError při neplatném formátu) - časů dne je jen 1440, výsledek se cachuje"""
+    parsed = datetime.strptime(value, "%H:%M")
+    return parsed.hour * 60 + parsed.minute
+
+
+def _entry_intervals(entries: List[ScheduleEntry]):
+    """
+    Rozklad zapnutých plánů na intervaly v rámci jednoho dne [začátek, konec).
+    
+    Plán přes půlnoc se rozdělí na dva intervaly, plán se stejným
+    začátkem a koncem pokrývá celý den. Neplatné časy se přeskočí.
+    
+    Returns:
+        list: [(začátek, konec, pořadí v seznamu)]
+    """
+    intervals = []
+    for order, entry in enumerate(entries):
+        if not entry.enabled:
+            continue
+        try:
+            start = parse_minutes(entry.start_time)
+            end = parse_minutes(entry.end_time)
+        except ValueError:
+            continue
+        
+        if end > start:
+            intervals.append((start, end, order))
+        elif end == start:
+            intervals.append((0, MINUTES_PER_DAY, order))
+        else:
+            # Přes půlnoc (např. 22:00 - 02:00) - dva úseky
+            intervals.append((start, MINUTES_PER_DAY, order))
+            if end > 0:  # Konec o půlnoci - druhý úsek je prázdný
+                intervals.append((0, end, order))
+    return intervals
+
+
+def find_overlaps(entries: List[ScheduleEntry]):
+    """
+    Detekce překrývajících se plánů (sweep line přes seřazené intervaly).
+    
+    Returns:
+        list: [(plán_a, plán_b)] - každá dvojice nejvýše jednou
+    """
+    intervals = sorted(_entry_intervals(entries))
+    active = []      # [(konec, pořadí)] intervaly, které ještě neskončily
+    pairs = set()
+    
+    for start, end, order in intervals:
+        active = [(a_end, a_order) for a_end, a_order in active if a_end > start]
+        for _, other in active:
+            if other != order:
+                pairs.add((min(order, other), max(order, other)))
+        active.append((end, order))
+    
+    return [(entries[a], entries[b]) for a, b in sorted(pairs)]
+
+
+def find_priority_conflicts(entries: List[ScheduleEntry]):
+    """Překryvy plánů se stejnou prioritou (nejednoznačné - rozhoduje pořadí v seznamu)"""
+    return [(a, b) for a, b in find_overlaps(entries) if a.priority == b.priority]
+
+
+class CompiledSchedule:
+    """
+    Plány předkompilované do intervalového indexu dne.
+    
+    Časy se parsují jen jednou při kompilaci. Den se rozdělí na úseky mezi
+    body začátků/konců plánů a pro každý úsek se sweep line s haldou
+    předem určí jen plán s nejvyšší prioritou (při shodě rozhoduje pořadí
+    v seznamu) - kompilace je O(n log n) bez ohledu na překryvy. Všechny
+    aktivní plány se hledají až na dotaz v intervalovém stromu nad úseky
+    (každý interval je nejvýše v O(log úseků) uzlech). Dotazy "aktivní
+    plán" a "další přechody" jsou O(log n) přes bisect a plánovač může
+    spát přesně do další změny místo pravidelného dotazování.
+    """
+    
+    def __init__(self, entries: List[ScheduleEntry]):
+        self.entries = list(entries)
+        self._ends = {}           # id(entry) -> minuta konce
+        self._starts = []         # [(minuta začátku, pořadí)] seřazeno
+        self._events = []         # [(minuta, 0=konec / 1=začátek, pořadí)] seřazeno
+        self._points = [0]        # hranice úseků (minuty dne)
+        self._winners = [None]    # plán s nejvyšší prioritou v úseku začínajícím na _points[i]
+        self._tree_size = 1       # počet listů intervalového stromu (mocnina 2 >= počet úseků)
+        self._tree = [[], []]     # uzel -> pořadí plánů pokrývajících celý rozsah uzlu
+        self._compile()
+        
+    def _compile(self):
+        """Sestavení indexu (sweep přes hranice intervalů)"""
+        intervals = _entry_intervals(self.entries)
+        
+        for order in sorted({o for _, _, o in intervals}):
+            entry = self.entries[order]
+            start = parse_minutes(entry.start_time)
+            end = parse_minutes(entry.end_time)
+            self._ends[id(entry)] = end
+            self._starts.append((start, order))
+            self._events.append((start, 1, order))
+            if end != start:
+                self._events.append((end % MINUTES_PER_DAY, 0, order))
+        self._starts.sort()
+        self._events.sort()
+        
+        # Sweep line - na každé hranici odebrat končící a přidat začínající intervaly
+        boundaries = {}
+        for start, end, order in intervals:
+            boundaries.setdefault(start, ([], []))[1].append(order)
+            boundaries.setdefault(end, ([], []))[0].append(order)
+        
+        active = {}
+        heap = []                 # [(-priorita, pořadí)] - skončené plány se odeberou až z vrcholu
+        self._points = []
+        self._winners = []
+        for point in sorted(set(boundaries) | {0}):
+            if point >= MINUTES_PER_DAY:
+                break
+            ending, starting = boundaries.get(point, ([], []))
+            for order in ending:
+                active[order] = active.get(order, 1) - 1
+                if active[order] <= 0:
+                    del active[order]
+            for order in starting:
+                active[order] = active.get(order, 0) + 1
+                heapq.heappush(heap, (-self.entries[order].priority, order))
+            while heap and heap[0][1] not in active:
+                heapq.heappop(heap)
+            self._points.append(point)
+            self._winners.append(self.entries[heap[0][1]] if heap else None)
+        
+        # Intervalový strom (segment tree) nad úseky - interval se uloží do uzlů, které pokrývá celé
+        index_of = {point: index for index, point in enumerate(self._points)}
+        size = 1
+        while size < len(self._points):
+            size *= 2
+        self._tree_size = size
+        self._tree = [[] for _ in range(2 * size)]
+        for start, end, order in intervals:
+            low = index_of[start] + size
+            high = index_of.get(end, len(self._points)) + size
+            while low < high:
+                if low & 1:
+                    self._tree[low].append(order)
+                    low += 1
+                if high & 1:
+                    high -= 1
+                    self._tree[high].append(order)
+                low //= 2
+                high //= 2
+        
+    @staticmethod
+    def _minute_of_day(current_time: datetime) -> int:
+        return current_time.hour * 60 + current_time.minute
+    
+    def all_active_at(self, current_time: datetime) -> Tuple[ScheduleEntry, ...]:
+        """Všechny aktivní plány v daném čase seřazené podle priority - O(log n + k log k)"""
+        node = bisect_right(self._points, self._minute_of_day(current_time)) - 1 + self._tree_size
+        orders = []
+        while node:
+            orders.extend(self._tree[node])
+            node //= 2
+        orders.sort(key=lambda order: (-self.entries[order].priority, order))
+        return tuple(self.entries[order] for order in orders)
+    
+    def active_at(self, current_time: datetime) -> Optional[ScheduleEntry]:
+        """Aktivní plán s nejvyšší prioritou v daném čase - O(log n)"""
+        return self._winners[bisect_right(self._points, self._minute_of_day(current_time)) - 1]
+    
+    def next_transitions(self, current_time: datetime, count: int = 1):
+        """
+        Nejbližší začátky/konce plánů (případně přes půlnoc do dalších dnů).
+        
+        Returns:
+            list: [(minut od teď, "start" | "end", plán)] - nejvýše count položek
+        """
+        if not self._events:
+            return []
+        minute = self._minute_of_day(current_time)
+        index = bisect_right(self._events, (minute, 2, len(self.entries)))
+        
+        transitions = []
+        day_offset = 0
+        while len(transitions) < count:
+            if index >= len(self._events):
+                index = 0
+                day_offset += MINUTES_PER_DAY
+            point, kind, order = self._events[index]
+            transitions.append((point + day_offset - minute, "start" if kind else "end",
+                                self.entries[order]))
+            index += 1
+        return transitions
+    
+    def seconds_until_next_transition(self, current_time: datetime) -> float:
+        """Počet sekund do nejbližší hranice úseku (začátek nebo konec plánu)"""
+        minute = self._minute_of_day(current_time)
+        index = bisect_right(self._points, minute)
+        next_point = self._points[index] if index < len(self._points) else MINUTES_PER_DAY
+        elapsed = current_time.hour * 3600 + current_time.minute * 60 + current_time.second \
+            + current_time.microsecond / 1e6
+        return max(0.0, next_point * 60 - elapsed)
+    
+    def next_start(self, current_time: datetime) -> Tuple[Optional[ScheduleEntry], Optional[int]]:
+        """
+        Nejbližší nadcházející začátek plánu - O(log n).
+        
+        Returns:
+            tuple: (plán, počet minut do jeho začátku) nebo (None, None)
+        """
+        if not self._starts:
+            return None, None
+        minute = self._minute_of_day(current_time)
+        index = bisect_right(self._starts, (minute, len(self.entries)))
+        if index < len(self._starts):
+            start, order = self._starts[index]
+            return self.entries[order], start - minute
+        # Zítra - první plán dne
+        start, order = self._starts[0]
+        return self.entries[order], MINUTES_PER_DAY - minute + start
+    
+    def remaining_minutes(self, entry: ScheduleEntry, current_time: datetime) -> Optional[int]:
+        """Počet minut do konce plánu (bez opětovného parsování času)"""
+        end_minutes = self._ends.get(id(entry))
+        if end_minutes is None:
+            return remaining_minutes(entry, current_time)
+        current_minutes = self._minute_of_day(current_time)
+        if end_minutes < current_minutes:  # Přes půlnoc
+            end_minutes += MINUTES_PER_DAY
+        remaining = end_minutes - current_minutes
+        return remaining if remaining > 0 else None
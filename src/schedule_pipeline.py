@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Provádění plánu jako řady příkazů jednoho zařízení (GUI i daemon).
+Které kroky jsou potřeba, určuje reconciler (požadovaný vs. hlášený stav).
+
+Místo pevných pauz (3 s po zapnutí, 3 s po režimu, 2 s po teplotě) se
+krok odešle, až zařízení potvrdí kroky, na kterých závisí:
+
+    power_on -> change_mode -> set_temperature
+                            -> set_wind_strength
+
+Režim a teplota jdou vždy v samostatných payloadech (v jednom je
+zařízení odmítá) a teplota až po potvrzení režimu - změna režimu
+přepíše cílovou teplotu. Teplota a vítr na sobě nezávisí, vítr se
+odešle hned po teplotě.
+
+Krok, jehož stav už zařízení hlásí (např. zapnutí zapnutého zařízení),
+se přeskočí. Když se krok nepodaří odeslat, závislé kroky se vynechají.
+Nový plán (nebo "Stop plán") běžící plán zruší - neodeslané kroky
+se už neodešlou.
+"""
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from klima_logic import create_command_payload
+from command_tracker import is_reported, CONFIRMED, SUPERSEDED, UNVERIFIED
+from device_actor import SCHEDULE
+
+logger = logging.getLogger(__name__)
+
+STATUS_MAX_AGE = 5.0        # Stáří stavu pro přeskočení splněných kroků (s)
+UNVERIFIED_SETTLE = 2.0     # Pauza po kroku, který nelze ověřit podle stavu (s)
+
+# Krok -> kroky, které musí zařízení potvrdit před jeho odesláním
+STEP_DEPENDS_ON = {
+    "change_mode": ("power_on",),
+    "set_temperature": ("power_on", "change_mode"),
+    "set_wind_strength": ("power_on", "change_mode"),
+    "set_wind_direction": ("power_on", "change_mode"),
+    "set_power_save": ("power_on", "change_mode"),
+}
+
+# Stavy kroku (navíc CONFIRMED a UNVERIFIED z command_tracker)
+SENT = "sent"
+UNCONFIRMED = "unconfirmed"
+SKIPPED = "skipped"           # Zařízení už požadovaný stav hlásí
+BLOCKED = "blocked"           # Nesplněná závislost - krok se neodeslal
+FAILED = "failed"             # Příkaz se nepodařilo odeslat
+CANCELLED = "cancelled"       # Plán zrušen před odesláním
+
+
+class PipelineStep:
+    """Jeden příkaz plánu a jeho výsledek"""
+
+    def __init__(self, command: str, *args):
+        self.command = command
+        self.args = args
+        self.state: Optional[str] = None
+        self.completion = None
+        self.error: Optional[str] = None
+
+    def __repr__(self):
+        return f"{self.command}{list(self.args)}={self.state}"
+
+
+class ScheduleRun:
+    """Výsledek provedení plánu"""
+
+    def __init__(self, name: str, steps: List[Tuple]):
+        self.name = name
+        self.steps = [PipelineStep(*step) for step in steps]
+        self.started = time.monotonic()
+        self.duration: Optional[float] = None
+        self.cancelled = False
+
+    @property
+    def problems(self) -> List[PipelineStep]:
+        """Kroky, které neproběhly podle očekávání"""
+        return [step for step in self.steps if step.state in (FAILED, BLOCKED, UNCONFIRMED)]
+
+    @property
+    def ok(self) -> bool:
+        return not self.cancelled and not self.problems
+
+    def summary(self) -> str:
+        """Krátký text pro status bar a log"""
+        if self.cancelled:
+            return f"Plán '{self.name}' přerušen"
+        if self.ok:
+            return f"Plán '{self.name}' dokončen za {self.duration:.1f}s"
+        problems = ", ".join(f"{step.command} ({step.state})" for step in self.problems)
+        return f"⚠️ Plán '{self.name}': {problems}"
+
+
+class SchedulePipeline:
+    """Provádění plánů jednoho zařízení - vždy nejvýše jeden běžící plán"""
+
+    def __init__(self, execute: Callable[..., Awaitable], tracker, lane: int = SCHEDULE):
+        """
+        Args:
+            execute: async execute(příkaz, *args, lane=) -> CommandCompletion (odeslání + sledování potvrzení)
+            tracker: CommandTracker zařízení (stav, profil)
+            lane: Prioritní pruh fronty zápisů (příkazy uživatele mají přednost)
+        """
+        self.execute = execute
+        self.tracker = tracker
+        self.lane = lane
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistiky
+        self.runs = 0
+        self.cancelled = 0
+        self.last_duration: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def cancel(self):
+        """Zrušení běžícího plánu (neodeslané kroky se neodešlou)"""
+        if self.running:
+            self._task.cancel()
+
+    async def run(self, name: str, steps: List[Tuple]) -> ScheduleRun:
+        """
+        Provedení kroků - běžící plán se zruší (novější plán má přednost).
+
+        Args:
+            name: Název pro log a status bar
+            steps: [(příkaz, *argumenty), ...] v pořadí odeslání (viz reconciler.plan_steps)
+        """
+        self.cancel()
+        run = ScheduleRun(name, steps)
+        self._task = asyncio.ensure_future(self._run(run))
+        return await asyncio.shield(self._task)
+
+    async def _run(self, run: ScheduleRun) -> ScheduleRun:
+        self.runs += 1
+        try:
+            status = await self._current_status()
+            pending = {}
+            for step in run.steps:
+                blocking = [pending[name] for name in STEP_DEPENDS_ON.get(step.command, ()) if name in pending]
+                if any(dependency.state in (FAILED, BLOCKED) for dependency in blocking):
+                    step.state = BLOCKED
+                    continue
+                changed = any(dependency.state != SKIPPED for dependency in blocking)
+                for dependency in blocking:
+                    await self._settle(dependency)
+
+                # Po odeslané závislosti (např. změna režimu přepíše teplotu) je stav zastaralý
+                if not changed and self._already_reported(step, status):
+                    step.state = SKIPPED
+                    logger.info(f"  ↳ {step.command}: zařízení už hlásí požadovaný stav")
+                else:
+                    await self._send(step)
+                pending[step.command] = step
+
+            for step in run.steps:
+                if step.state == SENT:
+                    await self._settle(step)
+        except asyncio.CancelledError:
+            run.cancelled = True
+            self.cancelled += 1
+            for step in run.steps:
+                if step.state is None:
+                    step.state = CANCELLED
+
+        run.duration = time.monotonic() - run.started
+        self.last_duration = run.duration
+        if run.ok:
+            logger.info(f"✅ {run.summary()} {run.steps}")
+        elif run.cancelled:
+            logger.info(f"🛑 {run.summary()} {run.steps}")
+        else:
+            logger.warning(f"{run.summary()} {run.steps}")
+        return run
+
+    async def _current_status(self) -> Optional[dict]:
+        try:
+            return await self.tracker.api.get_device_status(self.tracker.device_id,
+                                                            max_age=STATUS_MAX_AGE)
+        except Exception as e:
+            logger.warning(f"Stav zařízení před plánem nedostupný: {e}")
+            return None
+
+    def _already_reported(self, step: PipelineStep, status: Optional[dict]) -> bool:
+        """Zařízení už hlásí stav, který by krok nastavil (a nečeká se na jiný příkaz na stejné pole)"""
+        if status is None:
+            return False
+        status = self.tracker.overlay(status)  # Nepotvrzené příkazy (např. zrušeného plánu) stav ještě změní
+        return is_reported(create_command_payload(step.command, *step.args), status, self.tracker.profile)
+
+    async def _send(self, step: PipelineStep):
+        logger.info(f"  ↳ {step.command} {' '.join(map(str, step.args))}".rstrip())
+        try:
+            step.completion = await self.execute(step.command, *step.args, lane=self.lane)
+            step.state = SENT
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            step.state = FAILED
+            step.error = str(e)
+            logger.error(f"❌ Krok {step.command} selhal: {e}")
+
+    async def _settle(self, step: PipelineStep):
+        """Čekání na potvrzení kroku zařízením (jen jednou)"""
+        if step.state != SENT:
+            return
+        completion = step.completion
+        if completion is None or completion.state == UNVERIFIED:
+            await asyncio.sleep(UNVERIFIED_SETTLE)
+            step.state = UNVERIFIED
+            return
+        await completion.finished()
+        step.state = CONFIRMED if completion.state in (CONFIRMED, SUPERSEDED) else UNCONFIRMED
+
+    def stats(self):
+        """Počty plánů a doba posledního provedení (s)"""
+        return {"runs": self.runs, "cancelled": self.cancelled,
+                "running": self.running, "last_duration": self.last_duration}
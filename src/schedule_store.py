@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Transakční úložiště časových plánů.
+
+Snapshot zůstává v data/schedule.json (stejný formát jako dřív, lze ho
+ručně upravit), každá změna jednoho plánu se ale jen připíše jako jeden
+řádek do žurnálu data/schedule.journal:
+
+    {"base": 1234567890, "op": "put", "entry": {...}}
+    {"base": 1234567890, "op": "delete", "id": "..."}
+
+"base" je CRC32 snapshotu, ke kterému se řádek vztahuje. Po COMPACT_AFTER
+operacích se stav atomicky zapíše do nového snapshotu (dočasný soubor,
+fsync, os.replace) a žurnál se vyprázdní. Řádky s jiným base (pád mezi
+výměnou snapshotu a vyprázdněním žurnálu, nebo snapshot přepsaný zvenku)
+i useknutý poslední řádek se při načtení ignorují.
+
+Veškeré zápisy běží na pracovním vlákně - GUI jen zařadí operaci do fronty.
+"""
+import os
+import json
+import queue
+import logging
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from schedule_logic import (ScheduleEntry, SCHEDULE_FILE, serialize_schedule,
+                            write_file_atomic)
+
+logger = logging.getLogger(__name__)
+
+COMPACT_AFTER = 200  # Počet operací v žurnálu, po kterém se zapíše nový snapshot
+
+
+def journal_path(schedule_file) -> Path:
+    """Cesta k žurnálu vedle snapshotu (schedule.json -> schedule.journal)"""
+    return Path(schedule_file).with_suffix(".journal")
+
+
+def read_schedule_state(schedule_file=SCHEDULE_FILE) -> Tuple[Dict[str, dict], int, bool]:
+    """
+    Načtení snapshotu a přehrání platných řádků žurnálu.
+
+    Returns:
+        tuple: (id -> dict plánu v pořadí seznamu, CRC32 snapshotu,
+                příznak že je vhodné přepsat snapshot - neplatné řádky
+                žurnálu, chybějící nebo duplicitní id)
+    """
+    schedule_file = Path(schedule_file)
+    try:
+        raw = schedule_file.read_bytes()
+    except FileNotFoundError:
+        raw = b""
+    base = zlib.crc32(raw)
+    needs_compaction = False
+
+    schedules = []
+    snapshot_valid = True
+    if raw:
+        try:
+            data = json.loads(raw.decode("utf-8"))
+            if isinstance(data, dict) and "schedules" in data:
+                schedules = data["schedules"]
+            elif isinstance(data, list):
+                schedules = data
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error(f"Chyba při načítání plánů: {e}")
+            snapshot_valid = False
+
+    state = {}
+    for item in schedules:
+        # Převod přes ScheduleEntry doplní výchozí hodnoty, starý formát i id
+        entry = ScheduleEntry.from_dict(item)
+        if item.get("id") != entry.id or entry.id in state:
+            needs_compaction = True
+            if entry.id in state:
+                entry.id = ScheduleEntry().id
+        state[entry.id] = entry.to_dict()
+
+    journal = journal_path(schedule_file)
+    if journal.exists():
+        with open(journal, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Useknutý zápis (pád uprostřed řádku)
+                    needs_compaction = True
+                    continue
+                if record.get("base") != base:
+                    needs_compaction = True
+                    continue
+                _apply(state, record)
+
+    # Nečitelný snapshot se automaticky nepřepisuje - mohl by jít o rozpracovanou ruční úpravu
+    return state, base, needs_compaction and snapshot_valid
+
+
+def load_entries(schedule_file=SCHEDULE_FILE) -> List[ScheduleEntry]:
+    """Načtení plánů včetně nezkompaktovaných změn z žurnálu (jen pro čtení)"""
+    try:
+        state, _, _ = read_schedule_state(schedule_file)
+    except Exception as e:
+        logger.error(f"Chyba při načítání plánů: {e}")
+        return []
+    return [ScheduleEntry.from_dict(item) for item in state.values()]
+
+
+def _apply(state: Dict[str, dict], record: dict):
+    """Aplikace jedné operace žurnálu na stav"""
+    op = record.get("op")
+    if op == "put":
+        entry = record["entry"]
+        state[entry["id"]] = entry  # Úprava zachová pozici, nový plán se přidá na konec
+    elif op == "delete":
+        state.pop(record.get("id"), None)
+    elif op == "replace":
+        state.clear()
+        for entry in record["entries"]:
+            state[entry["id"]] = entry
+
+
+class ScheduleStore:
+    """Úložiště plánů se žurnálem a zápisem na pracovním vlákně"""
+
+    def __init__(self, schedule_file=SCHEDULE_FILE, compact_after: int = COMPACT_AFTER):
+        """
+        Args:
+            schedule_file: Cesta ke snapshotu (schedule.json)
+            compact_after: Počet operací v žurnálu před kompakcí
+        """
+        self.schedule_file = Path(schedule_file)
+        self.journal_file = journal_path(self.schedule_file)
+        self.compact_after = compact_after
+
+        # Stav pracovního vlákna - mění se jen na něm
+        self._state: Dict[str, dict] = {}
+        self._base = 0
+        self._journal_ops = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self.last_snapshot_crc = None  # CRC32 posledního vlastního snapshotu (pro FileWatcher)
+        self.last_error = None
+        self.writes = 0
+        self.compactions = 0
+
+    def load(self) -> List[ScheduleEntry]:
+        """
+        Načtení plánů (snapshot + žurnál). Volá se před prvním zápisem,
+        případně po flush() při opětovném načtení (viz reload).
+        """
+        try:
+            state, base, needs_compaction = read_schedule_state(self.schedule_file)
+        except Exception as e:
+            logger.error(f"Chyba při načítání plánů: {e}")
+            state, base, needs_compaction = {}, None, False
+
+        self._queue.put(("load", (state, base, needs_compaction)))
+        self._ensure_worker()
+        return [ScheduleEntry.from_dict(item) for item in state.values()]
+
+    def reload(self, timeout: float = 10) -> List[ScheduleEntry]:
+        """Opětovné načtení po změně souboru zvenku - nejdřív dopíše rozpracované změny"""
+        self.flush(timeout)
+        return self.load()
+
+    def is_own_snapshot(self, crc: int) -> bool:
+        """Zda snapshot s daným CRC32 zapsal tento store (FileWatcher ho nemá načítat)"""
+        return crc == self.last_snapshot_crc
+
+    def put(self, entry: ScheduleEntry):
+        """Uložení nového nebo upraveného plánu (podle entry.id)"""
+        # Serializace hned - GUI může objekt dál měnit
+        self._submit({"op": "put", "entry": entry.to_dict()})
+
+    def delete(self, entry_id: str):
+        """Smazání plánu"""
+        self._submit({"op": "delete", "id": entry_id})
+
+    def replace_all(self, entries: List[ScheduleEntry]):
+        """Přepsání všech plánů (změna pořadí, import) - zapíše rovnou nový snapshot"""
+        self._submit({"op": "replace", "entries": [entry.to_dict() for entry in entries]})
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Počkání na zapsání všech zařazených operací.
+
+        Returns:
+            bool: True pokud je fronta prázdná
+        """
+        if not self._thread:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5):
+        """Dopsání fronty a ukončení pracovního vlákna"""
+        if self._thread:
+            self._queue.put(("stop", None))
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _submit(self, record: dict):
+        """Zařazení operace pro pracovní vlákno"""
+        self._queue.put(("op", record))
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        """Spuštění pracovního vlákna při první operaci"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="ScheduleStore", daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        """Pracovní vlákno - zápisy do žurnálu a kompakce"""
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == "stop":
+                    return
+                if kind == "flush":
+                    payload.set()
+                elif kind == "load":
+                    self._state, self._base, needs_compaction = payload
+                    self._journal_ops = 0
+                    if needs_compaction:
+                        self._compact()
+                else:
+                    self._write(payload)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                logger.error(f"❌ Chyba při ukládání plánů: {e}")
+
+    def _write(self, record: dict):
+        """Aplikace operace a její trvalé uložení"""
+        _apply(self._state, record)
+        self.writes += 1
+
+        if (record["op"] == "replace" or self._base is None
+                or self._journal_ops + 1 >= self.compact_after):
+            self._compact()
+            return
+
+        line = json.dumps({"base": self._base, **record}, ensure_ascii=False) + "\n"
+        with open(self.journal_file, "ab") as f:
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_ops += 1
+
+    def _compact(self):
+        """Atomický zápis nového snapshotu a vyprázdnění žurnálu"""
+        content = serialize_schedule(list(self._state.values()))
+        write_file_atomic(self.schedule_file, content)
+        # Při pádu před vyprázdněním se staré řádky ignorují (nesedí base)
+        self._base = zlib.crc32(content)
+        self.last_snapshot_crc = self._base
+        with open(self.journal_file, "wb"):
+            pass
+        self._journal_ops = 0
+        self.compactions += 1
+        logger.debug(f"Plány zkompaktovány do {self.schedule_file.name} ({len(self._state)} položek)")
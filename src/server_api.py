@@ -4,11 +4,17 @@ API modul pro komunikaci s LG ThinQ službou.
 Optimalizovaná verze s caching a error handling.
 """
 import json
+import time
 import logging
 import asyncio
 import aiohttp
 from pathlib import Path
 from thinqconnect import ThinQApi
+from rate_limiter import create_limiters
+from resilience import Resilience
+from status_history import StatusHistory
+from device_actor import DeviceActors, INTERACTIVE
+from profile_validator import validator_for
 
 # Nastavení logování
 logger = logging.getLogger(__name__)
@@ -21,6 +27,37 @@ class ThinQAPI:
         self.session = None
         self.config = self.load_config()
         self.device_cache = {}
+        self._cache_times = {}  # device_id -> čas načtení (time.monotonic)
+        self._cache_generations = {}  # device_id -> počet zneplatnění (příkaz, push) - starší dotaz se neuloží
+        self._inflight_status = {}
+        
+        # Statistiky cache
+        self.cache_hits = 0
+        self.cache_stale_hits = 0
+        self.cache_misses = 0
+        self.inflight_joined = 0  # Počet volání obsloužených rozpracovaným dotazem
+        self.on_status_fetch = None  # Callback() při každém dotazu na stav (rozpočet dotazů)
+        
+        # Oddělené rate limity pro čtení a zápis (config.json: rate_limit)
+        self.read_limiter, self.write_limiter = create_limiters(self.config)
+        
+        # Opakování přechodných chyb + circuit breaker (config.json: resilience)
+        self.resilience = Resilience(self.config.get("resilience", {}))
+        
+        # Fronta zápisů pro každé zařízení - sériově v rámci zařízení, prioritní pruhy
+        self.command_queues = DeviceActors(self._send_device_command)
+        
+        # Kontrola payloadů podle profilu (device_id -> PayloadValidator, None = profil nedostupný)
+        self.validators = {}
+        self.device_models = {}  # device_id -> modelName (register_devices)
+        
+        # Historie stavů (config.json: "status_history": false vypne)
+        self.history = None
+        if self.config.get("status_history", True):
+            try:
+                self.history = StatusHistory()
+            except Exception as e:
+                logger.warning(f"Historii stavů nelze otevřít: {e}")
         
     def load_config(self):
         """Načtení konfigurace z config.json"""
@@ -42,19 +79,98 @@ class ThinQAPI:
                 client_id=self.config["client_id"],
                 session=self.session
             )
+            # Přesměrování na jiný server (např. lokální simulátor - thinq_simulator.py)
+            base_url = self.config.get("api_base_url")
+            if base_url:
+                base_url = base_url.rstrip("/")
+                self.api._get_url_from_endpoint = lambda endpoint: f"{base_url}/{endpoint}"
+                logger.info(f"🧪 ThinQ API přesměrováno na {base_url}")
         return self.api
     
-    async def get_device_status(self, device_id: str):
-        """Získání stavu zařízení s caching (bez agresivního retry)"""
+    async def get_device_status(self, device_id: str, max_age: float = None,
+                                stale_while_revalidate: float = 0):
+        """
+        Získání stavu zařízení s caching (bez agresivního retry).
+        
+        Souběžná volání pro stejné zařízení sdílí jeden rozpracovaný
+        HTTP požadavek (single-flight) a dostanou stejný výsledek.
+        
+        Args:
+            device_id: ID zařízení
+            max_age: Max. stáří stavu z cache v sekundách (None = vždy čerstvý dotaz)
+            stale_while_revalidate: O kolik sekund navíc smí být stav starší -
+                vrátí se okamžitě z cache a na pozadí se spustí obnovení
+        
+        Returns:
+            dict: Stav zařízení
+        """
+        if max_age is not None and device_id in self._cache_times:
+            age = time.monotonic() - self._cache_times[device_id]
+            if age <= max_age:
+                self.cache_hits += 1
+                return self.device_cache[device_id]
+            if age <= max_age + stale_while_revalidate:
+                self.cache_stale_hits += 1
+                logger.debug(f"Stav zařízení {device_id[:8]}... z cache ({age:.1f}s), obnovuji na pozadí")
+                self._start_status_fetch(device_id)
+                return self.device_cache[device_id]
+        
+        self.cache_misses += 1
+        task = self._start_status_fetch(device_id)
+        
+        # shield - zrušení jednoho volajícího nesmí zrušit dotaz ostatním
+        return await asyncio.shield(task)
+    
+    def _start_status_fetch(self, device_id: str):
+        """Spuštění dotazu na stav, nebo připojení k již rozpracovanému (single-flight)"""
+        task = self._inflight_status.get(device_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_device_status(device_id))
+            self._inflight_status[device_id] = task
+            task.add_done_callback(self._on_status_fetch_done)
+            if self.on_status_fetch:
+                self.on_status_fetch()
+        else:
+            self.inflight_joined += 1
+            logger.debug(f"Stav zařízení {device_id[:8]}... již načítán - připojuji se k dotazu")
+        return task
+    
+    def _on_status_fetch_done(self, task):
+        """Úklid dokončeného dotazu (chyba z obnovení na pozadí se jen zaloguje)"""
+        for device_id, inflight in list(self._inflight_status.items()):
+            if inflight is task:
+                del self._inflight_status[device_id]
+        if not task.cancelled():
+            task.exception()  # Označení výjimky jako zpracované (už zalogována)
+    
+    def cache_stats(self):
+        """Počítadla cache stavů zařízení"""
+        return {
+            "hits": self.cache_hits,
+            "stale_hits": self.cache_stale_hits,
+            "misses": self.cache_misses,
+            "inflight_joined": self.inflight_joined
+        }
+    
+    async def _fetch_device_status(self, device_id: str):
+        """Vlastní HTTP dotaz na stav zařízení"""
+        generation = self._cache_generations.get(device_id, 0)
         try:
             api = await self.initialize()
             
-            # V synchronní verzi thinqconnect používáme get_device_status
-            if hasattr(api, 'async_get_device_status'):
-                status = await api.async_get_device_status(device_id)
-            else:
+            async def request():
+                # V synchronní verzi thinqconnect používáme get_device_status
+                if hasattr(api, 'async_get_device_status'):
+                    return await api.async_get_device_status(device_id)
                 # Fallback pro synchronní verzi
-                status = api.get_device_status(device_id)
+                return api.get_device_status(device_id)
+            
+            status = await self.resilience.call("status", request, self.read_limiter)
+            
+            if generation != self._cache_generations.get(device_id, 0):
+                # Dotaz začal před příkazem / push zprávou - stav může být starší než cache
+                logger.debug(f"Stav zařízení {device_id[:8]}... načten před zneplatněním - neukládá se")
+                return status
             
             # Cache pro porovnání změn
             if device_id in self.device_cache:
@@ -66,28 +182,102 @@ class ThinQAPI:
                 logger.info(f"📋 První načtení stavu zařízení")
             
             self.device_cache[device_id] = status
+            self._cache_times[device_id] = time.monotonic()
+            self._record_history(device_id, status)
             return status
             
         except Exception as e:
-            # Při jakékoliv chybě (včetně 503) to prostě selže
-            # Periodická kontrola to zkusí znovu za 5 minut (STATUS_CHECK_INTERVAL)
-            logger.error(f"❌ Chyba API: {e} - další pokus za 5 minut (automatická kontrola)")
+            # Přechodné chyby už opakoval Resilience - sem dojde až poslední chyba
+            logger.error(f"❌ Chyba API při čtení stavu: {e}")
             raise
     
-    async def send_device_command(self, device_id: str, payload: dict):
-        """Odeslání příkazu zařízení"""
+    async def send_device_command(self, device_id: str, payload: dict, lane: int = INTERACTIVE,
+                                  validated: bool = False):
+        """
+        Odeslání příkazu zařízení přes jeho frontu.
+        
+        Args:
+            device_id: ID zařízení
+            payload: Payload příkazu
+            lane: Prioritní pruh (device_actor.INTERACTIVE / SCHEDULE / BULK)
+            validated: Payload už zkontroloval validátor zařízení (create_command_payload s validator=)
+        
+        Returns:
+            Odpověď API, nebo None pokud čekající příkaz přepsal novější příkaz na stejná pole
+        
+        Raises:
+            PayloadValidationError: Payload neodpovídá profilu zařízení (neodešle se)
+        """
+        validator = None if validated else await self.payload_validator(device_id)
+        if validator:
+            mode = self.device_cache.get(device_id, {}).get("airConJobMode", {}).get("currentJobMode")
+            payload = validator.validate(payload, mode)
+        return await self.command_queues.send(device_id, payload, lane)
+    
+    def register_devices(self, devices):
+        """Modely zařízení (fleet.load_devices) - profil se pak načte jednou pro každý model"""
+        for device in devices:
+            if device.get("model_name"):
+                self.device_models[device["device_id"]] = device["model_name"]
+    
+    def register_device_profile(self, device_id: str, profile: dict, model_name: str = None):
+        """Lokálně známý profil zařízení (např. data/device_profile.json) - bez dotazu na API"""
+        model_name = model_name or self.device_models.get(device_id) or device_id
+        self.validators[device_id] = validator_for(model_name, profile)
+    
+    async def payload_validator(self, device_id: str):
+        """
+        Validátor payloadů zařízení - zkompilovaný profil sdílí všechna zařízení stejného modelu.
+        Profil se z API načte jen pro zařízení se známým modelem (register_devices), jednou.
+        
+        Returns:
+            PayloadValidator, nebo None (model neznámý / profil nedostupný - rozhodne server)
+        """
+        if device_id in self.validators:
+            return self.validators[device_id]
+        model_name = self.device_models.get(device_id)
+        if not model_name:
+            return None
+        validator = validator_for(model_name)
+        if validator is None:
+            try:
+                validator = validator_for(model_name, await self.get_device_profile(device_id))
+            except Exception as e:
+                logger.warning(f"Profil zařízení {device_id[:8]}... nelze načíst, payloady kontroluje jen server: {e}")
+        self.validators[device_id] = validator
+        return validator
+    
+    async def get_device_profile(self, device_id: str):
+        """Profil zařízení (vlastnosti, režimy r/w, povolené hodnoty)"""
+        api = await self.initialize()
+        
+        async def request():
+            if hasattr(api, 'async_get_device_profile'):
+                return await api.async_get_device_profile(device_id)
+            return api.get_device_profile(device_id)
+        
+        return await self.resilience.call("devices", request, self.read_limiter)
+    
+    async def _send_device_command(self, device_id: str, payload: dict):
+        """Skutečné odeslání příkazu (volá fronta zařízení)"""
         try:
             api = await self.initialize()
             
             logger.info(f"📤 API příkaz: {json.dumps(payload, ensure_ascii=False)}")
             
-            if hasattr(api, 'async_post_device_control'):
-                result = await api.async_post_device_control(device_id, payload)
-            else:
+            async def request():
+                if hasattr(api, 'async_post_device_control'):
+                    return await api.async_post_device_control(device_id, payload)
                 # Fallback pro synchronní verzi
-                result = api.post_device_control(device_id, payload)
+                return api.post_device_control(device_id, payload)
+            
+            # Příkazy nastavují stav (idempotentní) - opakování je bezpečné
+            result = await self.resilience.call("command", request, self.write_limiter)
             
             logger.info(f"📥 API odpověď: {result}")
+            
+            # Stav v cache už neodpovídá - další čtení s max_age musí jít na API
+            self._invalidate_status(device_id)
             return result
             
         except Exception as e:
@@ -99,25 +289,110 @@ class ThinQAPI:
         try:
             api = await self.initialize()
             
-            if hasattr(api, 'async_get_devices'):
-                devices = await api.async_get_devices()
-            else:
-                devices = api.get_devices()
+            async def request():
+                if hasattr(api, 'async_get_device_list'):
+                    return await api.async_get_device_list()
+                if hasattr(api, 'async_get_devices'):
+                    return await api.async_get_devices()
+                return api.get_devices()
             
-            return devices
+            return await self.resilience.call("devices", request, self.read_limiter)
             
         except Exception as e:
             logger.error(f"Chyba při získávání seznamu zařízení: {e}")
             raise
     
+    async def subscribe_device_events(self, device_id: str):
+        """Přihlášení k odběru změn stavu zařízení (push přes MQTT)"""
+        api = await self.initialize()
+        
+        async def request():
+            if hasattr(api, 'async_post_event_subscribe'):
+                return await api.async_post_event_subscribe(device_id)
+            return api.post_event_subscribe(device_id)
+        
+        return await self.resilience.call("subscribe", request, self.write_limiter)
+    
+    def _invalidate_status(self, device_id: str):
+        """
+        Zneplatnění stavu v cache - rozpracovaný dotaz (začal dřív) se odpojí
+        a jeho výsledek se neuloží, další čtení s max_age jde na API.
+        """
+        self._cache_times.pop(device_id, None)
+        self._cache_generations[device_id] = self._cache_generations.get(device_id, 0) + 1
+        self._inflight_status.pop(device_id, None)
+    
+    def apply_status_update(self, device_id: str, report: dict):
+        """
+        Sloučení částečného stavu z push zprávy do cache.
+        
+        Bez úplného stavu v cache (push před prvním načtením) se zpráva
+        neuloží - částečný stav by vypadal jako úplný (např. chybějící
+        operation = vypnuto). Místo toho se spustí načtení celého stavu.
+        
+        Args:
+            device_id: ID zařízení
+            report: Změněné vlastnosti (stejná struktura jako get_device_status)
+        
+        Returns:
+            dict: Kompletní stav zařízení po sloučení, nebo None (načítá se celý stav)
+        """
+        if device_id not in self.device_cache:
+            logger.info(f"📨 Push zpráva před prvním načtením stavu {device_id[:8]}... - načítám celý stav")
+            self._start_status_fetch(device_id)
+            return None
+        status = merge_status(self.device_cache[device_id], report)
+        self._invalidate_status(device_id)  # Rozpracovaný dotaz je starší než push zpráva
+        self.device_cache[device_id] = status
+        self._cache_times[device_id] = time.monotonic()
+        self._record_history(device_id, status)
+        logger.info(f"📨 Push aktualizace stavu zařízení {device_id[:8]}...")
+        return status
+    
+    def _record_history(self, device_id: str, status: dict):
+        """Uložení vzorku do historie - chyba historie nesmí shodit čtení stavu"""
+        if self.history:
+            try:
+                self.history.record(device_id, status)
+            except Exception as e:
+                logger.error(f"Chyba při ukládání historie: {e}")
+    
+    def rate_limit_stats(self):
+        """Statistiky rate limiteru (počet volání, čekání, čas strávený throttlingem)"""
+        return {
+            "read": self.read_limiter.stats(),
+            "write": self.write_limiter.stats()
+        }
+    
+    def resilience_stats(self):
+        """Stav circuit breakeru a počty opakování podle operace"""
+        return self.resilience.stats()
+    
+    def command_queue_stats(self):
+        """Fronty zápisů podle zařízení (délka, odeslané, přepsané)"""
+        return self.command_queues.stats()
+    
     async def close(self):
         """Uzavření API připojení"""
+        self.command_queues.close()
+        if self.history:
+            self.history.flush()
         if self.session:
             await self.session.close()
             self.session = None
         self.api = None
         logger.info("API připojení uzavřeno")
 
+def merge_status(base: dict, report: dict):
+    """Rekurzivní sloučení částečného stavu do kopie původního stavu"""
+    merged = dict(base)
+    for key, value in report.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_status(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
 # Zpětná kompatibilita s původním API
 async def get_api():
     """Zpětně kompatibilní funkce pro získání API instance"""
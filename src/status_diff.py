@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Porovnávání stavů zařízení po jednotlivých polích a rozesílání změn widgetům.
+Každý widget se přihlásí jen k polím, která zobrazuje (např.
+"temperature.currentTemperature"), a při aktualizaci se volají pouze
+handlery, jejichž pole se skutečně změnila.
+"""
+import logging
+from typing import Callable, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def flatten_status(status: dict, prefix: str = "") -> Dict[str, object]:
+    """
+    Převod vnořeného stavu na plochý dict cesta -> hodnota.
+
+    Seznamy se berou jako jedna hodnota (neprochází se po prvcích).
+
+    Returns:
+        dict: např. {"temperature.currentTemperature": 24, ...}
+    """
+    flat = {}
+    for key, value in (status or {}).items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten_status(value, path + "."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def diff_flat(old: Dict[str, object], new: Dict[str, object]):
+    """
+    Cesty, které se liší mezi dvěma plochými stavy (změněné, přidané i odebrané).
+
+    Returns:
+        set: Množina změněných cest
+    """
+    changed = {path for path, value in new.items() if old.get(path, _MISSING) != value}
+    changed.update(path for path in old if path not in new)
+    return changed
+
+
+def diff_status(old: dict, new: dict):
+    """Změněné cesty mezi dvěma vnořenými stavy zařízení"""
+    return diff_flat(flatten_status(old), flatten_status(new))
+
+
+class StatusDispatcher:
+    """Rozesílání změn stavu handlerům přihlášeným ke konkrétním polím"""
+
+    def __init__(self):
+        self._subscriptions = []   # [(paths, handler)] v pořadí přihlášení
+        self._by_path = {}         # cesta -> [index přihlášení]
+        self._last_flat = None
+
+    def subscribe(self, paths: Iterable[str], handler: Callable):
+        """
+        Přihlášení handleru ke změnám polí.
+
+        Cesta může být i prefix - "energy" zachytí změnu "energy.consumption".
+        Handler dostane celý nový stav zařízení (dict).
+        """
+        if isinstance(paths, str):
+            paths = (paths,)
+        index = len(self._subscriptions)
+        self._subscriptions.append((tuple(paths), handler))
+        for path in paths:
+            self._by_path.setdefault(path, []).append(index)
+
+    def subscribe_all(self, subscriptions):
+        """Přihlášení seznamu (paths, handler) - typicky widget.status_subscriptions()"""
+        for paths, handler in subscriptions:
+            self.subscribe(paths, handler)
+
+    def reset(self):
+        """Zapomenutí posledního stavu - další dispatch zavolá všechny handlery"""
+        self._last_flat = None
+
+    def dispatch(self, status: dict, force: bool = False):
+        """
+        Předání nového stavu handlerům, jejichž pole se změnila.
+
+        Args:
+            status: Kompletní stav zařízení
+            force: Zavolat všechny handlery bez ohledu na změny
+
+        Returns:
+            set: Změněné cesty (při prvním/vynuceném volání všechny)
+        """
+        flat = flatten_status(status)
+
+        if force or self._last_flat is None:
+            changed = set(flat)
+            indices = range(len(self._subscriptions))
+        else:
+            changed = diff_flat(self._last_flat, flat)
+            indices = sorted(self._affected(changed))
+        self._last_flat = flat
+
+        for index in indices:
+            paths, handler = self._subscriptions[index]
+            try:
+                handler(status)
+            except Exception as e:
+                logger.error(f"Chyba při aktualizaci polí {', '.join(paths)}: {e}")
+
+        if changed and not force:
+            logger.debug(f"Změněná pole: {', '.join(sorted(changed))}")
+        return changed
+
+    def _affected(self, changed):
+        """Indexy přihlášení dotčených změnou (cesta nebo některý z jejích prefixů)"""
+        affected = set()
+        for path in changed:
+            parts = path.split(".")
+            for depth in range(len(parts), 0, -1):
+                affected.update(self._by_path.get(".".join(parts[:depth]), ()))
+        return affected
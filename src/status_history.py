@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""
+Kompaktní historie stavů zařízení (časová řada v SQLite).
+
+Ze stavu se ukládají jen sledovaná pole (HISTORY_FIELDS). Vzorky se sbírají
+po sloupcích do bufferů modulu array a po CHUNK_SIZE vzorcích se zapíší
+jako jeden blok (řádek tabulky chunks):
+
+    - čas: rozdíly (delta) proti předchozímu vzorku v sekundách
+    - teploty: desetiny °C jako delta proti předchozímu vzorku
+    - výčty (režim, vítr, ...): kód ze slovníku enum_values (1 bajt)
+
+Blok se komprimuje zlibem - opakující se hodnoty a nulové delty se
+zmenší na zlomek bajtu na vzorek, měsíce minutových vzorků celé flotily
+se tak vejdou do několika MB. Starší data se převzorkují na 15minutové
+průměry (downsample). Rozsahové dotazy čtou jen bloky překrývající
+zadaný interval (index device_id, resolution, start).
+
+Historii může současně zapisovat více procesů (GUI, daemon, CLI). Každý
+proces zapisuje jen do vlastních bloků - rozpracovaný blok jiného
+procesu nenačítá ani nepřepisuje, a pokud už blok se stejným začátkem
+existuje, posune začátek svého bloku. Dotaz vzorky z překrývajících se
+bloků seřadí podle času.
+"""
+import sys
+import time
+import zlib
+import struct
+import operator
+import sqlite3
+import logging
+import threading
+from array import array
+from collections import Counter
+from itertools import accumulate, chain
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = Path(__file__).parent.parent / "data" / "status_history.db"
+CHUNK_SIZE = 1440             # Vzorků v jednom bloku (den po minutě)
+MIN_SAMPLE_INTERVAL = 60      # Min. odstup vzorků (s) - dřív jen při změně pole
+FLUSH_INTERVAL = 600          # Rozpracovaný blok se zapíše nejpozději po 10 minutách (pád procesu)
+DOWNSAMPLE_AFTER = 30 * 86400 # Převzorkovat data starší než 30 dní
+DOWNSAMPLE_RESOLUTION = 900   # Rozlišení převzorkovaných dat (s) - 15 minut
+
+RAW_RESOLUTION = 0
+MISSING = -32768  # Chybějící číselná hodnota (v desetinách)
+_FORMAT_VERSION = 1
+
+# Sledovaná pole: název sloupce -> (cesta ve stavu, druh)
+HISTORY_FIELDS = {
+    "current_temperature": ("temperature.currentTemperature", "number"),
+    "target_temperature": ("temperature.targetTemperature", "number"),
+    "job_mode": ("airConJobMode.currentJobMode", "enum"),
+    "wind_strength": ("airFlow.windStrength", "enum"),
+    "power": ("operation.airConOperationMode", "enum"),
+    "run_state": ("runState.currentState", "enum"),
+}
+NUMBER_FIELDS = tuple(name for name, (_, kind) in HISTORY_FIELDS.items() if kind == "number")
+ENUM_FIELDS = tuple(name for name, (_, kind) in HISTORY_FIELDS.items() if kind == "enum")
+
+
+def _get_path(status: dict, path: str):
+    """Hodnota ve vnořeném stavu podle cesty "a.b.c" (None pokud chybí)"""
+    value = status
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _to_tenths(value) -> int:
+    """Teplota na desetiny °C (MISSING pokud chybí nebo není číslo)"""
+    try:
+        return int(round(float(value) * 10))
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _little_endian(column: array) -> bytes:
+    """Bajty sloupce v little-endian pořadí (nezávisle na platformě)"""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    """Sloupec z little-endian bajtů"""
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _delta_encode(values: array, base: int = 0) -> array:
+    """Delta kódování - rozdíly proti předchozí hodnotě (první proti base)"""
+    return array("i", map(operator.sub, values, chain((base,), values)))
+
+
+def _delta_decode(encoded: array, typecode: str, base: int = 0) -> array:
+    """Inverze _delta_encode (kumulativní součet)"""
+    decoded = array(typecode, accumulate(encoded, initial=base))
+    del decoded[0]
+    return decoded
+
+
+class ColumnBuffer:
+    """Vzorky jednoho zařízení po sloupcích"""
+
+    def __init__(self, start: int = None):
+        self.start = start                     # Čas prvního vzorku bloku (s)
+        self.timestamps = array("q")           # Unix čas (s)
+        self.numbers = {name: array("h") for name in NUMBER_FIELDS}   # desetiny °C
+        self.enums = {name: array("B") for name in ENUM_FIELDS}       # kódy slovníku
+        self.stored = False                    # Blok už je v databázi pod klíčem start (tento proces)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, numbers: Dict[str, int], enums: Dict[str, int]):
+        """Přidání jednoho vzorku"""
+        if self.start is None:
+            self.start = timestamp
+        self.timestamps.append(timestamp)
+        for name in NUMBER_FIELDS:
+            self.numbers[name].append(numbers[name])
+        for name in ENUM_FIELDS:
+            self.enums[name].append(enums[name])
+
+    def encode(self) -> bytes:
+        """Serializace bloku (delta + zlib)"""
+        parts = [struct.pack("<BI", _FORMAT_VERSION, len(self))]
+        parts.append(_little_endian(_delta_encode(self.timestamps, self.start)))
+        for name in NUMBER_FIELDS:
+            parts.append(_little_endian(_delta_encode(self.numbers[name])))
+        for name in ENUM_FIELDS:
+            parts.append(self.enums[name].tobytes())
+        return zlib.compress(b"".join(parts), 6)
+
+    @classmethod
+    def decode(cls, blob: bytes, start: int) -> "ColumnBuffer":
+        """Načtení bloku uloženého přes encode()"""
+        data = zlib.decompress(blob)
+        version, count = struct.unpack_from("<BI", data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Nepodporovaná verze bloku historie: {version}")
+        offset = struct.calcsize("<BI")
+        int_size = array("i").itemsize * count
+
+        def take(size):
+            nonlocal offset
+            chunk = data[offset:offset + size]
+            offset += size
+            return chunk
+
+        buffer = cls(start)
+        buffer.timestamps = _delta_decode(_from_little_endian("i", take(int_size)), "q", start)
+        for name in NUMBER_FIELDS:
+            buffer.numbers[name] = _delta_decode(_from_little_endian("i", take(int_size)), "h")
+        for name in ENUM_FIELDS:
+            buffer.enums[name] = array("B", take(count))
+        return buffer
+
+    def slice(self, begin: int, end: int) -> "ColumnBuffer":
+        """Vzorky [begin, end) podle indexu"""
+        part = ColumnBuffer(self.start)
+        part.timestamps = self.timestamps[begin:end]
+        part.numbers = {name: column[begin:end] for name, column in self.numbers.items()}
+        part.enums = {name: column[begin:end] for name, column in self.enums.items()}
+        return part
+
+    def take(self, indices: List[int]) -> "ColumnBuffer":
+        """Vzorky v pořadí podle indexů"""
+        part = ColumnBuffer(self.start)
+        part.timestamps = array("q", map(self.timestamps.__getitem__, indices))
+        part.numbers = {name: array("h", map(column.__getitem__, indices)) for name, column in self.numbers.items()}
+        part.enums = {name: array("B", map(column.__getitem__, indices)) for name, column in self.enums.items()}
+        return part
+
+    def extend(self, other: "ColumnBuffer"):
+        """Připojení vzorků jiného bufferu"""
+        if self.start is None:
+            self.start = other.start
+        self.timestamps.extend(other.timestamps)
+        for name in NUMBER_FIELDS:
+            self.numbers[name].extend(other.numbers[name])
+        for name in ENUM_FIELDS:
+            self.enums[name].extend(other.enums[name])
+
+
+class StatusHistory:
+    """Historie stavů zařízení - sloupcové bloky v SQLite"""
+
+    def __init__(self, db_path=HISTORY_FILE, chunk_size: int = CHUNK_SIZE,
+                 min_interval: float = MIN_SAMPLE_INTERVAL, flush_interval: float = FLUSH_INTERVAL):
+        """
+        Args:
+            db_path: Cesta k SQLite databázi (":memory:" pro testy)
+            chunk_size: Počet vzorků v jednom bloku
+            min_interval: Min. odstup vzorků bez změny sledovaného pole (s)
+            flush_interval: Max. doba (s), po kterou vzorky čekají jen v paměti
+        """
+        self.db_path = str(db_path)
+        self.chunk_size = chunk_size
+        self.min_interval = min_interval
+        self.flush_interval = flush_interval
+        self._flushed_at: Dict[str, int] = {}  # device_id -> čas vzorku při posledním zápisu bloku
+        self._lock = threading.Lock()  # GUI zapisuje z asyncio vlákna, čte z hlavního
+        self._buffers: Dict[str, ColumnBuffer] = {}
+        self._last_sample: Dict[str, tuple] = {}
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                device_id TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                start INTEGER NOT NULL,
+                end INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (device_id, resolution, start)
+            );
+            CREATE TABLE IF NOT EXISTS enum_values (
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                code INTEGER NOT NULL,
+                PRIMARY KEY (field, value)
+            );
+        """)
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in ENUM_FIELDS}
+        self._values: Dict[str, Dict[int, str]] = {name: {} for name in ENUM_FIELDS}
+        self._load_enum_values()
+
+    def _load_enum_values(self):
+        """Slovník výčtů z databáze (včetně hodnot přidaných jinými procesy)"""
+        for field, value, code in self.db.execute("SELECT field, value, code FROM enum_values"):
+            if field in self._codes:
+                self._codes[field][value] = code
+                self._values[field][code] = value
+
+    # ------------------------------------------------------------------
+    # Zápis
+    # ------------------------------------------------------------------
+    def record(self, device_id: str, status: dict, timestamp: float = None) -> bool:
+        """
+        Uložení vzorku stavu zařízení.
+
+        Vzorek se přeskočí, pokud od posledního uplynulo méně než
+        min_interval a žádné sledované pole se nezměnilo.
+
+        Returns:
+            bool: True pokud byl vzorek uložen
+        """
+        if not status:
+            return False
+        timestamp = int(timestamp if timestamp is not None else time.time())
+
+        with self._lock:
+            numbers = {name: _to_tenths(_get_path(status, HISTORY_FIELDS[name][0]))
+                       for name in NUMBER_FIELDS}
+            enums = {name: self._encode_enum(name, _get_path(status, HISTORY_FIELDS[name][0]))
+                     for name in ENUM_FIELDS}
+
+            values = (tuple(numbers.values()), tuple(enums.values()))
+            last = self._last_sample.get(device_id)
+            if last and last[1] == values and timestamp - last[0] < self.min_interval:
+                return False
+            if last and timestamp <= last[0]:
+                return False  # Vzorky musí jít v čase dopředu
+            self._last_sample[device_id] = (timestamp, values)
+
+            buffer = self._buffer_for(device_id)
+            buffer.append(timestamp, numbers, enums)
+            if len(buffer) >= self.chunk_size:
+                self._write_buffer(device_id, buffer)
+                self._buffers[device_id] = ColumnBuffer()
+                self._flushed_at.pop(device_id, None)
+                self._maintain(device_id, timestamp)
+            elif timestamp - self._flushed_at.setdefault(device_id, timestamp) >= self.flush_interval:
+                # Rozpracovaný blok průběžně do databáze - pád procesu nepřijde o celý blok
+                self._write_buffer(device_id, buffer)
+                self._flushed_at[device_id] = timestamp
+            return True
+
+    def flush(self):
+        """Zápis rozpracovaných bloků (další zápisy tohoto procesu je přepíší, nový proces začne nový blok)"""
+        with self._lock:
+            for device_id, buffer in self._buffers.items():
+                if len(buffer):
+                    self._write_buffer(device_id, buffer)
+
+    def close(self):
+        """Zápis bufferů a uzavření databáze"""
+        self.flush()
+        with self._lock:
+            self.db.close()
+
+    def _encode_enum(self, field: str, value) -> int:
+        """Kód hodnoty výčtu (0 = chybí), nové hodnoty se přidají do slovníku"""
+        if value is None:
+            return 0
+        value = str(value)
+        code = self._codes[field].get(value)
+        if code is None:
+            # Kód přiděluje databáze v zamčené transakci - jiný proces mohl hodnotu (nebo kód) už přidat
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute("SELECT code FROM enum_values WHERE field = ? AND value = ?",
+                                      (field, value)).fetchone()
+                if row:
+                    code = row[0]
+                else:
+                    code = self.db.execute("SELECT COALESCE(MAX(code), 0) + 1 FROM enum_values WHERE field = ?",
+                                           (field,)).fetchone()[0]
+                    if code > 255:
+                        self.db.rollback()
+                        logger.warning(f"Příliš mnoho hodnot pole {field} - {value} se neukládá")
+                        return 0
+                    self.db.execute("INSERT INTO enum_values (field, value, code) VALUES (?, ?, ?)",
+                                    (field, value, code))
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            self._codes[field][value] = code
+            self._values[field][code] = value
+        return code
+
+    def _buffer_for(self, device_id: str) -> ColumnBuffer:
+        """Buffer zařízení - vždy nový blok (neúplný blok v databázi může patřit jinému procesu)"""
+        buffer = self._buffers.get(device_id)
+        if buffer is None:
+            buffer = self._buffers[device_id] = ColumnBuffer()
+        return buffer
+
+    def _write_buffer(self, device_id: str, buffer: ColumnBuffer, resolution: int = RAW_RESOLUTION):
+        """Zápis bufferu jako jednoho bloku - vlastní blok se přepíše, cizí nikdy"""
+        if buffer.stored:
+            self.db.execute(
+                "UPDATE chunks SET end = ?, count = ?, data = ? WHERE device_id = ? AND resolution = ? AND start = ?",
+                (buffer.timestamps[-1], len(buffer), buffer.encode(), device_id, resolution, buffer.start))
+            self.db.commit()
+            return
+        while True:
+            try:
+                self.db.execute(
+                    "INSERT INTO chunks (device_id, resolution, start, end, count, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (device_id, resolution, buffer.start, buffer.timestamps[-1], len(buffer), buffer.encode()))
+                break
+            except sqlite3.IntegrityError:
+                buffer.start -= 1  # Blok se stejným začátkem zapsal jiný proces (časy jsou delta od start)
+        self.db.commit()
+        buffer.stored = True
+
+    # ------------------------------------------------------------------
+    # Převzorkování starých dat
+    # ------------------------------------------------------------------
+    def downsample(self, before: float, resolution: int = DOWNSAMPLE_RESOLUTION,
+                   device_id: str = None) -> int:
+        """
+        Převzorkování úplných bloků starších než `before` na průměry
+        (teploty) a nejčastější hodnoty (výčty) za `resolution` sekund.
+
+        Returns:
+            int: Počet převzorkovaných bloků
+        """
+        with self._lock:
+            return self._downsample(before, resolution, device_id)
+
+    def _maintain(self, device_id: str, now: int):
+        """Automatické převzorkování po zapsání úplného bloku"""
+        try:
+            self._downsample(now - DOWNSAMPLE_AFTER, DOWNSAMPLE_RESOLUTION, device_id)
+        except Exception as e:
+            logger.error(f"Chyba při převzorkování historie: {e}")
+
+    def _downsample(self, before, resolution, device_id):
+        query = ("SELECT device_id, start, data FROM chunks WHERE resolution = ? AND end < ?"
+                 + (" AND device_id = ?" if device_id else "") + " ORDER BY device_id, start")
+        params = (RAW_RESOLUTION, int(before)) + ((device_id,) if device_id else ())
+        rows = self.db.execute(query, params).fetchall()
+
+        for row_device, start, blob in rows:
+            buffer = ColumnBuffer.decode(blob, start)
+            reduced = _aggregate(buffer, resolution)
+            deleted = self.db.execute("DELETE FROM chunks WHERE device_id = ? AND resolution = ? AND start = ?",
+                                      (row_device, RAW_RESOLUTION, start)).rowcount
+            if not deleted:
+                self.db.commit()
+                continue  # Blok mezitím převzorkoval jiný proces
+            self._write_buffer(row_device, reduced, resolution)
+        if rows:
+            logger.info(f"🗜️ Historie: převzorkováno {len(rows)} bloků na {resolution // 60} min")
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Dotazy
+    # ------------------------------------------------------------------
+    def devices(self) -> List[str]:
+        """Zařízení, pro která existuje historie"""
+        with self._lock:
+            stored = {row[0] for row in self.db.execute("SELECT DISTINCT device_id FROM chunks")}
+            return sorted(stored | {d for d, b in self._buffers.items() if len(b)})
+
+    def query_columns(self, device_id: str, start: float = None, end: float = None) -> ColumnBuffer:
+        """
+        Vzorky v intervalu [start, end] jako sloupce (array) - bez převodu
+        na Python objekty, vhodné pro numpy.frombuffer.
+
+        Returns:
+            ColumnBuffer: timestamps, numbers (desetiny, MISSING), enums (kódy)
+        """
+        start = int(start) if start is not None else 0
+        end = int(end) if end is not None else 2 ** 62
+
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT start, data FROM chunks WHERE device_id = ? AND start <= ? AND end >= ? "
+                "ORDER BY start", (device_id, end, start)).fetchall()
+            pending = self._buffers.get(device_id)
+
+            result = ColumnBuffer()
+            written_starts = {row[0] for row in rows}
+            chunks = [ColumnBuffer.decode(blob, chunk_start) for chunk_start, blob in rows]
+            if pending is not None and len(pending) and pending.start not in written_starts:
+                chunks.append(pending)
+            elif pending is not None and len(pending):
+                # Rozpracovaný blok už je v databázi jen částečně - platí buffer
+                chunks = [c for c in chunks if c.start != pending.start] + [pending]
+
+        chunks.sort(key=lambda c: c.start)
+        overlapping = False
+        for chunk in chunks:
+            begin = _bisect(chunk.timestamps, start)
+            stop = _bisect(chunk.timestamps, end + 1)
+            if stop > begin:
+                if len(result) and chunk.timestamps[begin] < result.timestamps[-1]:
+                    overlapping = True
+                result.extend(chunk.slice(begin, stop))
+        if overlapping:
+            # Bloky více procesů se časově překrývají - vzorky podle času
+            result = result.take(sorted(range(len(result)), key=result.timestamps.__getitem__))
+        return result
+
+    def query(self, device_id: str, start: float = None, end: float = None,
+              fields: Iterable[str] = None) -> Dict[str, list]:
+        """
+        Vzorky v intervalu [start, end] s dekódovanými hodnotami.
+
+        Returns:
+            dict: {"timestamp": [...], "current_temperature": [24.5, ...], "job_mode": ["COOL", ...]}
+        """
+        columns = self.query_columns(device_id, start, end)
+        fields = list(fields) if fields else list(HISTORY_FIELDS)
+
+        result = {"timestamp": list(columns.timestamps)}
+        with self._lock:
+            if any(set(columns.enums[name]) - set(self._values[name]) - {0} for name in ENUM_FIELDS):
+                self._load_enum_values()  # Kódy přidané jiným procesem
+        for name in fields:
+            if name in columns.numbers:
+                result[name] = [None if v == MISSING else v / 10 for v in columns.numbers[name]]
+            elif name in columns.enums:
+                values = self._values[name]
+                result[name] = [values.get(code) for code in columns.enums[name]]
+        return result
+
+    def enum_values(self, field: str) -> Dict[int, str]:
+        """Slovník kód -> hodnota pro pole výčtu"""
+        return dict(self._values.get(field, {}))
+
+    def stats(self) -> Dict[str, int]:
+        """Počet bloků, vzorků a velikost uložených dat"""
+        with self._lock:
+            chunks, samples, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0), COALESCE(SUM(LENGTH(data)), 0) FROM chunks"
+            ).fetchone()
+        pending = sum(len(b) for b in self._buffers.values())
+        return {"chunks": chunks, "samples": samples, "pending": pending, "bytes": size}
+
+
+def _bisect(column: array, value: int) -> int:
+    """Index prvního prvku >= value v seřazeném sloupci"""
+    low, high = 0, len(column)
+    while low < high:
+        middle = (low + high) // 2
+        if column[middle] < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _aggregate(buffer: ColumnBuffer, resolution: int) -> ColumnBuffer:
+    """Agregace vzorků do intervalů `resolution` sekund"""
+    reduced = ColumnBuffer()
+    index = 0
+    count = len(buffer)
+    while index < count:
+        bucket = buffer.timestamps[index] - buffer.timestamps[index] % resolution
+        stop = index
+        while stop < count and buffer.timestamps[stop] < bucket + resolution:
+            stop += 1
+
+        numbers = {}
+        for name in NUMBER_FIELDS:
+            values = [v for v in buffer.numbers[name][index:stop] if v != MISSING]
+            numbers[name] = int(round(sum(values) / len(values))) if values else MISSING
+        enums = {name: Counter(buffer.enums[name][index:stop]).most_common(1)[0][0]
+                 for name in ENUM_FIELDS}
+
+        reduced.append(bucket, numbers, enums)
+        index = stop
+    return reduced
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Lokální simulátor LG ThinQ Connect API pro zátěžové testy a benchmarky.
+
+Implementuje endpointy, které volá thinqconnect.ThinQApi:
+    GET  /devices                       seznam zařízení
+    GET  /devices/{id}/profile          profil (data/device_profile.json)
+    GET  /devices/{id}/state            stav zařízení
+    POST /devices/{id}/control          příkaz (validace podle profilu)
+    POST /event/{id}/subscribe          odběr událostí (jen potvrzení)
+
+Odpovědi mají stejnou obálku jako skutečné API ({"messageId", "timestamp",
+"response"} resp. {"error": {"code", "message"}}), takže je ThinQAPI
+zpracuje beze změn. Virtuální zařízení se vytvoří z profilu, zápisy se
+validují proti jeho "w" hodnotám a currentTemperature se při čtení
+posune podle režimu (jednoduchý tepelný model, bez běžících úloh - zvládne
+i tisíce zařízení). Lze nastavit latenci a náhodné chyby 429/503.
+
+Spuštění a přesměrování klienta (config.json: "api_base_url"):
+
+    python src/thinq_simulator.py --devices 1000 --latency 0.05 --error-429 0.01
+    "api_base_url": "http://127.0.0.1:8088"
+"""
+import json
+import time
+import uuid
+import base64
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE = Path(__file__).parent.parent / "data" / "device_profile.json"
+DEFAULT_DEVICE_ID = "ef279add7b418795378e9d20631cd85d86aa5e356a7e4599584434c4ead89c4e"
+DEFAULT_PORT = 8088
+
+AMBIENT_TEMPERATURE = 27.0   # Teplota, ke které se místnost vrací při vypnutí (°C)
+ACTIVE_RATE = 0.1            # Změna teploty při chlazení/topení (°C/min)
+PASSIVE_RATE = 0.02          # Návrat k okolní teplotě (°C/min)
+
+# Kódy chyb podle thinqconnect.ThinQAPIErrorCodes
+ERROR_EXCEEDED_API_CALLS = "1306"
+ERROR_INTERNAL_SERVER = "2000"
+ERROR_NOT_EXIST_DEVICE = "1205"
+ERROR_NOT_PROVIDED_FEATURE = "2201"
+ERROR_INVALID_COMMAND = "2207"
+
+
+class CommandError(Exception):
+    """Příkaz neodpovídá profilu zařízení"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def simulated_device_id(index: int) -> str:
+    """ID virtuálního zařízení - první je výchozí zařízení aplikace, další deterministická"""
+    if index == 0:
+        return DEFAULT_DEVICE_ID
+    return hashlib.sha256(f"thinq-sim-{index}".encode()).hexdigest()
+
+
+def validate_command(profile: dict, payload: dict):
+    """
+    Kontrola příkazu proti profilu zařízení (jen zapisovatelné vlastnosti a hodnoty "w").
+
+    Raises:
+        CommandError: Neznámá / nezapisovatelná vlastnost nebo neplatná hodnota
+    """
+    if not isinstance(payload, dict) or not payload:
+        raise CommandError(ERROR_INVALID_COMMAND, "Prázdný příkaz")
+
+    properties = profile.get("property", {})
+    for resource, values in payload.items():
+        spec = properties.get(resource)
+        if not isinstance(spec, dict) or not isinstance(values, dict):
+            raise CommandError(ERROR_NOT_PROVIDED_FEATURE, f"Neznámý prostředek {resource}")
+
+        for name, value in values.items():
+            prop = spec.get(name)
+            if not isinstance(prop, dict):
+                raise CommandError(ERROR_NOT_PROVIDED_FEATURE, f"Neznámá vlastnost {resource}.{name}")
+            if "w" not in prop.get("mode", []):
+                raise CommandError(ERROR_NOT_PROVIDED_FEATURE, f"{resource}.{name} je jen pro čtení")
+            _validate_value(f"{resource}.{name}", prop, value)
+
+
+def _validate_value(path: str, prop: dict, value):
+    """Kontrola jedné hodnoty podle typu vlastnosti"""
+    kind = prop.get("type")
+    allowed = prop.get("value", {}).get("w")
+
+    if kind in ("enum", "boolean"):
+        if allowed is not None and value not in allowed:
+            raise CommandError(ERROR_INVALID_COMMAND, f"{path}: hodnota {value!r} není povolena {allowed}")
+    elif kind in ("range", "number"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise CommandError(ERROR_INVALID_COMMAND, f"{path}: očekáváno číslo, ne {value!r}")
+        if isinstance(allowed, dict):
+            low, high, step = allowed.get("min"), allowed.get("max"), allowed.get("step")
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise CommandError(ERROR_INVALID_COMMAND, f"{path}: {value} mimo rozsah {low}-{high}")
+            if step and low is not None and abs((value - low) / step - round((value - low) / step)) > 1e-9:
+                raise CommandError(ERROR_INVALID_COMMAND, f"{path}: {value} neodpovídá kroku {step}")
+
+
+def initial_state(profile: dict, rng: random.Random) -> dict:
+    """Výchozí stav virtuálního zařízení (první čitelná hodnota každé vlastnosti)"""
+    state = {}
+    for resource, spec in profile.get("property", {}).items():
+        if not isinstance(spec, dict):
+            continue
+        values = {}
+        for name, prop in spec.items():
+            if not isinstance(prop, dict) or "r" not in prop.get("mode", []):
+                continue
+            readable = prop.get("value", {}).get("r")
+            if isinstance(readable, list) and readable:
+                values[name] = readable[0]
+            elif prop.get("type") == "number":
+                values[name] = 0
+        if values:
+            state[resource] = values
+
+    state.setdefault("operation", {})["airConOperationMode"] = "POWER_OFF"
+    temperature = state.setdefault("temperature", {})
+    temperature["currentTemperature"] = round(rng.uniform(22, 28) * 2) / 2
+    temperature["targetTemperature"] = 24
+    temperature.update(minTargetTemperature=16, maxTargetTemperature=30)
+    return state
+
+
+class VirtualDevice:
+    """Jedno simulované zařízení - stav + líný tepelný model"""
+
+    def __init__(self, device_id: str, profile: dict, rng: random.Random):
+        self.device_id = device_id
+        self.profile = profile
+        self.state = initial_state(profile, rng)
+        self._temperature = self.state["temperature"]["currentTemperature"]
+        self._updated = time.monotonic()
+
+    def read(self) -> dict:
+        """Stav zařízení s aktuální simulovanou teplotou"""
+        self._advance()
+        return self.state
+
+    def apply(self, payload: dict):
+        """Validace a provedení příkazu"""
+        validate_command(self.profile, payload)
+        self._advance()
+        for resource, values in payload.items():
+            self.state.setdefault(resource, {}).update(values)
+
+        temperature = payload.get("temperature", {})
+        for name in ("coolTargetTemperature", "heatTargetTemperature", "autoTargetTemperature"):
+            if name in temperature:
+                self.state["temperature"]["targetTemperature"] = temperature[name]
+        for timer in ("timer", "sleepTimer"):
+            if payload.get(timer, {}).get("relativeStopTimer") == "UNSET":
+                self.state[timer].update(relativeHourToStop=0, relativeMinuteToStop=0)
+
+    def _advance(self):
+        """Posun teploty od poslední změny (°C/min podle režimu)"""
+        now = time.monotonic()
+        minutes = (now - self._updated) / 60
+        self._updated = now
+        if minutes <= 0:
+            return
+
+        powered = self.state.get("operation", {}).get("airConOperationMode") == "POWER_ON"
+        mode = self.state.get("airConJobMode", {}).get("currentJobMode")
+        target = self.state["temperature"].get("targetTemperature", 24)
+        current = self._temperature
+
+        if powered and mode in ("COOL", "AIR_DRY") and current > target:
+            current = max(target, current - ACTIVE_RATE * minutes)
+        elif powered and mode == "HEAT" and current < target:
+            current = min(target, current + ACTIVE_RATE * minutes)
+        elif powered and mode == "AUTO" and current != target:
+            step = ACTIVE_RATE * minutes
+            current = max(target, current - step) if current > target else min(target, current + step)
+        else:
+            step = PASSIVE_RATE * minutes
+            if current > AMBIENT_TEMPERATURE:
+                current = max(AMBIENT_TEMPERATURE, current - step)
+            else:
+                current = min(AMBIENT_TEMPERATURE, current + step)
+
+        self._temperature = current
+        self.state["temperature"]["currentTemperature"] = round(current * 2) / 2  # Čidlo po 0,5 °C
+
+
+class ThinQSimulator:
+    """aiohttp server se simulovanými zařízeními"""
+
+    def __init__(self, profile: dict = None, device_count: int = 1, latency: float = 0.0,
+                 jitter: float = 0.0, error_429: float = 0.0, error_503: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            profile: Profil zařízení (None = data/device_profile.json)
+            device_count: Počet virtuálních zařízení
+            latency: Základní latence odpovědi (s)
+            jitter: Náhodná složka latence (s, rovnoměrně 0..jitter)
+            error_429: Pravděpodobnost odpovědi 429 (EXCEEDED_API_CALLS)
+            error_503: Pravděpodobnost odpovědi 503 (INTERNAL_SERVER_ERROR)
+            seed: Seed generátoru náhody (reprodukovatelné běhy)
+        """
+        if profile is None:
+            with open(PROFILE_FILE, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        self.profile = profile
+        self.latency = latency
+        self.jitter = jitter
+        self.error_429 = error_429
+        self.error_503 = error_503
+        self.rng = random.Random(seed)
+
+        self.devices: Dict[str, VirtualDevice] = {}
+        for index in range(device_count):
+            device_id = simulated_device_id(index)
+            self.devices[device_id] = VirtualDevice(device_id, profile, self.rng)
+
+        self.requests = 0
+        self.injected_errors = 0
+        self.runner = None
+        self.port = None
+
+    # ------------------------------------------------------------------
+    # Server
+    # ------------------------------------------------------------------
+    def create_app(self) -> web.Application:
+        """aiohttp aplikace s endpointy ThinQ API"""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/devices", self._handle_devices)
+        app.router.add_get("/devices/{device_id}/profile", self._handle_profile)
+        app.router.add_get("/devices/{device_id}/state", self._handle_state)
+        app.router.add_post("/devices/{device_id}/control", self._handle_control)
+        app.router.add_post("/event/{device_id}/subscribe", self._handle_subscribe)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        """Spuštění serveru (port 0 = náhodný volný port, viz self.port)"""
+        self.runner = web.AppRunner(self.create_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"🧪 ThinQ simulátor: http://{host}:{self.port} ({len(self.devices)} zařízení)")
+        return self
+
+    @property
+    def base_url(self) -> str:
+        """Adresa pro config.json "api_base_url" """
+        return f"http://127.0.0.1:{self.port}"
+
+    async def close(self):
+        """Zastavení serveru"""
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def stats(self):
+        """Počet požadavků a vložených chyb"""
+        return {"requests": self.requests, "injected_errors": self.injected_errors}
+
+    # ------------------------------------------------------------------
+    # Obsluha požadavků
+    # ------------------------------------------------------------------
+    @web.middleware
+    async def _middleware(self, request, handler):
+        """Latence a náhodné chyby pro všechny endpointy"""
+        self.requests += 1
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        roll = self.rng.random()
+        if roll < self.error_429:
+            self.injected_errors += 1
+            return self._error(429, ERROR_EXCEEDED_API_CALLS, "Exceeded API calls (simulace)")
+        if roll < self.error_429 + self.error_503:
+            self.injected_errors += 1
+            return self._error(503, ERROR_INTERNAL_SERVER, "Service unavailable (simulace)")
+        return await handler(request)
+
+    def _device(self, request) -> VirtualDevice:
+        device = self.devices.get(request.match_info["device_id"])
+        if device is None:
+            raise CommandError(ERROR_NOT_EXIST_DEVICE, "Zařízení neexistuje")
+        return device
+
+    async def _handle_devices(self, request):
+        return self._response([
+            {
+                "deviceId": device_id,
+                "deviceInfo": {
+                    "deviceType": "DEVICE_AIR_CONDITIONER",
+                    "modelName": "SIMULATOR",
+                    "alias": f"Simulace {index + 1}",
+                    "reportable": True
+                }
+            }
+            for index, device_id in enumerate(self.devices)
+        ])
+
+    async def _handle_profile(self, request):
+        try:
+            self._device(request)
+        except CommandError as e:
+            return self._error(400, e.code, str(e))
+        return self._response(self.profile)
+
+    async def _handle_state(self, request):
+        try:
+            return self._response(self._device(request).read())
+        except CommandError as e:
+            return self._error(400, e.code, str(e))
+
+    async def _handle_control(self, request):
+        try:
+            payload = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            return self._error(400, ERROR_INVALID_COMMAND, "Neplatný JSON")
+        try:
+            self._device(request).apply(payload)
+        except CommandError as e:
+            logger.info(f"Odmítnutý příkaz {json.dumps(payload, ensure_ascii=False)}: {e}")
+            return self._error(400, e.code, str(e))
+        return self._response({})
+
+    async def _handle_subscribe(self, request):
+        try:
+            self._device(request)
+        except CommandError as e:
+            return self._error(400, e.code, str(e))
+        return self._response({})
+
+    @staticmethod
+    def _envelope() -> dict:
+        return {
+            "messageId": base64.urlsafe_b64encode(uuid.uuid4().bytes)[:-2].decode("ascii"),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        }
+
+    def _response(self, data):
+        return web.json_response({**self._envelope(), "response": data})
+
+    def _error(self, status: int, code: str, message: str):
+        return web.json_response({**self._envelope(), "error": {"code": code, "message": message}},
+                                 status=status)
+
+
+async def _run_simulator(args):
+    """Běh simulátoru do přerušení"""
+    simulator = ThinQSimulator(device_count=args.devices, latency=args.latency, jitter=args.jitter,
+                               error_429=args.error_429, error_503=args.error_503, seed=args.seed)
+    await simulator.start(args.host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Lokální simulátor LG ThinQ API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--devices", type=int, default=1, help="Počet virtuálních zařízení")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence odpovědi (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Náhodná složka latence (s)")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Podíl odpovědí 429")
+    parser.add_argument("--error-503", type=float, default=0.0, help="Podíl odpovědí 503")
+    parser.add_argument("--seed", type=int, default=None)
+    try:
+        asyncio.run(_run_simulator(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass